@@ -1,112 +1,463 @@
 import cv2
 import numpy as np
-from typing import Dict, List, Any
-import torch
-from torchvision import transforms
-from PIL import Image
+import itertools
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+from frame_store import FramePool, FrameStore
+from motion import SUSPICIOUS_ANOMALY_RATIO
+from registry import get_face_cascade
+from telemetry import telemetry
+
+CASCADE_PATH = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+
+# Heuristic checks, in the order reasons are reported
+FACE_REASONS = ("Low detail/blur", "Low contrast", "Unusual brightness")
+
+def face_region_stats(gray: np.ndarray, boxes: np.ndarray, lap_buffer: np.ndarray = None) -> np.ndarray:
+    """Blur, contrast and brightness for each box of one grayscale frame
+
+    Returns an (n, 3) float64 array. Empty regions get NaN, which fails every
+    threshold check just like the old empty-region early return.
+
+    Each face is reduced with its own OpenCV calls on purpose: with a few
+    faces per frame, meanStdDev on the crops beats one batched pass over
+    summed-area tables, whose 64-bit square sums cost more than the crops.
+    """
+    stats = np.full((len(boxes), 3), np.nan)
+
+    for row, (x, y, w, h) in enumerate(boxes):
+        face = gray[y:y+h, x:x+w]
+        if face.size == 0:
+            continue
+
+        dst = None
+        if lap_buffer is not None and lap_buffer.shape[0] >= face.shape[0] and lap_buffer.shape[1] >= face.shape[1]:
+            dst = lap_buffer[:face.shape[0], :face.shape[1]]
+        laplacian = cv2.Laplacian(face, cv2.CV_64F, dst=dst)
+
+        # meanStdDev gives mean and population std in one pass
+        brightness, contrast = cv2.meanStdDev(face)
+        _, lap_std = cv2.meanStdDev(laplacian)
+        stats[row] = (lap_std[0, 0] ** 2, contrast[0, 0], brightness[0, 0])
+
+    return stats
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between (n, 4) and (m, 4) arrays of x, y, w, h boxes"""
+    a = a.astype(np.float64)[:, None, :]
+    b = b.astype(np.float64)[None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 0] + a[..., 2], b[..., 0] + b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 1] + a[..., 3], b[..., 1] + b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    union = a[..., 2] * a[..., 3] + b[..., 2] * b[..., 3] - inter
+    return inter / np.maximum(union, 1e-9)
+
+class FaceMetrics:
+    """Struct-of-arrays store of every face detected in a clip"""
+
+    def __init__(self, capacity: int = 64):
+        capacity = max(1, capacity)
+        self.size = 0
+        self._frame_idx = np.empty(capacity, dtype=np.int32)
+        self._bbox = np.empty((capacity, 4), dtype=np.int32)
+        self._stats = np.empty((capacity, 3), dtype=np.float64)
+        self._track_id = np.empty(capacity, dtype=np.int32)
+
+    def _reserve(self, extra: int):
+        needed = self.size + extra
+        if needed <= len(self._frame_idx):
+            return
+        capacity = max(needed, 2 * len(self._frame_idx))
+        for name in ('_frame_idx', '_bbox', '_stats', '_track_id'):
+            old = getattr(self, name)
+            grown = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            grown[:self.size] = old[:self.size]
+            setattr(self, name, grown)
+
+    def append(self, frame_idx: int, boxes: np.ndarray, stats: np.ndarray, track_ids=None):
+        """Add the faces found in one frame; track_ids defaults to -1 (untracked)"""
+        count = len(boxes)
+        if count == 0:
+            return
+        self._reserve(count)
+        end = self.size + count
+        self._frame_idx[self.size:end] = frame_idx
+        self._bbox[self.size:end] = boxes
+        self._stats[self.size:end] = stats
+        self._track_id[self.size:end] = -1 if track_ids is None else track_ids
+        self.size = end
+
+    @property
+    def frame_idx(self) -> np.ndarray:
+        return self._frame_idx[:self.size]
+
+    @property
+    def bbox(self) -> np.ndarray:
+        return self._bbox[:self.size]
+
+    @property
+    def track_id(self) -> np.ndarray:
+        return self._track_id[:self.size]
+
+    @property
+    def blur_score(self) -> np.ndarray:
+        return self._stats[:self.size, 0]
+
+    @property
+    def contrast(self) -> np.ndarray:
+        return self._stats[:self.size, 1]
+
+    @property
+    def brightness(self) -> np.ndarray:
+        return self._stats[:self.size, 2]
+
+    def reason_flags(self) -> np.ndarray:
+        """(n, len(FACE_REASONS)) boolean matrix of triggered heuristics"""
+        brightness = self.brightness
+        return np.column_stack([
+            self.blur_score < 100,
+            self.contrast < 20,
+            (brightness < 50) | (brightness > 200)
+        ])
+
+    def suspicious(self) -> np.ndarray:
+        """A face is suspicious when more than one heuristic fires"""
+        return self.reason_flags().sum(axis=1) > 1
 
 class DeepfakeDetector:
-    def __init__(self):
-        """Initialize deepfake detection components"""
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    def __init__(self, workers: int = 1, detect_max_side: Optional[int] = None,
+                 tracking: bool = False, keyframe_interval: int = 5,
+                 iou_threshold: float = 0.3, match_threshold: float = 0.6,
+                 processes: int = 0):
+        """Initialize deepfake detection components
+
+        workers > 1 fans frames out over a thread pool; OpenCV releases the GIL,
+        so detection scales with cores. processes > 1 uses worker processes
+        instead when the frames are a FrameStore, which they read in place.
+        detect_max_side, when set, runs the cascade on a downscaled copy of
+        larger frames and maps boxes back.
+
+        tracking runs the cascade only every keyframe_interval frames and
+        follows faces in between by template matching, assigning each face a
+        track id so suspiciousness can be reported per person.
+        """
+        self.workers = max(1, workers)
+        self.detect_max_side = detect_max_side
+        self.tracking = tracking
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.iou_threshold = iou_threshold
+        self.match_threshold = match_threshold
+        self.search_margin = 0.5
+        self._pool = None
+        self._pool_workers = 0
+        self.processes = processes
+        self._process_pool = None
+        # Shared detectors may be asked for a pool by several sessions at once
+        self._pool_lock = threading.Lock()
+        self._finalizers = {}
+        
+        # CascadeClassifier isn't thread-safe: each thread gets its own from
+        # the model registry, plus conversion buffers reused frame after frame
+        self._local = threading.local()
+    
+    def _thread_state(self):
+        state = self._local
+        if getattr(state, 'cascade', None) is None:
+            state.cascade = get_face_cascade()
+        if not hasattr(state, 'gray'):
+            state.gray = None
+            state.small = None
+            state.laplacian = None
+        return state
+    
+    def _detect_frame(self, frame: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Detect faces in one frame and compute their metrics"""
+        state = self._thread_state()
+        height, width = frame.shape[:2]
+        
+        if state.gray is None or state.gray.shape != (height, width):
+            state.gray = np.empty((height, width), dtype=np.uint8)
+            state.laplacian = np.empty((height, width), dtype=np.float64)
+        gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY, dst=state.gray)
+        
+        scale = 1.0
+        detect_on = gray
+        if self.detect_max_side and max(height, width) > self.detect_max_side:
+            scale = self.detect_max_side / max(height, width)
+            size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+            if state.small is None or state.small.shape != (size[1], size[0]):
+                state.small = np.empty((size[1], size[0]), dtype=np.uint8)
+            detect_on = cv2.resize(gray, size, dst=state.small, interpolation=cv2.INTER_AREA)
+        
+        faces = state.cascade.detectMultiScale(detect_on, 1.3, 5)
+        boxes = np.asarray(faces, dtype=np.int32).reshape(-1, 4)
+        
+        if scale != 1.0 and len(boxes):
+            boxes = np.round(boxes / scale).astype(np.int32)
+            boxes[:, 2] = np.minimum(boxes[:, 2], width - boxes[:, 0])
+            boxes[:, 3] = np.minimum(boxes[:, 3], height - boxes[:, 1])
+        
+        # Metrics reuse this frame's grayscale image instead of converting each face again
+        return boxes, face_region_stats(gray, boxes, state.laplacian)
+    
+    def _map_frames(self, frames: List[np.ndarray], workers: int, indices: Optional[List[int]] = None):
+        """Yield detections for frames (or frames[i] for i in indices) in order, in parallel when possible"""
+        indices = range(len(frames)) if indices is None else indices
+        if self.processes > 1 and isinstance(frames, FrameStore) and len(indices) > 1:
+            # Workers index into the shared store; only boxes and stats come back
+            with self._pool_lock:
+                if self._process_pool is None:
+                    self._process_pool = FramePool(self.processes, _detector_worker,
+                                                   ({'detect_max_side': self.detect_max_side},))
+                    self._finalize('_process_pool', self._process_pool)
+                pool = self._process_pool
+            return pool.map(_detect_chunk, frames, indices)
+        
+        frames = [frames[i] for i in indices]
+        if workers <= 1 or len(frames) <= 1:
+            return map(self._detect_frame, frames)
+        
+        # The pool is kept so worker threads keep their cascades and buffers
+        with self._pool_lock:
+            if self._pool is None or self._pool_workers != workers:
+                if self._pool is not None:
+                    self._pool.shutdown(wait=False)
+                self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='face-detect')
+                self._pool_workers = workers
+                self._finalize('_pool', self._pool)
+            pool = self._pool
+        return pool.map(self._detect_frame, frames)
+    
+    def _finalize(self, name: str, pool):
+        # Stop the pool once the last holder of this detector lets go of it (call under the lock)
+        previous = self._finalizers.pop(name, None)
+        if previous is not None:
+            previous.detach()
+        self._finalizers[name] = weakref.finalize(self, pool.shutdown, wait=False)
+    
+    def close(self):
+        """Stop the detection threads and worker processes; they restart on next use"""
+        with self._pool_lock:
+            pools = [self._pool, self._process_pool]
+            self._pool, self._process_pool = None, None
+            self._pool_workers = 0
+            for finalizer in self._finalizers.values():
+                finalizer.detach()
+            self._finalizers.clear()
+        if pools[0] is not None:
+            pools[0].shutdown(wait=True)
+        if pools[1] is not None:
+            pools[1].shutdown()
     
-    def detect_faces_in_frames(self, frames: List[np.ndarray]) -> Dict[str, Any]:
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+        return False
+    
+    def stream(self) -> 'FaceStream':
+        """Incremental analysis for frames that arrive one at a time"""
+        return FaceStream(self)
+    
+    def detect_faces_in_frames(self, frames: List[np.ndarray], workers: Optional[int] = None) -> Dict[str, Any]:
         """Detect faces and analyze for potential deepfake indicators"""
-        face_data = []
+        workers = self.workers if workers is None else max(1, workers)
+        stream = self.stream()
         
-        for i, frame in enumerate(frames):
-            gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
-            faces = self.face_cascade.detectMultiScale(gray, 1.3, 5)
-            
-            face_info = {
-                'frame_idx': i,
-                'face_count': len(faces),
-                'faces': []
-            }
-            
-            for (x, y, w, h) in faces:
-                face_region = frame[y:y+h, x:x+w]
-                
-                # Simple heuristics for suspicious faces
-                face_analysis = self._analyze_face_region(face_region)
-                face_info['faces'].append({
-                    'bbox': (x, y, w, h),
-                    'analysis': face_analysis
-                })
-            
-            face_data.append(face_info)
+        if self.tracking:
+            # Detect on keyframes only; they are independent, so still parallel
+            keyframes = list(range(0, len(frames), self.keyframe_interval))
+            detections = dict(zip(keyframes, self._map_frames(frames, workers, keyframes)))
+            for i, frame in enumerate(frames):
+                stream.add(frame, detections.pop(i, None))
+        else:
+            for frame, detection in zip(frames, self._map_frames(frames, workers)):
+                stream.add(frame, detection)
         
-        return self._summarize_face_analysis(face_data)
+        return stream.summary()
     
-    def _analyze_face_region(self, face_region: np.ndarray) -> Dict[str, Any]:
-        """Analyze a face region for potential deepfake indicators"""
-        if face_region.size == 0:
-            return {'suspicious': False, 'reasons': []}
+    def _associate(self, tracks: List[Dict[str, Any]], boxes: np.ndarray, new_ids) -> List[int]:
+        """Greedy IoU matching of new detections to existing tracks"""
+        track_ids = [None] * len(boxes)
         
-        # Convert to grayscale for analysis
-        gray_face = cv2.cvtColor(face_region, cv2.COLOR_RGB2GRAY)
+        if tracks and len(boxes):
+            iou = box_iou(np.array([track['box'] for track in tracks]), boxes)
+            for flat in np.argsort(iou, axis=None)[::-1]:
+                t, d = np.unravel_index(flat, iou.shape)
+                if iou[t, d] < self.iou_threshold:
+                    break
+                if track_ids[d] is None and tracks[t] is not None:
+                    track_ids[d] = tracks[t]['id']
+                    tracks = tracks[:t] + [None] + tracks[t+1:]
         
-        # Calculate various metrics
-        blur_score = cv2.Laplacian(gray_face, cv2.CV_64F).var()
+        return [next(new_ids) if track_id is None else track_id for track_id in track_ids]
+    
+    def _propagate(self, gray: np.ndarray, track: Dict[str, Any]) -> Optional[Tuple[int, int, int, int]]:
+        """Find a track's face near its last position, or None if it was lost"""
+        template = track['template']
+        if template.size == 0:
+            return None
         
-        # Simple texture analysis
-        contrast = gray_face.std()
-        brightness = gray_face.mean()
+        x, y, w, h = (int(v) for v in track['box'])
+        margin_x, margin_y = int(w * self.search_margin), int(h * self.search_margin)
+        x0, y0 = max(0, x - margin_x), max(0, y - margin_y)
+        x1, y1 = min(gray.shape[1], x + w + margin_x), min(gray.shape[0], y + h + margin_y)
+        window = gray[y0:y1, x0:x1]
         
-        suspicious_factors = []
+        if window.shape[0] < template.shape[0] or window.shape[1] < template.shape[1]:
+            return None
         
-        # Heuristic checks
-        if blur_score < 100:
-            suspicious_factors.append("Low detail/blur")
-        if contrast < 20:
-            suspicious_factors.append("Low contrast")
-        if brightness < 50 or brightness > 200:
-            suspicious_factors.append("Unusual brightness")
+        scores = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+        _, best, _, location = cv2.minMaxLoc(scores)
+        if best < self.match_threshold:
+            return None
         
-        return {
-            'suspicious': len(suspicious_factors) > 1,
-            'reasons': suspicious_factors,
-            'metrics': {
-                'blur_score': blur_score,
-                'contrast': contrast,
-                'brightness': brightness
-            }
-        }
+        return (x0 + location[0], y0 + location[1], template.shape[1], template.shape[0])
     
-    def _summarize_face_analysis(self, face_data: List[Dict]) -> Dict[str, Any]:
+    def _summarize_face_analysis(self, metrics: FaceMetrics) -> Dict[str, Any]:
         """Summarize face analysis across all frames"""
-        total_faces = sum(frame['face_count'] for frame in face_data)
-        suspicious_faces = 0
-        all_reasons = []
-        
-        for frame in face_data:
-            for face in frame['faces']:
-                if face['analysis']['suspicious']:
-                    suspicious_faces += 1
-                    all_reasons.extend(face['analysis']['reasons'])
+        total_faces = metrics.size
+        flags = metrics.reason_flags()
+        suspicious = flags.sum(axis=1) > 1
+        suspicious_faces = int(suspicious.sum())
         
+        issues = flags[suspicious].any(axis=0)
         suspicious_ratio = suspicious_faces / max(total_faces, 1)
         
-        return {
+        summary = {
             'total_faces_detected': total_faces,
             'suspicious_faces': suspicious_faces,
             'suspicious_ratio': suspicious_ratio,
-            'common_issues': list(set(all_reasons)),
-            'likely_deepfake': suspicious_ratio > 0.5
+            'common_issues': [reason for reason, hit in zip(FACE_REASONS, issues) if hit],
+            'likely_deepfake': suspicious_ratio > 0.5,
+            'suspicious_frames': np.unique(metrics.frame_idx[suspicious]).tolist()
         }
+        
+        tracked = metrics.track_id >= 0
+        if tracked.any():
+            summary.update(self._summarize_tracks(metrics.track_id[tracked], metrics.frame_idx[tracked], suspicious[tracked]))
+        
+        return summary
+    
+    def _summarize_tracks(self, track_id: np.ndarray, frame_idx: np.ndarray, suspicious: np.ndarray) -> Dict[str, Any]:
+        """Per-person suspiciousness from track ids"""
+        ids, inverse = np.unique(track_id, return_inverse=True)
+        detections = np.bincount(inverse)
+        suspicious_detections = np.bincount(inverse, weights=suspicious.astype(np.float64)).astype(np.int64)
+        ratios = suspicious_detections / detections
+        
+        first_frame = np.full(len(ids), np.iinfo(np.int32).max)
+        last_frame = np.full(len(ids), -1)
+        np.minimum.at(first_frame, inverse, frame_idx)
+        np.maximum.at(last_frame, inverse, frame_idx)
+        
+        tracks = [
+            {
+                'track_id': int(ids[k]),
+                'detections': int(detections[k]),
+                'suspicious_detections': int(suspicious_detections[k]),
+                'suspicious_ratio': float(ratios[k]),
+                'first_frame': int(first_frame[k]),
+                'last_frame': int(last_frame[k]),
+                'suspicious': bool(ratios[k] > 0.5)
+            }
+            for k in range(len(ids))
+        ]
+        
+        return {
+            'total_tracks': len(ids),
+            'suspicious_tracks': int((ratios > 0.5).sum()),
+            'tracks': tracks
+        }
+
+def _detector_worker(options: Dict[str, Any]) -> DeepfakeDetector:
+    # Runs once per FramePool process
+    return DeepfakeDetector(**options)
+
+def _detect_chunk(detector: DeepfakeDetector, store: FrameStore, indices: List[int]):
+    return [detector._detect_frame(store[i]) for i in indices]
+
+class FaceStream:
+    def __init__(self, detector: DeepfakeDetector):
+        """Face analysis state for one clip, fed frame by frame in order
+
+        In tracking mode frames on the keyframe interval (or where a tracked
+        face was lost) get a cascade detection; the rest follow existing tracks.
+        """
+        self.detector = detector
+        self.metrics = FaceMetrics()
+        self.detection_runs = 0
+        self._index = 0
+        self._tracks = []
+        self._new_ids = itertools.count()
+    
+    def add(self, frame: np.ndarray, detection: Optional[Tuple[np.ndarray, np.ndarray]] = None):
+        """Analyze the next frame; detection may carry precomputed (boxes, stats)"""
+        i = self._index
+        self._index += 1
+        detector = self.detector
+        
+        if not detector.tracking:
+            boxes, stats = detection if detection is not None else detector._detect_frame(frame)
+            self.detection_runs += 1
+            self.metrics.append(i, boxes, stats)
+            return
+        
+        gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+        
+        if i % detector.keyframe_interval != 0:
+            if not self._tracks:
+                return
+            
+            propagated = [detector._propagate(gray, track) for track in self._tracks]
+            if all(box is not None for box in propagated):
+                boxes = np.array(propagated, dtype=np.int32).reshape(-1, 4)
+                for track, box in zip(self._tracks, boxes):
+                    track['box'] = box
+                self.metrics.append(i, boxes, face_region_stats(gray, boxes), [track['id'] for track in self._tracks])
+                return
+            
+            # A face was lost, so this frame gets a full detection
+            detection = None
+        
+        boxes, stats = detection if detection is not None else detector._detect_frame(frame)
+        self.detection_runs += 1
+        track_ids = detector._associate(self._tracks, boxes, self._new_ids)
+        self._tracks = [
+            {'id': track_id, 'box': box, 'template': gray[box[1]:box[1]+box[3], box[0]:box[0]+box[2]].copy()}
+            for track_id, box in zip(track_ids, boxes)
+        ]
+        self.metrics.append(i, boxes, stats, track_ids)
+    
+    def summary(self) -> Dict[str, Any]:
+        summary = self.detector._summarize_face_analysis(self.metrics)
+        summary['detection_runs'] = self.detection_runs
+        return summary
 
 class ComprehensiveAnalyzer:
-    def __init__(self):
-        self.deepfake_detector = DeepfakeDetector()
+    def __init__(self, **detector_options):
+        """detector_options are passed to DeepfakeDetector (workers, detect_max_side)"""
+        self.deepfake_detector = DeepfakeDetector(**detector_options)
+    
+    def close(self):
+        self.deepfake_detector.close()
     
     def analyze_video_authenticity(self, frames: List[np.ndarray], motion_data: dict) -> Dict[str, Any]:
         """Comprehensive analysis combining multiple detection methods"""
         
         # Face/deepfake analysis
-        face_analysis = self.deepfake_detector.detect_faces_in_frames(frames)
+        with telemetry.span('model', model='face_cascade'):
+            face_analysis = self.deepfake_detector.detect_faces_in_frames(frames)
+        return self.assess_authenticity(face_analysis, motion_data)
+    
+    def assess_authenticity(self, face_analysis: Dict[str, Any], motion_data: dict) -> Dict[str, Any]:
+        """Combine an existing face analysis with motion data into an authenticity score"""
         
         # Motion analysis summary
-        motion_suspicious = motion_data.get('anomaly_ratio', 0) > 0.2
+        motion_suspicious = motion_data.get('anomaly_ratio', 0) > SUSPICIOUS_ANOMALY_RATIO
         
         # Overall assessment
         authenticity_score = 1.0
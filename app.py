@@ -1,13 +1,269 @@
 import streamlit as st
 import tempfile
 import os
-from video_utils import VideoProcessor
-from captioning import FrameCaptioner
-from summarizer import StorySummarizer
-from feasibility import FeasibilityAnalyzer
-from analyzer import ComprehensiveAnalyzer
-import matplotlib.pyplot as plt
-from PIL import Image
+import logging
+import threading
+import time
+import shutil
+import uuid
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from config import load_pipeline_config, register_secret_provider
+from cache import config_fingerprint
+from pipeline import REPORTED_STAGES, AnalysisPipeline
+from jobs import queue_from_config
+from motion import as_motion_array
+from downloads import analysis_height, download_cache_from_config, save_upload, youtube_video_id
+from telemetry import configure_telemetry, summarize_records, telemetry
+from registry import (configure_registry, get_captioner, get_comprehensive_analyzer,
+                      get_feasibility_analyzer, get_summarizer, registry, warm_up)
+
+class StreamlitWarningHandler(logging.Handler):
+    """Surface library warnings (e.g. Gemini fallbacks) in the UI"""
+    def emit(self, record):
+        st.warning(self.format(record))
+
+def streamlit_secret(name):
+    return st.secrets.get(name)
+
+def setup_streamlit_integration():
+    """Wire Streamlit secrets and warnings into the UI-agnostic library modules"""
+    register_secret_provider(streamlit_secret)
+    
+    for name in ['feasibility', 'captioning', 'summarizer', 'analyzer', 'pipeline']:
+        logger = logging.getLogger(name)
+        if not any(isinstance(h, StreamlitWarningHandler) for h in logger.handlers):
+            handler = StreamlitWarningHandler(level=logging.WARNING)
+            logger.addHandler(handler)
+
+# Pipelines and download caches are shared by sessions too, but they aren't
+# models: they stay out of the model registry's memory budget and eviction
+@st.cache_resource(show_spinner=False)
+def shared_pipeline(fingerprint: str, _config) -> AnalysisPipeline:
+    """One pipeline per distinct config (fingerprint); its models come from the registry"""
+    return AnalysisPipeline(_config)
+
+@st.cache_resource(show_spinner=False)
+def shared_download_cache(fingerprint: str, _section):
+    """Shared so concurrent requests for one video download it once"""
+    return download_cache_from_config(_section)
+
+STAGE_STATUS = {
+    'frames': "🎞️ Frame extraction",
+    'motion_data': "🏃 Motion analysis",
+    'captions': "📝 Frame captioning",
+    'story': "📚 Story summary",
+    'tech_analysis': "🔬 Technical analysis",
+    'feasibility_result': "🎯 Feasibility analysis"
+}
+
+def render_frames(frames, error):
+    st.success(f"✅ Extracted {len(frames)} frames")
+    
+    # Display sample frames
+    if frames:
+        st.header("🎞️ Sample Frames")
+        cols = st.columns(min(5, len(frames)))
+        for i, frame in enumerate(frames[:5]):
+            with cols[i]:
+                st.image(frame, caption=f"Frame {i+1}", use_column_width=True)
+
+def render_motion(motion_data, error):
+    if error:
+        st.warning(f"Motion analysis failed: {error}")
+        return
+    
+    st.header("🏃 Motion Analysis")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Total Frames", motion_data['total_frames'])
+    with col2:
+        st.metric("Motion Anomalies", len(motion_data['anomalies']))
+    with col3:
+        st.metric("Anomaly Ratio", f"{motion_data['anomaly_ratio']:.2%}")
+    
+    # Per-frame magnitudes and scores come with the analysis; nothing is recomputed here
+    per_frame = as_motion_array(motion_data.get('per_frame'))
+    if len(per_frame) > 1:
+        st.line_chart({'Mean motion': per_frame['magnitude'], 'Anomaly score': per_frame['score']})
+    
+    if motion_data['anomalies']:
+        st.warning("⚠️ Suspicious motion patterns detected!")
+        with st.expander("View Motion Anomalies"):
+            for anomaly in motion_data['anomalies'][:5]:
+                score = f", score = {anomaly['score']:.1f}" if 'score' in anomaly else ""
+                st.write(f"Frame {anomaly['frame']}: Mean motion = {anomaly['mean_motion']:.2f}{score}")
+
+def render_captions(captions, error):
+    if error:
+        st.error(f"Frame captioning failed: {error}")
+        return
+    
+    st.header("📝 Frame Analysis")
+    with st.expander("View All Frame Captions"):
+        for caption in captions:
+            st.write(caption)
+
+def render_story(story, error):
+    if error:
+        st.error(f"Story summarization failed: {error}")
+        return
+    
+    st.header("📚 Story Summary")
+    st.info(story)
+
+def render_tech_analysis(tech_analysis, error):
+    if error:
+        st.error(f"Technical analysis failed: {error}")
+        return
+    
+    st.header("🔬 Technical Analysis")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Authenticity Score", f"{tech_analysis['authenticity_score']:.2f}")
+    with col2:
+        st.metric("Assessment", tech_analysis['overall_assessment'])
+    
+    # Face analysis details
+    face_data = tech_analysis['face_analysis']
+    if face_data['total_faces_detected'] > 0:
+        st.write(f"**Faces Detected:** {face_data['total_faces_detected']}")
+        st.write(f"**Suspicious Faces:** {face_data['suspicious_faces']}")
+        if 'total_tracks' in face_data:
+            st.write(f"**People Tracked:** {face_data['total_tracks']} ({face_data['suspicious_tracks']} suspicious)")
+        if face_data['common_issues']:
+            st.write(f"**Common Issues:** {', '.join(face_data['common_issues'])}")
+
+def render_feasibility(feasibility_result, error):
+    if error:
+        st.error(f"Feasibility analysis failed: {error}")
+        return
+    
+    st.header("🎯 Feasibility Analysis")
+    # Display verdict with appropriate styling
+    verdict = feasibility_result['verdict']
+    if "✅" in verdict:
+        st.success(f"**{verdict}**")
+    elif "❌" in verdict:
+        st.error(f"**{verdict}**")
+    else:
+        st.warning(f"**{verdict}**")
+    
+    st.write(f"**Explanation:** {feasibility_result['explanation']}")
+    if 'offline_score' in feasibility_result:
+        source = "clear-cut, so Gemini was skipped" if feasibility_result.get('prefiltered') else "Gemini was unavailable"
+        st.caption(f"Offline lexicon score {feasibility_result['offline_score']:.2f} ({source})")
+    
+    # Two-column analysis
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("✅ Why This May Look Real")
+        st.write(feasibility_result['looks_real'])
+    
+    with col2:
+        st.subheader("❌ Why This May Be Fake")
+        st.write(feasibility_result['looks_fake'])
+
+STAGE_RENDERERS = {
+    'frames': render_frames,
+    'motion_data': render_motion,
+    'captions': render_captions,
+    'story': render_story,
+    'tech_analysis': render_tech_analysis,
+    'feasibility_result': render_feasibility
+}
+
+def render_final_assessment(result):
+    motion_data = result['motion_data']
+    tech_analysis = result['tech_analysis']
+    feasibility_result = result['feasibility_result']
+    
+    st.header("📊 Final Assessment")
+    
+    # Create summary metrics
+    metrics = {
+        'Feasibility': feasibility_result['verdict'],
+        'Technical Authenticity': tech_analysis['overall_assessment'],
+        'Motion Anomalies': f"{motion_data['anomaly_ratio']:.1%}",
+        'Frames Analyzed': result['frames_analyzed']
+    }
+    
+    cols = st.columns(len(metrics))
+    for i, (key, value) in enumerate(metrics.items()):
+        with cols[i]:
+            st.metric(key, value)
+    
+    # Overall conclusion
+    st.subheader("🏁 Conclusion")
+    if "Not Feasible" in feasibility_result['verdict'] or tech_analysis['authenticity_score'] < 0.5:
+        st.error("⚠️ This video likely contains unrealistic or manipulated content.")
+    elif "Questionable" in feasibility_result['verdict'] or tech_analysis['authenticity_score'] < 0.7:
+        st.warning("⚠️ This video contains questionable elements that warrant further investigation.")
+    else:
+        st.success("✅ This video appears to show realistic, feasible events.")
+
+def render_job(queue, job_id):
+    """Progress or results of a queued analysis; returns True while it is still pending"""
+    job = queue.get(job_id)
+    if job is None:
+        st.warning("This analysis is no longer in the queue.")
+        del st.query_params['job']
+        return False
+    
+    st.header("🗂️ Queued Analysis")
+    st.caption(f"Job {job_id} (attempt {job['attempts']} of {job['max_attempts']})")
+    pending = job['status'] in ('queued', 'running')
+    
+    if job['status'] == 'queued':
+        st.info(f"⏳ Waiting for a worker ({queue.position(job_id)} jobs ahead)")
+        if job['error']:
+            st.warning(f"Retrying after: {job['error']}")
+    elif job['status'] == 'running':
+        done = job['stages_done']
+        st.progress(int(100 * len(done) / len(REPORTED_STAGES)))
+        st.text(", ".join(f"{STAGE_STATUS[name]} done" for name in done) or "🎞️ Analyzing video...")
+    elif job['status'] == 'done':
+        # Frames stay with the worker; everything else is in the stored result
+        result = job['result']
+        st.success(f"✅ Analysis complete! {result['frames_analyzed']} frames analyzed")
+        for name in REPORTED_STAGES[1:]:
+            STAGE_RENDERERS[name](result[name], result['errors'].get(name))
+        render_final_assessment(result)
+    elif job['status'] == 'failed':
+        st.error(f"❌ Analysis failed: {job['error']}")
+        # Failed uploads are kept for a while so they can be retried, but not forever
+        if queue.can_retry(job) and st.button("🔁 Retry Analysis"):
+            queue.retry(job_id)
+            st.rerun()
+    else:
+        st.warning("Analysis cancelled.")
+    
+    if pending and st.button("✖️ Cancel Analysis"):
+        queue.cancel(job_id)
+        st.rerun()
+    if not pending and st.button("📥 Analyze Another Video"):
+        del st.query_params['job']
+        st.rerun()
+    return pending
+
+def render_performance_panel(records):
+    """Stage and model timings plus counters collected during one analysis"""
+    summary = summarize_records(records)
+    with st.expander("⏱️ Performance", expanded=True):
+        rows = []
+        for span in sorted(summary['spans'], key=lambda s: -s['seconds']):
+            label = ", ".join(f"{k}={v}" for k, v in span['labels'].items())
+            rows.append({
+                'Span': f"{span['name']} ({label})" if label else span['name'],
+                'Calls': span['count'],
+                'Total (s)': round(span['seconds'], 3)
+            })
+        if rows:
+            st.table(rows)
+        else:
+            st.write("No stages ran; every result came from the cache.")
+        for counter in summary['counters']:
+            label = ", ".join(f"{k}={v}" for k, v in counter['labels'].items())
+            st.write(f"**{counter['name']}**{f' ({label})' if label else ''}: {counter['value']:g}")
 
 def main():
     st.set_page_config(
@@ -16,42 +272,48 @@ def main():
         layout="wide"
     )
     
+    setup_streamlit_integration()
+    
     st.title("🎬 Video Feasibility Checker")
     st.markdown("Upload a video or provide a YouTube link to analyze whether the events shown are realistically possible.")
     
-    # Initialize components with better error handling
-    @st.cache_resource
+    if 'pipeline_config' not in st.session_state:
+        st.session_state.pipeline_config = load_pipeline_config()
+    config = st.session_state.pipeline_config
+    
+    # Models live in the process-wide registry: loaded once on first use and
+    # shared by every session, instead of per session
+    configure_registry(config['models'])
+    configure_telemetry(config['telemetry'])
+    
     def load_captioner():
         try:
-            return FrameCaptioner()
+            return get_captioner(config)
         except Exception as e:
             st.error(f"Failed to load captioning model: {str(e)}")
             return None
     
-    @st.cache_resource  
     def load_summarizer():
         try:
-            return StorySummarizer()
+            return get_summarizer(config)
         except Exception as e:
             st.error(f"Failed to load summarization model: {str(e)}")
             return None
     
-    if 'video_processor' not in st.session_state:
-        st.session_state.video_processor = VideoProcessor()
-        
-    if 'captioner' not in st.session_state:
-        with st.spinner("Loading AI captioning model..."):
-            st.session_state.captioner = load_captioner()
-            
-    if 'summarizer' not in st.session_state:
-        with st.spinner("Loading summarization model..."):
-            st.session_state.summarizer = load_summarizer()
-            
-    if 'feasibility_analyzer' not in st.session_state:
-        st.session_state.feasibility_analyzer = FeasibilityAnalyzer()
-        
-    if 'comprehensive_analyzer' not in st.session_state:
-        st.session_state.comprehensive_analyzer = ComprehensiveAnalyzer()
+    try:
+        # One pipeline per distinct config, shared by sessions like the models it uses
+        pipeline = shared_pipeline(config_fingerprint(config), config)
+    except Exception as e:
+        st.error(f"Failed to set up the analysis pipeline: {str(e)}")
+        st.stop()
+    download_cache = shared_download_cache(config_fingerprint(config, ('downloads',)), config['downloads'])
+    
+    if config['models'].get('warm_up'):
+        with st.spinner("Loading AI models..."):
+            try:
+                warm_up(config)
+            except Exception as e:
+                st.error(f"Failed to load models: {str(e)}")
     
     # Input section
     st.header("📥 Input Video")
@@ -59,11 +321,16 @@ def main():
     # Add a test button for debugging
     if st.button("🧪 Test System (Debug)"):
         st.write("✅ Streamlit is working")
-        st.write(f"✅ Video processor: {type(st.session_state.video_processor).__name__}")
-        st.write(f"✅ Captioner: {type(st.session_state.captioner).__name__ if st.session_state.captioner else 'Failed'}")
-        st.write(f"✅ Summarizer: {type(st.session_state.summarizer).__name__ if st.session_state.summarizer else 'Failed'}")
-        st.write(f"✅ Feasibility analyzer: {type(st.session_state.feasibility_analyzer).__name__}")
-        st.write(f"✅ Comprehensive analyzer: {type(st.session_state.comprehensive_analyzer).__name__}")
+        captioner = load_captioner()
+        summarizer = load_summarizer()
+        try:
+            st.write(f"✅ Video processor: {type(pipeline.video_processor).__name__}")
+        except RuntimeError:
+            st.write("✅ Video processor: single-pass decode (frame_stream)")
+        st.write(f"✅ Captioner: {type(captioner).__name__ if captioner else 'Failed'}")
+        st.write(f"✅ Summarizer: {type(summarizer).__name__ if summarizer else 'Failed'}")
+        st.write(f"✅ Feasibility analyzer: {type(get_feasibility_analyzer(config)).__name__}")
+        st.write(f"✅ Comprehensive analyzer: {type(get_comprehensive_analyzer(config)).__name__}")
         
         # Test with a dummy frame
         import numpy as np
@@ -79,12 +346,23 @@ def main():
     video_path = None
     
     if input_method == "Upload Video File":
-        uploaded_file = st.file_uploader("Choose a video file", type=['mp4', 'avi', 'mov', 'mkv'])
+        # A new key clears the uploader once its file has been handed to the job queue
+        uploaded_file = st.file_uploader("Choose a video file", type=['mp4', 'avi', 'mov', 'mkv'],
+                                         key=f"upload_{st.session_state.get('upload_generation', 0)}")
         if uploaded_file is not None:
-            # Save uploaded file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp_file:
-                tmp_file.write(uploaded_file.read())
-                video_path = tmp_file.name
+            # Save uploaded file temporarily, in chunks and only once per upload rather than on every rerun
+            upload_id = getattr(uploaded_file, 'file_id', None) or f"{uploaded_file.name}:{uploaded_file.size}"
+            saved = st.session_state.get('saved_upload')
+            if saved and saved[0] == upload_id and os.path.exists(saved[1]):
+                video_path = saved[1]
+            else:
+                if saved and os.path.exists(saved[1]):
+                    os.unlink(saved[1])
+                suffix = os.path.splitext(uploaded_file.name)[1] or '.mp4'
+                with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
+                    save_upload(uploaded_file, tmp_file)
+                    video_path = tmp_file.name
+                st.session_state.saved_upload = (upload_id, video_path)
     else:
         youtube_url = st.text_input("Enter YouTube URL:")
         
@@ -93,14 +371,7 @@ def main():
             st.write(f"🔗 URL entered: {youtube_url}")
             
             # Validate YouTube URL format
-            valid_patterns = [
-                'youtube.com/watch?v=',
-                'youtu.be/',
-                'm.youtube.com/watch?v=',
-                'www.youtube.com/watch?v='
-            ]
-            
-            is_valid = any(pattern in youtube_url.lower() for pattern in valid_patterns)
+            is_valid = youtube_video_id(youtube_url) is not None
             
             if not is_valid:
                 st.warning("⚠️ Please enter a valid YouTube URL (e.g., https://www.youtube.com/watch?v=VIDEO_ID)")
@@ -118,7 +389,8 @@ def main():
                     # Add debug info
                     st.write("🔍 Starting download process...")
                     
-                    video_path = st.session_state.video_processor.download_youtube_video(youtube_url)
+                    # Cached by video ID, and no taller than the analysis will use
+                    video_path = download_cache.download(youtube_url, analysis_height(config))
                     
                     if video_path and os.path.exists(video_path):
                         st.success("✅ Video downloaded successfully!")
@@ -146,183 +418,67 @@ def main():
                 del st.session_state.downloaded_video_path
     
     # Analysis section
-    if video_path and st.button("🔍 Analyze Video"):
+    jobs_config = config['jobs']
+    job_pending = False
+    if jobs_config.get('enabled'):
+        # Analyses run in the worker service, so a refresh or a busy server doesn't lose them;
+        # the job ID lives in the URL and the page polls the queue until the job is finished
+        queue = queue_from_config(jobs_config)
+        if video_path and st.button("🔍 Analyze Video"):
+            os.makedirs(jobs_config['upload_dir'], exist_ok=True)
+            queued_path = os.path.join(jobs_config['upload_dir'], f"{uuid.uuid4().hex}{os.path.splitext(video_path)[1]}")
+            if download_cache.contains(video_path):
+                # Cached downloads stay for the next request; the job gets its own link,
+                # so evicting the cache entry can't pull the file from under a worker
+                download_cache.link_copy(video_path, queued_path)
+            else:
+                shutil.move(video_path, queued_path)
+                st.session_state.pop('saved_upload', None)
+                st.session_state.upload_generation = st.session_state.get('upload_generation', 0) + 1
+            st.query_params['job'] = queue.submit(queued_path, owned=True)
+            st.session_state.pop('downloaded_video_path', None)
+            st.rerun()
+        job_pending = 'job' in st.query_params and render_job(queue, st.query_params['job'])
+    
+    show_performance = not jobs_config.get('enabled') and st.checkbox("⏱️ Show performance panel", value=False)
+    if video_path and not jobs_config.get('enabled') and st.button("🔍 Analyze Video"):
         progress_bar = st.progress(0)
         status_text = st.empty()
         
+        # Spans from this thread only; recording stays off unless the panel or export needs it
+        records = telemetry.start_collecting() if show_performance else None
+        
         try:
-            # Step 1: Extract frames
-            status_text.text("🎞️ Extracting frames...")
-            progress_bar.progress(10)
-            
-            frames = st.session_state.video_processor.extract_frames(video_path)
-            st.success(f"✅ Extracted {len(frames)} frames")
-            progress_bar.progress(20)
-            
-            # Display sample frames
-            if frames:
-                st.header("🎞️ Sample Frames")
-                cols = st.columns(min(5, len(frames)))
-                for i, frame in enumerate(frames[:5]):
-                    with cols[i]:
-                        st.image(frame, caption=f"Frame {i+1}", use_column_width=True)
-            
-            # Step 2: Motion Analysis
-            status_text.text("🏃 Analyzing motion patterns...")
-            progress_bar.progress(30)
-            
-            try:
-                motion_data = st.session_state.video_processor.calculate_optical_flow(video_path)
-                
-                st.header("🏃 Motion Analysis")
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.metric("Total Frames", motion_data['total_frames'])
-                with col2:
-                    st.metric("Motion Anomalies", len(motion_data['anomalies']))
-                with col3:
-                    st.metric("Anomaly Ratio", f"{motion_data['anomaly_ratio']:.2%}")
-                
-                if motion_data['anomalies']:
-                    st.warning("⚠️ Suspicious motion patterns detected!")
-                    with st.expander("View Motion Anomalies"):
-                        for anomaly in motion_data['anomalies'][:5]:
-                            st.write(f"Frame {anomaly['frame']}: Mean motion = {anomaly['mean_motion']:.2f}")
-                            
-            except Exception as e:
-                st.warning(f"Motion analysis failed: {str(e)}")
-                motion_data = {'anomalies': [], 'total_frames': len(frames), 'anomaly_ratio': 0.0}
-            
-            progress_bar.progress(50)
-            
-            # Step 3: Frame Captioning
-            status_text.text("📝 Generating frame captions...")
-            
-            try:
-                captions = st.session_state.captioner.caption_frames(frames)
-                
-                st.header("📝 Frame Analysis")
-                with st.expander("View All Frame Captions"):
-                    for caption in captions:
-                        st.write(caption)
-                        
-            except Exception as e:
-                st.error(f"Frame captioning failed: {str(e)}")
-                captions = [f"Frame {i+1}: Unable to generate caption" for i in range(len(frames))]
-            
-            progress_bar.progress(70)
-            
-            # Step 4: Story Summarization
-            status_text.text("📚 Creating story summary...")
-            
-            try:
-                story = st.session_state.summarizer.create_story_from_captions(captions)
-                st.header("📚 Story Summary")
-                st.info(story)
-            except Exception as e:
-                st.error(f"Story summarization failed: {str(e)}")
-                story = " ".join(captions)  # Fallback to combined captions
-            
-            progress_bar.progress(80)
-            
-            # Step 5: Comprehensive Analysis
-            status_text.text("🔬 Performing technical analysis...")
-            
-            try:
-                tech_analysis = st.session_state.comprehensive_analyzer.analyze_video_authenticity(frames, motion_data)
-                
-                st.header("🔬 Technical Analysis")
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.metric("Authenticity Score", f"{tech_analysis['authenticity_score']:.2f}")
-                with col2:
-                    st.metric("Assessment", tech_analysis['overall_assessment'])
-                
-                # Face analysis details
-                face_data = tech_analysis['face_analysis']
-                if face_data['total_faces_detected'] > 0:
-                    st.write(f"**Faces Detected:** {face_data['total_faces_detected']}")
-                    st.write(f"**Suspicious Faces:** {face_data['suspicious_faces']}")
-                    if face_data['common_issues']:
-                        st.write(f"**Common Issues:** {', '.join(face_data['common_issues'])}")
-                        
-            except Exception as e:
-                st.error(f"Technical analysis failed: {str(e)}")
-                tech_analysis = {
-                    'authenticity_score': 0.5,
-                    'overall_assessment': 'Analysis unavailable',
-                    'face_analysis': {'total_faces_detected': 0, 'suspicious_faces': 0, 'common_issues': []}
-                }
+            # Sections are laid out up front and filled in as their stages finish,
+            # which may be out of order since independent stages run concurrently
+            sections = {name: st.container() for name in REPORTED_STAGES}
+            finished = []
             
-            progress_bar.progress(90)
+            def on_stage(name, value, error):
+                finished.append(name)
+                progress_bar.progress(int(100 * len(finished) / len(REPORTED_STAGES)))
+                status_text.text(f"{STAGE_STATUS[name]} done")
+                with sections[name]:
+                    STAGE_RENDERERS[name](value, error)
             
-            # Step 6: Feasibility Analysis with Gemini
-            status_text.text("🎯 Analyzing feasibility with AI...")
-            
-            try:
-                # Use enhanced analysis with frames if available
-                feasibility_result = st.session_state.feasibility_analyzer.analyze_with_frames(
-                    story, frames[:5], motion_data  # Pass first 5 frames for visual analysis
-                )
-                
-                st.header("🎯 Feasibility Analysis")
-                # Display verdict with appropriate styling
-                verdict = feasibility_result['verdict']
-                if "✅" in verdict:
-                    st.success(f"**{verdict}**")
-                elif "❌" in verdict:
-                    st.error(f"**{verdict}**")
-                else:
-                    st.warning(f"**{verdict}**")
-                
-                st.write(f"**Explanation:** {feasibility_result['explanation']}")
-                
-                # Two-column analysis
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.subheader("✅ Why This May Look Real")
-                    st.write(feasibility_result['looks_real'])
-                
-                with col2:
-                    st.subheader("❌ Why This May Be Fake")
-                    st.write(feasibility_result['looks_fake'])
-                    
-            except Exception as e:
-                st.error(f"Feasibility analysis failed: {str(e)}")
-                feasibility_result = {
-                    'verdict': '❓ Analysis Failed',
-                    'explanation': f'Could not complete analysis: {str(e)}',
-                    'looks_real': 'Analysis unavailable',
-                    'looks_fake': 'Analysis unavailable'
-                }
+            status_text.text("🎞️ Analyzing video...")
+            # Stage threads inherit this script run's context, so library warnings still reach the page
+            script_ctx = get_script_run_ctx()
+            # Other sessions' downloads must not evict this video mid-analysis
+            with download_cache.pinned(video_path):
+                result = pipeline.analyze(video_path, on_stage=on_stage,
+                                          thread_setup=lambda: add_script_run_ctx(threading.current_thread(), script_ctx))
             
             progress_bar.progress(100)
             status_text.text("✅ Analysis complete!")
             
-            # Final Summary
-            st.header("📊 Final Assessment")
-            
-            # Create summary metrics
-            metrics = {
-                'Feasibility': feasibility_result['verdict'],
-                'Technical Authenticity': tech_analysis['overall_assessment'],
-                'Motion Anomalies': f"{motion_data['anomaly_ratio']:.1%}",
-                'Frames Analyzed': len(frames)
-            }
+            if result['cache_hits']:
+                st.caption(f"♻️ Reused cached results for: {', '.join(result['cache_hits'])}")
             
-            cols = st.columns(len(metrics))
-            for i, (key, value) in enumerate(metrics.items()):
-                with cols[i]:
-                    st.metric(key, value)
+            render_final_assessment(result)
             
-            # Overall conclusion
-            st.subheader("🏁 Conclusion")
-            if "Not Feasible" in feasibility_result['verdict'] or tech_analysis['authenticity_score'] < 0.5:
-                st.error("⚠️ This video likely contains unrealistic or manipulated content.")
-            elif "Questionable" in feasibility_result['verdict'] or tech_analysis['authenticity_score'] < 0.7:
-                st.warning("⚠️ This video contains questionable elements that warrant further investigation.")
-            else:
-                st.success("✅ This video appears to show realistic, feasible events.")
+            if records is not None:
+                render_performance_panel(records)
         
         except Exception as e:
             st.error(f"❌ An error occurred during analysis: {str(e)}")
@@ -336,8 +492,8 @@ def main():
                     st.write(f"File size: {os.path.getsize(video_path)} bytes")
         
         finally:
-            # Cleanup temporary files
-            if video_path and os.path.exists(video_path):
+            # Cleanup temporary files; cached downloads are kept for repeated URLs
+            if video_path and os.path.exists(video_path) and not download_cache.contains(video_path):
                 try:
                     os.unlink(video_path)
                 except Exception as cleanup_error:
@@ -346,6 +502,10 @@ def main():
             # Clear progress indicators
             progress_bar.empty()
             status_text.empty()
+            
+            if records is not None:
+                telemetry.stop_collecting()
+            telemetry.flush()
     
     # Instructions and Information
     with st.sidebar:
@@ -361,10 +521,15 @@ def main():
         """)
         
         st.header("🔧 Configuration")
-        if st.button("🔄 Reset Models"):
-            for key in ['captioner', 'summarizer', 'feasibility_analyzer', 'comprehensive_analyzer']:
-                if key in st.session_state:
-                    del st.session_state[key]
+        st.caption(f"Profile: {config['profile']} (set FEASIBILITY_PROFILE to fast, balanced or quality)")
+        loaded = registry.loaded()
+        if loaded:
+            total_mb = sum(loaded.values()) / 1024 ** 2
+            st.caption(f"Loaded models: {len(loaded)} (~{total_mb:.0f} MB)")
+        if st.button("🔄 Unload Models"):
+            # Shared by all sessions; they reload on the next analysis. A session
+            # mid-analysis keeps its models (and their worker processes) until it's done.
+            registry.clear()
             st.rerun()
         
         st.header("⚙️ API Setup")
@@ -382,6 +547,10 @@ def main():
         
         Without API key, fallback analysis will be used.
         """)
+    
+    if job_pending:
+        time.sleep(jobs_config.get('poll_interval_sec', 1.0))
+        st.rerun()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
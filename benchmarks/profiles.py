@@ -0,0 +1,117 @@
+"""Latency and quality of each performance profile on sample videos
+
+Usage (from the repository root):
+    python -m benchmarks.profiles clip1.mp4 clip2.mp4 -o profiles.json
+
+Quality is reported relative to the "quality" profile: the mean word-overlap
+similarity of each frame's caption and of the final story.
+"""
+import argparse
+import json
+import sys
+import time
+from typing import Any, Dict, List
+
+from captioning import FrameCaptioner
+from config import PROFILES, load_pipeline_config
+from dedup import text_similarity
+from frame_stream import sample_video
+from summarizer import StorySummarizer
+
+REFERENCE_PROFILE = 'quality'
+
+def run_profile(profile: str, videos: Dict[str, list]) -> Dict[str, Any]:
+    """Load one profile's models and caption and summarize every video"""
+    config = load_pipeline_config(profile=profile)
+
+    start = time.perf_counter()
+    captioner = FrameCaptioner(**config['captioner'])
+    # No chunk cache, so every run does the full amount of work
+    summarizer = StorySummarizer(**config['summarizer'])
+    load_sec = time.perf_counter() - start
+
+    outputs = {}
+    caption_sec = summarize_sec = 0.0
+    frame_count = 0
+    for name, frames in videos.items():
+        start = time.perf_counter()
+        captions: List[str] = []
+        for i in range(0, len(frames), captioner.batch_size):
+            captions.extend(captioner.caption_batch(frames[i:i + captioner.batch_size]))
+        caption_sec += time.perf_counter() - start
+
+        start = time.perf_counter()
+        story = summarizer.create_story_from_captions([f"Frame {i + 1}: {c}" for i, c in enumerate(captions)])
+        summarize_sec += time.perf_counter() - start
+
+        frame_count += len(frames)
+        outputs[name] = {'captions': captions, 'story': story}
+
+    return {
+        'load_sec': round(load_sec, 3),
+        'caption_sec': round(caption_sec, 3),
+        'caption_ms_per_frame': round(1000 * caption_sec / max(frame_count, 1), 1),
+        'summarize_sec': round(summarize_sec, 3),
+        'outputs': outputs
+    }
+
+def compare(result: Dict[str, Any], reference: Dict[str, Any]) -> Dict[str, Any]:
+    """Speedup and output similarity of a profile against the reference profile"""
+    caption_scores = []
+    story_scores = []
+    for name, output in result['outputs'].items():
+        expected = reference['outputs'][name]
+        caption_scores.extend(text_similarity(a or '', b or '')
+                              for a, b in zip(output['captions'], expected['captions']))
+        story_scores.append(text_similarity(output['story'], expected['story']))
+
+    def ratio(key):
+        return round(reference[key] / result[key], 2) if result[key] else None
+
+    return {
+        'caption_speedup': ratio('caption_sec'),
+        'summarize_speedup': ratio('summarize_sec'),
+        'caption_similarity': round(sum(caption_scores) / max(len(caption_scores), 1), 3),
+        'story_similarity': round(sum(story_scores) / max(len(story_scores), 1), 3)
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('videos', nargs='+', help='Video files to benchmark on')
+    parser.add_argument('--profiles', nargs='+', default=list(PROFILES), choices=list(PROFILES))
+    parser.add_argument('-o', '--output', help='Write the JSON report here instead of stdout')
+    parser.add_argument('--keep-outputs', action='store_true', help='Include captions and stories in the report')
+    args = parser.parse_args(argv)
+
+    # Step 1: Decode once; every profile captions the same frames
+    base = load_pipeline_config()
+    videos = {path: sample_video(path, base['video'])[0] for path in args.videos}
+
+    # Step 2: Run each profile, the reference first
+    profiles = [REFERENCE_PROFILE] + [p for p in args.profiles if p != REFERENCE_PROFILE]
+    results = {}
+    for profile in profiles:
+        print(f"Running profile '{profile}'...", file=sys.stderr)
+        results[profile] = run_profile(profile, videos)
+
+    # Step 3: Deltas against the reference
+    report = {'reference': REFERENCE_PROFILE, 'frames': sum(len(f) for f in videos.values()), 'profiles': {}}
+    for profile in profiles:
+        if profile not in args.profiles:
+            continue
+        entry = {key: value for key, value in results[profile].items() if key != 'outputs'}
+        entry.update(compare(results[profile], results[REFERENCE_PROFILE]))
+        if args.keep_outputs:
+            entry['outputs'] = results[profile]['outputs']
+        report['profiles'][profile] = entry
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""Per-stage latency, throughput and peak memory on synthetic videos
+
+Usage (from the repository root):
+    python -m benchmarks.run -o bench.json
+    python -m benchmarks.run --resolutions 640x360 1920x1080 --durations 10 60 --repeat 5
+    python -m benchmarks.run --skip-models   # decode, motion, faces and Gemini only
+
+Each stage runs --repeat times per video and reports p50/p95 latency,
+throughput in frames per second and the process's peak RSS after the stage.
+Gemini is replaced by a stub model, so the feasibility stage measures key
+frame selection, encoding and parsing without network calls.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.synthetic import make_video
+from config import load_pipeline_config
+
+STAGES = ('extract_frames', 'calculate_optical_flow', 'sample_video', 'detect_faces',
+          'caption_frames', 'summarize', 'feasibility', 'lexicon')
+MODEL_STAGES = ('caption_frames', 'summarize')
+
+STUB_RESPONSE = """VERDICT: Feasible
+EXPLANATION: Synthetic benchmark response.
+LOOKS_REAL: Consistent motion.
+LOOKS_FAKE: Flat shading."""
+
+class StubResponse:
+    text = STUB_RESPONSE
+
+class StubGenerativeModel:
+    """Stands in for genai.GenerativeModel: fixed answer, no network"""
+    def generate_content(self, content):
+        return StubResponse()
+
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024, 1)
+
+def time_stage(fn: Callable[[], Any], repeat: int, items: int) -> Dict[str, Any]:
+    """Run fn repeat times; the last result is returned under 'result'"""
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        durations.append(time.perf_counter() - start)
+    p50, p95 = np.percentile(durations, [50, 95])
+    return {
+        'runs': repeat,
+        'items': items,
+        'p50_sec': round(float(p50), 4),
+        'p95_sec': round(float(p95), 4),
+        'mean_sec': round(float(np.mean(durations)), 4),
+        'throughput_per_sec': round(items / p50, 2) if p50 > 0 else None,
+        'peak_rss_mb': peak_rss_mb(),
+        'result': result
+    }
+
+def benchmark_video(path: str, config: Dict[str, Any], stages: List[str], repeat: int) -> Dict[str, Any]:
+    """Time every requested stage on one video, feeding each stage the previous outputs"""
+    from frame_stream import sample_video
+    results: Dict[str, Any] = {}
+
+    def record(name: str, fn: Callable[[], Any], items: int):
+        if name in stages:
+            results[name] = time_stage(fn, repeat, items)
+            return results[name].pop('result')
+        return fn()
+
+    try:
+        from video_utils import VideoProcessor
+        processor = VideoProcessor()
+    except ImportError:
+        processor = None
+        for name in ('extract_frames', 'calculate_optical_flow'):
+            if name in stages:
+                results[name] = {'skipped': 'video_utils.VideoProcessor is not available'}
+
+    # Step 1: Decoding and motion
+    if 'sample_video' in stages or processor is None:
+        frames, motion_data = record('sample_video', lambda: sample_video(path, config['video']), 1)
+    if processor is not None:
+        frames = record('extract_frames', lambda: processor.extract_frames(path), 1)
+        motion_data = record('calculate_optical_flow', lambda: processor.calculate_optical_flow(path), 1)
+    frame_count = len(frames)
+    for name in ('sample_video', 'extract_frames', 'calculate_optical_flow'):
+        if 'items' in results.get(name, {}):
+            # Decode stages process a whole video per run
+            results[name]['items'] = frame_count
+            p50 = results[name]['p50_sec']
+            results[name]['throughput_per_sec'] = round(frame_count / p50, 2) if p50 > 0 else None
+
+    # Step 2: Faces
+    from analyzer import DeepfakeDetector
+    detector = DeepfakeDetector(**config['faces'])
+    face_analysis = record('detect_faces', lambda: detector.detect_faces_in_frames(frames), frame_count)
+
+    # Step 3: Captions and story
+    captions = [f"Frame {i + 1}: a synthetic scene with moving shapes" for i in range(frame_count)]
+    if 'caption_frames' in stages:
+        from captioning import FrameCaptioner
+        start = time.perf_counter()
+        captioner = FrameCaptioner(**config['captioner'])
+        load_sec = time.perf_counter() - start
+        captions = record('caption_frames', lambda: captioner.caption_frames(frames), frame_count)
+        results['caption_frames']['load_sec'] = round(load_sec, 3)
+
+    story = " ".join(captions)
+    if 'summarize' in stages:
+        from summarizer import StorySummarizer
+        start = time.perf_counter()
+        summarizer = StorySummarizer(**config['summarizer'])
+        load_sec = time.perf_counter() - start
+        story = record('summarize', lambda: summarizer.create_story_from_captions(captions), len(captions))
+        results['summarize']['load_sec'] = round(load_sec, 3)
+
+    # Step 4: Feasibility with a stubbed Gemini model
+    if 'feasibility' in stages:
+        from feasibility import FeasibilityAnalyzer
+        analyzer = FeasibilityAnalyzer(**config['feasibility'], max_concurrency=1,
+                                       requests_per_minute=1e9, max_retries=0)
+        analyzer.model = analyzer.vision_model = StubGenerativeModel()
+        record('feasibility', lambda: analyzer.analyze_with_frames(story, frames, motion_data, face_analysis), 1)
+
+    # Step 5: Offline lexicon scoring, as a batch of copies of the story
+    if 'lexicon' in stages:
+        from lexicon import default_engine
+        engine = default_engine()
+        batch = 1000
+        record('lexicon', lambda: len(engine.score_many([story] * batch, [motion_data] * batch,
+                                                        [face_analysis] * batch)), batch)
+
+    return results
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--resolutions', nargs='+', default=['640x360', '1280x720'],
+                        help='Video sizes as WIDTHxHEIGHT')
+    parser.add_argument('--durations', nargs='+', type=float, default=[10.0], help='Video lengths in seconds')
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--faces', type=int, default=2, help='Synthetic faces per video')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per stage')
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--skip-models', action='store_true', help='Skip BLIP and BART stages')
+    parser.add_argument('--profile', help='Pipeline profile (default: FEASIBILITY_PROFILE or quality)')
+    parser.add_argument('--video-dir', help='Keep generated videos here instead of a temporary directory')
+    parser.add_argument('-o', '--output', help='Write the JSON report here instead of stdout')
+    args = parser.parse_args(argv)
+
+    stages = [s for s in args.stages if not (args.skip_models and s in MODEL_STAGES)]
+    config = load_pipeline_config(profile=args.profile)
+    workdir = args.video_dir or tempfile.mkdtemp(prefix='feasibility-bench-')
+
+    report = {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'profile': config['profile']
+        },
+        'cases': []
+    }
+
+    for resolution in args.resolutions:
+        width, height = (int(v) for v in resolution.lower().split('x'))
+        for duration in args.durations:
+            path = os.path.join(workdir, f"synthetic_{width}x{height}_{duration:g}s.mp4")
+            if not os.path.exists(path):
+                make_video(path, width, height, duration, args.fps, faces=args.faces)
+            print(f"Benchmarking {os.path.basename(path)}...", file=sys.stderr)
+            report['cases'].append({
+                'video': {'width': width, 'height': height, 'duration_sec': duration, 'fps': args.fps},
+                'stages': benchmark_video(path, config, stages, max(1, args.repeat))
+            })
+
+    report['peak_rss_mb'] = peak_rss_mb()
+    text = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""Synthetic test videos: moving shapes and cartoon faces, any size and length"""
+import os
+from typing import Iterator, Tuple
+
+import cv2
+import numpy as np
+
+def _draw_face(frame: np.ndarray, center: Tuple[int, int], size: int):
+    """A rough frontal face: skin-toned oval, dark eyes and brows, mouth"""
+    x, y = center
+    cv2.ellipse(frame, (x, y), (size, int(size * 1.3)), 0, 0, 360, (150, 180, 225), -1)
+    for dx in (-size // 2, size // 2):
+        cv2.circle(frame, (x + dx, y - size // 4), max(2, size // 7), (40, 30, 30), -1)
+        cv2.line(frame, (x + dx - size // 4, y - size // 2), (x + dx + size // 4, y - size // 2), (60, 50, 50), 3)
+    cv2.ellipse(frame, (x, y + size // 2), (size // 3, size // 8), 0, 0, 180, (60, 60, 150), -1)
+
+def iter_frames(width: int, height: int, count: int, faces: int = 1, shapes: int = 4,
+                seed: int = 0) -> Iterator[np.ndarray]:
+    """BGR frames of shapes and faces drifting over a gradient background, one at a time"""
+    rng = np.random.default_rng(seed)
+    background = np.zeros((height, width, 3), dtype=np.uint8)
+    background[:] = np.linspace(40, 200, width, dtype=np.uint8)[None, :, None]
+
+    scale = min(width, height)
+    movers = [{
+        'pos': rng.uniform([0, 0], [width, height]),
+        'vel': rng.uniform(-0.02, 0.02, 2) * scale,
+        'size': int(rng.uniform(0.05, 0.12) * scale),
+        'color': tuple(int(c) for c in rng.integers(0, 255, 3)),
+        'face': i < faces
+    } for i in range(faces + shapes)]
+
+    for index in range(count):
+        frame = background.copy()
+        for mover in movers:
+            mover['pos'] = (mover['pos'] + mover['vel']) % [width, height]
+            x, y = (int(v) for v in mover['pos'])
+            if mover['face']:
+                _draw_face(frame, (x, y), max(12, mover['size']))
+            elif index % 2:
+                cv2.rectangle(frame, (x, y), (x + mover['size'], y + mover['size']), mover['color'], -1)
+            else:
+                cv2.circle(frame, (x, y), mover['size'] // 2, mover['color'], -1)
+        yield frame
+
+def make_video(path: str, width: int = 640, height: int = 360, duration_sec: float = 10.0,
+               fps: int = 30, faces: int = 1, seed: int = 0) -> str:
+    """Write a synthetic mp4 and return its path"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open video writer for {path}")
+    try:
+        for frame in iter_frames(width, height, int(duration_sec * fps), faces=faces, seed=seed):
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
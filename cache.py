@@ -0,0 +1,253 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from telemetry import telemetry
+
+# Config sections each stage's output depends on. Changing the summarizer
+# must not throw away cached motion data or captions. Decoded frames are
+# never cached whole, only downscaled 'thumbnails' for display and Gemini.
+STAGE_CONFIG_SECTIONS = {
+    'thumbnails': ('video',),
+    'motion_data': ('video',),
+    'captions': ('video', 'captioner', 'dedup'),
+    'story': ('video', 'captioner', 'dedup', 'summarizer'),
+    'tech_analysis': ('video', 'faces'),
+    'feasibility_result': ('video', 'captioner', 'dedup', 'summarizer', 'faces', 'feasibility')
+}
+
+_MISSING = object()
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Content hash of a file, read in chunks so large videos aren't loaded into memory"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def config_fingerprint(config: Dict[str, Any], sections=None) -> str:
+    """Stable hash of the given config sections (or the whole config)"""
+    if sections is not None:
+        config = {name: config.get(name) for name in sections}
+    payload = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def cache_from_config(section: Dict[str, Any]) -> Optional['ResultCache']:
+    """Build a cache from a config section, or None when it is disabled"""
+    if not section.get('enabled'):
+        return None
+    return ResultCache(section['dir'], section['max_bytes'], section.get('ttl'))
+
+class ResultCache:
+    def __init__(self, root: str, max_bytes: int = 2 * 1024 ** 3, ttl: Optional[float] = None):
+        """On-disk, size-bounded LRU cache of pickled pipeline results
+
+        Entries older than ttl seconds (if set) are treated as misses. A file's
+        mtime records when it was written and its atime when it was last used.
+        Safe to share between the threads of concurrent stages.
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+        self._size = self._scan_size()
+
+    def stage_key(self, video_hash: str, stage: str, config: Dict[str, Any]) -> str:
+        """Key for one stage's output of one video under one config"""
+        sections = STAGE_CONFIG_SECTIONS.get(stage)
+        return f"{video_hash}-{stage}-{config_fingerprint(config, sections)[:16]}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.pkl")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the cached value, marking it as recently used"""
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+            written = stat.st_mtime
+            if self.ttl is not None and time.time() - written > self.ttl:
+                self._expire(path, stat.st_size)
+                return default
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self._count('misses')
+            return default
+
+        try:
+            # Set atime explicitly so LRU works on noatime mounts too
+            os.utime(path, (time.time(), written))
+        except OSError:
+            pass
+        self._count('hits')
+        return value
+
+    def _count(self, *names: str):
+        with self._lock:
+            for name in names:
+                self.stats[name] += 1
+
+    def _expire(self, path: str, size: int):
+        """Drop an expired entry, counting one expired miss however the unlink goes"""
+        with self._lock:
+            self.stats['expired'] += 1
+            self.stats['misses'] += 1
+            try:
+                os.unlink(path)
+            except OSError:
+                return  # already gone, e.g. evicted or expired by another thread
+            self._size -= size
+
+    def contains(self, key: str) -> bool:
+        """Whether get(key) would hit, without reading the entry or counting a hit"""
+        try:
+            written = os.stat(self._path(key)).st_mtime
+        except OSError:
+            return False
+        return self.ttl is None or time.time() - written <= self.ttl
+
+    def put(self, key: str, value: Any):
+        """Store a value atomically, then evict old entries if over budget"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            size = os.path.getsize(tmp_path)
+            with self._lock:
+                # Overwriting a key replaces its bytes rather than adding to them
+                try:
+                    old_size = os.path.getsize(path)
+                except OSError:
+                    old_size = 0
+                os.replace(tmp_path, path)
+                self._size += size - old_size
+                if self._size > self.max_bytes:
+                    self._evict()
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def get_or_compute(self, video_hash: str, stage: str, config: Dict[str, Any],
+                       compute: Callable[[], Any],
+                       should_cache: Optional[Callable[[Any], bool]] = None) -> Any:
+        """Return a stage's cached output, computing and storing it on a miss
+
+        should_cache can reject results that must not be reused, such as
+        fallback verdicts produced while an API was unavailable.
+        """
+        key = self.stage_key(video_hash, stage, config)
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        value = compute()
+        if should_cache is None or should_cache(value):
+            self.put(key, value)
+        return value
+
+    def _entries(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith('.pkl'):
+                    path = os.path.join(dirpath, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat.st_size, stat.st_atime
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits its budget (call under the lock)"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+                self.stats['evictions'] += 1
+            except OSError:
+                pass
+
+        self._size = total
+
+    def clear(self):
+        """Remove every cached entry"""
+        with self._lock:
+            for path, _, _ in list(self._entries()):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            self._size = 0
+
+class PipelineRun:
+    def __init__(self, cache, video_hash: Optional[str], config: Dict[str, Any]):
+        """Per-video bookkeeping: stage cache access, errors and fallbacks
+
+        Once any stage has fallen back, later results are still computed but
+        no longer cached, since they were derived from degraded inputs.
+        Stages running on different threads share one PipelineRun.
+        """
+        self.cache = cache if video_hash is not None else None
+        self.video_hash = video_hash
+        self.config = config
+        self.errors: Dict[str, str] = {}
+        self.cache_hits: List[str] = []
+        self.degraded: List[str] = []
+        self._lock = threading.Lock()
+
+    def has(self, stage: str) -> bool:
+        """Whether a stage's output is cached, without loading it"""
+        return self.cache is not None and self.cache.contains(
+            self.cache.stage_key(self.video_hash, stage, self.config))
+
+    def lookup(self, stage: str) -> Any:
+        if self.cache is None:
+            return _MISSING
+        value = self.cache.get(self.cache.stage_key(self.video_hash, stage, self.config), _MISSING)
+        if value is not _MISSING:
+            with self._lock:
+                self.cache_hits.append(stage)
+        telemetry.incr('cache_hits' if value is not _MISSING else 'cache_misses', stage=stage)
+        return value
+
+    def store(self, stage: str, value: Any, should_cache: Optional[Callable[[Any], bool]] = None):
+        with self._lock:
+            degraded = bool(self.degraded)
+        if self.cache is None or degraded:
+            return
+        if should_cache is None or should_cache(value):
+            self.cache.put(self.cache.stage_key(self.video_hash, stage, self.config), value)
+
+    def cached(self, stage: str, compute: Callable[[], Any], should_cache=None) -> Any:
+        value = self.lookup(stage)
+        if value is _MISSING:
+            with telemetry.span('stage', stage=stage):
+                value = compute()
+            self.store(stage, value, should_cache)
+        return value
+
+    def fail(self, stage: str, error: Exception):
+        with self._lock:
+            self.errors[stage] = str(error)
+            self.degraded.append(stage)
+        telemetry.incr('stage_fallbacks', stage=stage)
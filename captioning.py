@@ -1,40 +1,178 @@
-import torch
-from transformers import BlipProcessor, BlipForConditionalGeneration
 from PIL import Image
 import numpy as np
-from typing import List
+import os
+import threading
+import weakref
+from typing import Any, Dict, List, Optional
+from frame_store import FramePool, FrameStore
+from telemetry import telemetry
+
+PRECISIONS = ("fp32", "bf16", "int8")
 
 class FrameCaptioner:
-    def __init__(self, model_name: str = "Salesforce/blip-image-captioning-base"):
-        """Initialize BLIP model for image captioning"""
+    def __init__(self, model_name: str = "Salesforce/blip-image-captioning-base",
+                 batch_size: int = 8, num_beams: int = 5, max_length: int = 50,
+                 precision: str = "fp32", processes: int = 0):
+        """Initialize BLIP model for image captioning
+
+        precision selects the execution mode: "fp32", "bf16" (bfloat16 weights
+        and activations) or "int8" (dynamic quantization of Linear layers, CPU only).
+
+        processes > 1 captions FrameStores in that many worker processes, each
+        with its own copy of the model and a share of the CPU threads; they
+        read frames from the store in place. Worth it on many-core CPUs,
+        where one generate() call doesn't use every core.
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}', expected one of {PRECISIONS}")
+
+        # Heavy imports are deferred so importing this module stays cheap
+        import torch
+        from transformers import BlipProcessor, BlipForConditionalGeneration
+
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.batch_size = max(1, batch_size)
+        self.num_beams = num_beams
+        self.max_length = max_length
+        self.precision = precision
+        self.processes = processes
+        self._options = {'model_name': model_name, 'batch_size': batch_size, 'num_beams': num_beams,
+                         'max_length': max_length, 'precision': precision}
+        self._pool = None
+        self._pool_finalizer = None
+        # The registry shares one captioner between sessions, which may start the pool together
+        self._pool_lock = threading.Lock()
+        self.dtype = torch.float32
+
         self.processor = BlipProcessor.from_pretrained(model_name)
-        self.model = BlipForConditionalGeneration.from_pretrained(model_name).to(self.device)
-    
+        model = BlipForConditionalGeneration.from_pretrained(model_name)
+
+        if precision == "int8":
+            # Dynamic quantization only has CPU kernels
+            self.device = torch.device("cpu")
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        elif precision == "bf16":
+            self.dtype = torch.bfloat16
+            model = model.to(self.dtype)
+
+        self.model = model.to(self.device).eval()
+
+    def _generate(self, images: List[Image.Image]) -> List[str]:
+        """Run one forward pass over a stack of images"""
+        import torch
+
+        inputs = self.processor(images=images, return_tensors="pt").to(self.device)
+        inputs["pixel_values"] = inputs["pixel_values"].to(self.dtype)
+
+        with telemetry.span('model', model='blip'), torch.no_grad():
+            out = self.model.generate(**inputs, max_length=self.max_length, num_beams=self.num_beams)
+
+        return self.processor.batch_decode(out, skip_special_tokens=True)
+
     def caption_frame(self, frame: np.ndarray) -> str:
         """Generate caption for a single frame"""
         # Convert numpy array to PIL Image
         image = Image.fromarray(frame)
-        
-        # Process image
-        inputs = self.processor(image, return_tensors="pt").to(self.device)
-        
-        # Generate caption
-        with torch.no_grad():
-            out = self.model.generate(**inputs, max_length=50, num_beams=5)
-            caption = self.processor.decode(out[0], skip_special_tokens=True)
-        
-        return caption
-    
-    def caption_frames(self, frames: List[np.ndarray]) -> List[str]:
-        """Generate captions for multiple frames"""
-        captions = []
+        return self._generate([image])[0]
+
+    def caption_batch(self, frames: List[np.ndarray]) -> List[Optional[str]]:
+        """Caption a batch of frames in one pass, isolating per-frame failures
+
+        Returns one entry per frame: the caption, or an error message prefixed
+        with "Error generating caption" for frames that could not be processed.
+        """
+        results: List[Optional[str]] = [None] * len(frames)
+        images = []
+        positions = []
+
         for i, frame in enumerate(frames):
             try:
-                caption = self.caption_frame(frame)
-                captions.append(f"Frame {i+1}: {caption}")
+                images.append(Image.fromarray(frame))
+                positions.append(i)
             except Exception as e:
-                captions.append(f"Frame {i+1}: Error generating caption - {str(e)}")
-        
+                results[i] = f"Error generating caption - {str(e)}"
+
+        if not images:
+            return results
+
+        try:
+            for pos, caption in zip(positions, self._generate(images)):
+                results[pos] = caption
+        except Exception:
+            # Re-run frame by frame so one bad frame doesn't fail the whole batch
+            for pos, image in zip(positions, images):
+                try:
+                    results[pos] = self._generate([image])[0]
+                except Exception as e:
+                    results[pos] = f"Error generating caption - {str(e)}"
+
+        errors = sum(1 for result in results if result and result.startswith("Error generating caption"))
+        if errors:
+            telemetry.incr('caption_errors', errors)
+        return results
+
+    def caption_store(self, store: FrameStore, indices: Optional[List[int]] = None) -> List[Optional[str]]:
+        """caption_batch results for store[i] for each of indices (default: every frame)"""
+        indices = list(range(len(store))) if indices is None else list(indices)
+        if self.processes > 1 and len(indices) > self.batch_size:
+            results = list(self._process_pool().map(_caption_chunk, store, indices, chunks_per_process=1))
+            # Workers have their own telemetry; count their errors here
+            errors = sum(1 for result in results if result and result.startswith("Error generating caption"))
+            if errors:
+                telemetry.incr('caption_errors', errors)
+            return results
+
+        results = []
+        for start in range(0, len(indices), self.batch_size):
+            results.extend(self.caption_batch([store[i] for i in indices[start:start + self.batch_size]]))
+        return results
+
+    def _process_pool(self) -> FramePool:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = FramePool(self.processes, _captioner_worker, (self._options, self.processes))
+                # Stop the workers once the last holder of this captioner lets go of it
+                self._pool_finalizer = weakref.finalize(self, self._pool.shutdown, wait=False)
+            return self._pool
+
+    def close(self):
+        """Stop the caption worker processes, if any; they restart on the next caption_store"""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+            if self._pool_finalizer is not None:
+                self._pool_finalizer.detach()
+                self._pool_finalizer = None
+        if pool is not None:
+            pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def caption_frames(self, frames: List[np.ndarray]) -> List[str]:
+        """Generate captions for multiple frames"""
+        if isinstance(frames, FrameStore):
+            return [f"Frame {i + 1}: {caption}" for i, caption in enumerate(self.caption_store(frames))]
+
+        captions = []
+        for start in range(0, len(frames), self.batch_size):
+            batch = frames[start:start + self.batch_size]
+            for offset, caption in enumerate(self.caption_batch(batch)):
+                captions.append(f"Frame {start + offset + 1}: {caption}")
+
         return captions
 
+def _captioner_worker(options: Dict[str, Any], processes: int) -> FrameCaptioner:
+    # Runs once per FramePool process; the processes split the cores between them
+    import torch
+    torch.set_num_threads(max(1, (os.cpu_count() or processes) // processes))
+    return FrameCaptioner(**options)
+
+def _caption_chunk(captioner: FrameCaptioner, store: FrameStore, indices: List[int]) -> List[Optional[str]]:
+    results = []
+    for start in range(0, len(indices), captioner.batch_size):
+        results.extend(captioner.caption_batch([store[i] for i in indices[start:start + captioner.batch_size]]))
+    return results
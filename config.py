@@ -0,0 +1,216 @@
+import copy
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+CACHE_ROOT = os.path.join(os.path.expanduser('~'), '.cache', 'feasibility-checker')
+
+# Every setting that changes what the pipeline produces lives here, so the
+# result cache can key on it and the UI/CLI can share one definition.
+DEFAULT_PIPELINE_CONFIG: Dict[str, Any] = {
+    'video': {
+        # Decode once into bounded per-stage queues instead of a list of frames
+        'streaming': False,
+        # Sample frames and compute optical flow in the same decode
+        'single_pass': True,
+        # Seek to at most max_frames targets instead of decoding every frame,
+        # widening the interval on long videos; frame_max_side downscales them
+        'sparse': False,
+        'max_frames': 60,
+        'frame_max_side': None,
+        'interval_sec': 2.0,
+        'buffer_size': 8,
+        # Optical flow runs on a Gaussian pyramid level no larger than this;
+        # a flow measurement is anomalous above this robust (median/MAD) z-score
+        'motion_max_side': 320,
+        'motion_threshold': 3.5
+    },
+    'captioner': {
+        'model_name': 'Salesforce/blip-image-captioning-base',
+        'batch_size': 8,
+        'num_beams': 5,
+        'max_length': 50,
+        'precision': 'fp32',
+        # Worker processes reading frames from a shared FrameStore (0: caption in-process)
+        'processes': 0
+    },
+    # Caption one frame per run of near-identical frames (see dedup.py)
+    'dedup': {
+        'enabled': True,
+        'hash_distance': 6,
+        'text_threshold': 0.8
+    },
+    'summarizer': {
+        'model_name': 'facebook/bart-large-cnn',
+        'num_beams': None,  # None keeps the model's own generation setting
+        'precision': 'fp32',
+        'chunk_tokens': 900,
+        'batch_size': 4,
+        'max_length': 150,
+        'min_length': 30
+    },
+    'faces': {
+        'workers': 1,
+        'detect_max_side': None,
+        'tracking': False,
+        'keyframe_interval': 5,
+        'processes': 0
+    },
+    'feasibility': {
+        'model_name': 'gemini-1.5-flash',
+        'max_frames': 5,
+        'image_byte_budget': 1_000_000,
+        'image_max_side': 768,
+        # Score every request offline first (see lexicon.py) and only ask
+        # Gemini when the 0..1 score lands between prefilter_low and prefilter_high
+        'prefilter': False,
+        'prefilter_low': 0.2,
+        'prefilter_high': 0.9
+    },
+    # Shared model registry (see registry.py); doesn't change results
+    'models': {
+        'memory_budget_mb': None,
+        'warm_up': False
+    },
+    # Concurrent stage execution within one analysis (see dag.py); doesn't change results
+    'executor': {
+        'max_workers': 4,
+        # Where frames are shared with captioner/faces worker processes: 'shm' or 'mmap'
+        'frame_store': 'shm',
+        'frame_store_dir': None
+    },
+    # Spans and counters (see telemetry.py); off by default
+    'telemetry': {
+        'enabled': False,
+        'json_log': None,
+        'prometheus_file': None
+    },
+    # Durable job queue and worker processes (see jobs.py); doesn't change results.
+    # When enabled, the UI submits analyses to the queue instead of running them inline.
+    'jobs': {
+        'enabled': False,
+        'db_path': os.path.join(CACHE_ROOT, 'jobs.db'),
+        'upload_dir': os.path.join(CACHE_ROOT, 'uploads'),
+        'max_attempts': 3,
+        'retry_delay_sec': 10.0,
+        'lease_sec': 300.0,
+        # Finished jobs (and uploads of failed ones, kept for retries) are purged after this
+        'retention_sec': 86400.0,
+        'poll_interval_sec': 1.0
+    },
+    # Client limits only; they don't change results, so they're not part of any cache key
+    'gemini': {
+        'max_concurrency': 4,
+        'requests_per_minute': 15,
+        'max_retries': 4
+    },
+    'cache': {
+        'enabled': True,
+        'dir': os.path.join(CACHE_ROOT, 'results'),
+        'max_bytes': 2 * 1024 ** 3
+    },
+    # Raw Gemini responses, keyed on the normalized prompt and frame hashes
+    'response_cache': {
+        'enabled': True,
+        'dir': os.path.join(CACHE_ROOT, 'responses'),
+        'max_bytes': 64 * 1024 ** 2,
+        'ttl': 7 * 24 * 3600
+    },
+    # YouTube downloads, keyed by video ID; max_height caps the downloaded
+    # resolution (video.frame_max_side lowers it further)
+    'downloads': {
+        'dir': os.path.join(CACHE_ROOT, 'downloads'),
+        'max_bytes': 5 * 1024 ** 3,
+        'max_height': 720
+    },
+    # Per-chunk summaries from the map step of StorySummarizer
+    'summary_cache': {
+        'enabled': True,
+        'dir': os.path.join(CACHE_ROOT, 'summaries'),
+        'max_bytes': 64 * 1024 ** 2
+    }
+}
+
+# Named speed/quality tradeoffs, applied on top of the defaults. "quality"
+# is the defaults themselves; the others swap in distilled or quantized
+# models and cheaper decoding for CPU-only nodes.
+PROFILES: Dict[str, Dict[str, Any]] = {
+    'fast': {
+        'captioner': {'num_beams': 1, 'max_length': 30, 'precision': 'int8'},
+        'summarizer': {'model_name': 'sshleifer/distilbart-cnn-6-6', 'num_beams': 1,
+                       'max_length': 100, 'precision': 'int8'},
+        'feasibility': {'prefilter': True}
+    },
+    'balanced': {
+        'captioner': {'num_beams': 3, 'max_length': 40, 'precision': 'int8'},
+        'summarizer': {'model_name': 'sshleifer/distilbart-cnn-12-6', 'num_beams': 2, 'max_length': 130}
+    },
+    'quality': {}
+}
+
+def _merge(base: Dict[str, Any], overrides: Dict[str, Any]) -> Dict[str, Any]:
+    """Recursively merge overrides into a copy of base"""
+    merged = copy.deepcopy(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+def load_pipeline_config(overrides: Optional[Dict[str, Any]] = None, profile: Optional[str] = None) -> Dict[str, Any]:
+    """Build the pipeline config from defaults, a profile, an optional JSON file and overrides
+
+    The profile comes from the argument or FEASIBILITY_PROFILE (default
+    "quality"). The JSON file is read from the path in FEASIBILITY_CONFIG; the
+    base directory for all caches can also be set with FEASIBILITY_CACHE_DIR.
+    """
+    profile = profile or os.getenv('FEASIBILITY_PROFILE') or 'quality'
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile '{profile}', expected one of {tuple(PROFILES)}")
+    config = _merge(DEFAULT_PIPELINE_CONFIG, PROFILES[profile])
+    config['profile'] = profile
+
+    config_path = os.getenv('FEASIBILITY_CONFIG')
+    if config_path:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = _merge(config, json.load(f))
+
+    cache_dir = os.getenv('FEASIBILITY_CACHE_DIR')
+    if cache_dir:
+        config['cache']['dir'] = os.path.join(cache_dir, 'results')
+        config['response_cache']['dir'] = os.path.join(cache_dir, 'responses')
+        config['summary_cache']['dir'] = os.path.join(cache_dir, 'summaries')
+        config['downloads']['dir'] = os.path.join(cache_dir, 'downloads')
+        config['jobs']['db_path'] = os.path.join(cache_dir, 'jobs.db')
+        config['jobs']['upload_dir'] = os.path.join(cache_dir, 'uploads')
+
+    if overrides:
+        config = _merge(config, overrides)
+
+    return config
+
+# Extra places to look up secrets after the environment, e.g. Streamlit's
+# st.secrets when running inside the UI. Library code never imports streamlit.
+_secret_providers: List[Callable[[str], Optional[str]]] = []
+
+def register_secret_provider(provider: Callable[[str], Optional[str]]):
+    """Add a lookup function consulted by get_secret after os.environ"""
+    if provider not in _secret_providers:
+        _secret_providers.append(provider)
+
+def get_secret(name: str, default: Optional[str] = None) -> Optional[str]:
+    """Read a secret from the environment, then from registered providers"""
+    value = os.getenv(name)
+    if value:
+        return value
+
+    for provider in _secret_providers:
+        try:
+            value = provider(name)
+        except Exception:
+            continue
+        if value:
+            return value
+
+    return default
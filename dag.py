@@ -0,0 +1,73 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from telemetry import telemetry
+
+class Stage(NamedTuple):
+    name: str
+    fn: Callable[..., Any]                            # called with the deps' results, in order
+    deps: Tuple[str, ...]
+    fallback: Optional[Callable[..., Any]]            # called with (error, *dep results)
+
+class StageGraph:
+    def __init__(self):
+        """Stages with data dependencies, run concurrently as soon as their inputs exist
+
+        Work runs on a thread pool; OpenCV and torch release the GIL, so
+        independent stages overlap. A stage that raises uses its fallback's
+        value if it has one; otherwise the error stops the run once the
+        stages already running have finished.
+        """
+        self.stages: Dict[str, Stage] = {}
+
+    def add(self, name: str, fn: Callable[..., Any], deps: Tuple[str, ...] = (),
+            fallback: Optional[Callable[..., Any]] = None):
+        missing = [dep for dep in deps if dep not in self.stages]
+        if missing:
+            raise ValueError(f"Stage '{name}' depends on unknown stages: {missing}")
+        self.stages[name] = Stage(name, fn, tuple(deps), fallback)
+
+    @staticmethod
+    def _call(stage: Stage, args: list, records, thread_setup) -> Any:
+        # Spans recorded on pool threads still reach the caller's collector
+        telemetry.attach(records)
+        if thread_setup is not None:
+            thread_setup()
+        try:
+            return stage.fn(*args)
+        except Exception as e:
+            if stage.fallback is None:
+                raise
+            return stage.fallback(e, *args)
+        finally:
+            telemetry.attach(None)
+
+    def run(self, max_workers: int = 4, on_result: Optional[Callable[[str, Any], None]] = None,
+            thread_setup: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        """Run every stage and return their results by name
+
+        on_result is called on the calling thread as each stage finishes, so
+        it can safely update a UI. thread_setup runs on the worker thread
+        before each stage, e.g. to attach a UI framework's thread context.
+        """
+        results: Dict[str, Any] = {}
+        pending = dict(self.stages)
+        running = {}
+        records = telemetry.collecting()
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='stage') as pool:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    if all(dep in results for dep in stage.deps):
+                        args = [results[dep] for dep in stage.deps]
+                        running[pool.submit(self._call, stage, args, records, thread_setup)] = name
+                        del pending[name]
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    results[name] = future.result()
+                    if on_result is not None:
+                        on_result(name, results[name])
+
+        return results
@@ -0,0 +1,126 @@
+import re
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from frame_hash import dhash, hamming
+from frame_store import FrameStore
+
+class Segment(NamedTuple):
+    start: int  # first frame index, inclusive
+    end: int    # last frame index, inclusive
+
+def _format_time(seconds: float) -> str:
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    return f"{minutes}:{seconds:02d}"
+
+def text_similarity(a: str, b: str) -> float:
+    """Jaccard similarity of the two captions' word sets"""
+    words_a = set(re.findall(r'\w+', a.lower()))
+    words_b = set(re.findall(r'\w+', b.lower()))
+    if not words_a and not words_b:
+        return 1.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+class SegmentTracker:
+    def __init__(self, hash_distance: int = 6):
+        """Incremental form of CaptionDeduplicator.segment_frames, fed one frame at a time"""
+        self.hash_distance = hash_distance
+        self.segments: List[Segment] = []
+        self._anchor = None
+        self._start = 0
+        self._count = 0
+
+    def add(self, frame: np.ndarray) -> bool:
+        """Add the next frame; True if it starts a new segment"""
+        frame_hash = dhash(frame)
+        i = self._count
+        self._count += 1
+        # Compare against the run's first frame so slow pans don't drift into one segment
+        if self._anchor is None or hamming(self._anchor, frame_hash) > self.hash_distance:
+            if self._anchor is not None:
+                self.segments.append(Segment(self._start, i - 1))
+            self._anchor, self._start = frame_hash, i
+            return True
+        return False
+
+    def finish(self) -> List[Segment]:
+        """Every segment, including the one still open"""
+        if self._count and (not self.segments or self.segments[-1].end != self._count - 1):
+            self.segments.append(Segment(self._start, self._count - 1))
+        return self.segments
+
+def deduplicator_from_config(section: Dict[str, Any]) -> Optional['CaptionDeduplicator']:
+    """Build a deduplicator from a config section, or None when it is disabled"""
+    if not section.get('enabled'):
+        return None
+    return CaptionDeduplicator(section['hash_distance'], section['text_threshold'])
+
+class CaptionDeduplicator:
+    def __init__(self, hash_distance: int = 6, text_threshold: float = 0.8):
+        """Collapse runs of near-identical frames into one captioned segment
+
+        Consecutive frames within hash_distance bits (dHash) of the first
+        frame of their run form a segment, and only its middle frame is
+        captioned. Neighbouring segments whose captions are at least
+        text_threshold similar are then merged, so a static shot yields one
+        caption with its time range instead of dozens of repeats.
+        """
+        self.hash_distance = hash_distance
+        self.text_threshold = text_threshold
+
+    def segment_frames(self, frames: List[np.ndarray]) -> List[Segment]:
+        """Split frames into runs of perceptually near-identical frames"""
+        tracker = self.tracker()
+        for frame in frames:
+            tracker.add(frame)
+        return tracker.finish()
+
+    def tracker(self) -> SegmentTracker:
+        """Segmentation for frames that arrive one at a time"""
+        return SegmentTracker(self.hash_distance)
+
+    def merge_captions(self, segments: List[Segment], captions: List[str]) -> List[tuple]:
+        """(segment, caption) pairs with adjacent similar captions merged"""
+        merged = []
+        for segment, caption in zip(segments, captions):
+            if merged and text_similarity(merged[-1][1], caption) >= self.text_threshold:
+                previous, kept = merged[-1]
+                merged[-1] = (Segment(previous.start, segment.end), kept)
+            else:
+                merged.append((segment, caption))
+        return merged
+
+    def caption_frames(self, captioner, frames: List[np.ndarray], interval_sec: float = 2.0) -> List[str]:
+        """Captions for each segment, labelled with their frame and time range
+
+        Same role as FrameCaptioner.caption_frames, but a segment of frames
+        3-7 is returned as "Frames 3-7 (0:04-0:12): <caption>".
+        """
+        # Step 1: Group near-duplicate frames
+        segments = self.segment_frames(frames)
+
+        # Step 2: Caption one representative frame per segment
+        middles = [(segment.start + segment.end) // 2 for segment in segments]
+        if isinstance(frames, FrameStore):
+            captions = captioner.caption_store(frames, middles)
+        else:
+            representatives = [frames[i] for i in middles]
+            captions = []
+            for start in range(0, len(representatives), captioner.batch_size):
+                captions.extend(captioner.caption_batch(representatives[start:start + captioner.batch_size]))
+
+        # Step 3: Merge neighbouring segments that were described the same way
+        return self.label_captions(segments, captions, interval_sec)
+
+    def label_captions(self, segments: List[Segment], captions: List[str], interval_sec: float = 2.0) -> List[str]:
+        """Merge similar neighbours and label each caption with its frame and time range"""
+        labelled = []
+        for segment, caption in self.merge_captions(segments, captions):
+            if segment.start == segment.end:
+                label = f"Frame {segment.start + 1} ({_format_time(segment.start * interval_sec)})"
+            else:
+                label = (f"Frames {segment.start + 1}-{segment.end + 1} "
+                         f"({_format_time(segment.start * interval_sec)}-{_format_time(segment.end * interval_sec)})")
+            labelled.append(f"{label}: {caption}")
+        return labelled
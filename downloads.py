@@ -0,0 +1,193 @@
+import glob
+import os
+import re
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+# Watch, short, embed and youtu.be links; IDs are 11 URL-safe characters
+YOUTUBE_ID_PATTERN = re.compile(
+    r'(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/|live/)|youtu\.be/)([A-Za-z0-9_-]{11})'
+)
+
+def youtube_video_id(url: str) -> Optional[str]:
+    """The video ID in a YouTube URL, or None if it doesn't look like one"""
+    match = YOUTUBE_ID_PATTERN.search(url)
+    return match.group(1) if match else None
+
+def format_for_height(max_height: int) -> str:
+    """yt-dlp format selector for the best stream no taller than max_height
+
+    Video-only streams are fine since the analysis never uses audio, and
+    picking a single stream avoids needing ffmpeg to merge formats. There is
+    deliberately no uncapped fallback: a video with nothing under the cap
+    fails instead of downloading full resolution.
+    """
+    return f"bv*[height<={max_height}][ext=mp4]/bv*[height<={max_height}]/b[height<={max_height}]"
+
+def save_upload(source, destination, chunk_size: int = 1024 * 1024):
+    """Copy a file-like upload into an open binary file in chunks instead of reading it whole"""
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    shutil.copyfileobj(source, destination, length=chunk_size)
+
+def download_cache_from_config(section: Dict[str, Any]) -> 'DownloadCache':
+    return DownloadCache(section['dir'], section['max_bytes'])
+
+def analysis_height(config: Dict[str, Any]) -> int:
+    """Tallest video worth downloading for this pipeline config"""
+    max_height = config['downloads']['max_height']
+    frame_max_side = config['video'].get('frame_max_side')
+    return min(max_height, frame_max_side) if frame_max_side else max_height
+
+class DownloadCache:
+    def __init__(self, root: str, max_bytes: int = 5 * 1024 ** 3):
+        """Size-bounded LRU directory of downloaded videos, keyed by YouTube video ID
+
+        A file is named after its video ID and height cap, so the same URL
+        (in any of its link forms) is only downloaded once per resolution.
+        Files are written under a temporary name and renamed when complete.
+        Videos pinned by an analysis in this process are never evicted; other
+        processes (queue workers) should get their own link with link_copy().
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        self._download_locks: Dict[str, threading.Lock] = {}
+        self._pins: Dict[str, int] = {}
+        os.makedirs(self.root, exist_ok=True)
+
+    def _prefix(self, video_id: str, max_height: int) -> str:
+        return os.path.join(self.root, f"{video_id}-{max_height}p")
+
+    def lookup(self, video_id: str, max_height: int) -> Optional[str]:
+        """Path of the cached video, marking it as recently used"""
+        for path in glob.glob(glob.escape(self._prefix(video_id, max_height)) + '.*'):
+            if path.endswith('.part'):
+                continue
+            try:
+                os.utime(path, None)
+            except OSError:
+                continue
+            return path
+        return None
+
+    def contains(self, path: Optional[str]) -> bool:
+        """Whether path is a file owned by this cache (so callers must not delete it)"""
+        return bool(path) and os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.root)
+
+    @contextmanager
+    def pinned(self, path: Optional[str]):
+        """Keep path from being evicted while the block runs (a no-op for files outside the cache)"""
+        if not self.contains(path):
+            yield path
+            return
+        path = os.path.abspath(path)
+        with self._lock:
+            self._pins[path] = self._pins.get(path, 0) + 1
+        try:
+            yield path
+        finally:
+            with self._lock:
+                self._pins[path] -= 1
+                if not self._pins[path]:
+                    del self._pins[path]
+
+    def link_copy(self, path: str, destination: str) -> str:
+        """Give another owner its own name for a cached video, so eviction can't remove it
+
+        A hard link costs nothing; across filesystems the file is copied.
+        """
+        try:
+            os.link(path, destination)
+        except OSError:
+            shutil.copyfile(path, destination)
+        return destination
+
+    def download(self, url: str, max_height: int = 720) -> str:
+        """Return a local copy of a YouTube video, downloading it on a cache miss"""
+        video_id = youtube_video_id(url)
+        if video_id is None:
+            raise ValueError(f"Not a YouTube video URL: {url}")
+
+        with self._lock:
+            download_lock = self._download_locks.setdefault(f"{video_id}-{max_height}", threading.Lock())
+
+        # Concurrent requests for the same video wait for one download
+        with download_lock:
+            path = self.lookup(video_id, max_height)
+            if path is not None:
+                self.stats['hits'] += 1
+                return path
+            self.stats['misses'] += 1
+            path = self._fetch(url, video_id, max_height)
+
+        self._evict(keep=path)
+        return path
+
+    def _fetch(self, url: str, video_id: str, max_height: int) -> str:
+        import yt_dlp
+
+        workdir = tempfile.mkdtemp(dir=self.root, suffix='.part')
+        try:
+            options = {
+                'format': format_for_height(max_height),
+                'outtmpl': os.path.join(workdir, 'video.%(ext)s'),
+                'noplaylist': True,
+                'quiet': True,
+                'no_warnings': True
+            }
+            with yt_dlp.YoutubeDL(options) as ydl:
+                try:
+                    info = ydl.extract_info(url, download=True)
+                except yt_dlp.utils.DownloadError as e:
+                    if 'Requested format is not available' in str(e):
+                        raise ValueError(f"No stream of at most {max_height}p is available for {url}") from e
+                    raise
+                downloaded = ydl.prepare_filename(info)
+            if not os.path.exists(downloaded):
+                raise RuntimeError(f"yt-dlp did not produce a file for {url}")
+            path = f"{self._prefix(video_id, max_height)}{os.path.splitext(downloaded)[1]}"
+            os.replace(downloaded, path)
+            return path
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def _entries(self):
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.endswith('.part') or not os.path.isfile(path):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            yield path, stat.st_size, max(stat.st_atime, stat.st_mtime)
+
+    def _evict(self, keep: Optional[str] = None):
+        """Drop least recently used videos, except pinned ones, until the cache fits its budget"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        with self._lock:
+            pinned = set(self._pins)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep or os.path.abspath(path) in pinned:
+                continue
+            try:
+                os.unlink(path)
+                total -= size
+                self.stats['evictions'] += 1
+            except OSError:
+                pass
+
+    def clear(self):
+        for path, _, _ in list(self._entries()):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
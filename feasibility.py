@@ -1,32 +1,69 @@
-import google.generativeai as genai
-import os
-from typing import Dict, Any
-import streamlit as st
-from PIL import Image
-import numpy as np
+import asyncio
+import hashlib
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+from config import get_secret
+from gemini_client import GeminiClient
+from telemetry import telemetry
+
+logger = logging.getLogger(__name__)
 
 class FeasibilityAnalyzer:
-    def __init__(self):
-        """Initialize feasibility analyzer with Gemini API"""
+    def __init__(self, model_name: str = 'gemini-1.5-flash', max_frames: int = 5,
+                 image_byte_budget: int = 1_000_000, image_max_side: int = 768,
+                 max_concurrency: int = 4, requests_per_minute: float = 15, max_retries: int = 4,
+                 response_cache=None, prefilter: bool = False, prefilter_low: float = 0.2,
+                 prefilter_high: float = 0.9):
+        """Initialize feasibility analyzer with Gemini API
+
+        Vision requests send the max_frames most informative frames (see
+        keyframes.select_keyframes), JPEG-encoded to fit image_byte_budget.
+
+        All Gemini calls go through one GeminiClient, which enforces the
+        concurrency limit and request rate and retries transient errors.
+        response_cache (a cache.ResultCache) stores raw response text keyed on
+        the normalized prompt and perceptual hashes of the frames sent.
+
+        Without Gemini, verdicts come from the offline lexicon engine (see
+        lexicon.py). With prefilter, every request is scored offline first and
+        Gemini is only asked when the score falls between prefilter_low and
+        prefilter_high.
+        """
+        self.model_name = model_name
+        self.max_frames = max_frames
+        self.image_byte_budget = image_byte_budget
+        self.image_max_side = image_max_side
+        self.response_cache = response_cache
+        self.prefilter = prefilter
+        self.prefilter_low = prefilter_low
+        self.prefilter_high = prefilter_high
+        self.client = GeminiClient(max_concurrency=max_concurrency,
+                                   requests_per_minute=requests_per_minute,
+                                   max_retries=max_retries)
+        
         # Configure Gemini API
-        api_key = os.getenv("GEMINI_API_KEY") or st.secrets.get("GEMINI_API_KEY")
+        api_key = get_secret("GEMINI_API_KEY")
         if api_key:
+            # Imported lazily: the SDK is slow to load and only needed with a key
+            import google.generativeai as genai
             genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-1.5-flash')
-            self.vision_model = genai.GenerativeModel('gemini-1.5-flash')
+            self.model = genai.GenerativeModel(model_name)
+            self.vision_model = genai.GenerativeModel(model_name)
         else:
             self.model = None
             self.vision_model = None
     
-    def analyze_feasibility(self, story: str, motion_data: dict = None, sample_frames: list = None) -> Dict[str, Any]:
-        """Analyze if the story/scene is realistically feasible using Gemini"""
-        
-        prompt = f"""
+    def _text_prompt(self, story: str, motion_data: dict = None) -> str:
+        # The per-frame motion array is for the analyzers, not the prompt
+        from motion import motion_summary
+        return f"""
         Analyze the following video scene description and determine if it's realistically possible in real life:
 
         Scene: "{story}"
 
-        Motion Analysis Data: {motion_data if motion_data else "Not available"}
+        Motion Analysis Data: {motion_summary(motion_data) or "Not available"}
 
         Please provide your analysis in the following format:
         VERDICT: [Feasible/Not Feasible/Questionable]
@@ -36,42 +73,27 @@ class FeasibilityAnalyzer:
 
         Consider physics laws, human capabilities, animal behavior, and real-world constraints in your analysis.
         """
-        
-        try:
-            if self.model:
-                # Use Gemini for text analysis
-                response = self.model.generate_content(prompt)
-                return self._parse_response(response.text)
-            else:
-                # Fallback analysis without API
-                return self._fallback_analysis(story, motion_data)
-                
-        except Exception as e:
-            st.warning(f"Gemini API error: {str(e)}. Using fallback analysis.")
-            return self._fallback_analysis(story, motion_data)
     
-    def analyze_with_frames(self, story: str, frames: list, motion_data: dict = None) -> Dict[str, Any]:
-        """Enhanced analysis using both text and visual data with Gemini Vision"""
+    def _vision_content(self, story: str, frames: list, motion_data: dict = None,
+                        face_analysis: dict = None) -> Tuple[list, List[int]]:
+        """Prompt plus selected key frames for a multimodal request, and the frames' perceptual hashes"""
+        import numpy as np
+        from frame_hash import dhash
+        from keyframes import encode_keyframes, select_keyframes
+        from motion import motion_summary
         
-        if not self.vision_model or not frames:
-            return self.analyze_feasibility(story, motion_data)
+        frames = [frame for frame in frames if isinstance(frame, np.ndarray)]
         
-        try:
-            # Select key frames for analysis (max 5 for API limits)
-            selected_frames = frames[::max(1, len(frames)//5)][:5]
-            
-            # Convert frames to PIL Images
-            pil_images = []
-            for frame in selected_frames:
-                if isinstance(frame, np.ndarray):
-                    pil_image = Image.fromarray(frame)
-                    pil_images.append(pil_image)
-            
-            prompt = f"""
+        # Pick the most informative frames across the whole clip (max_frames for API limits)
+        selected_frames = [frames[i] for i in select_keyframes(frames, self.max_frames, motion_data, face_analysis)]
+        images = encode_keyframes(selected_frames, self.image_byte_budget, self.image_max_side)
+        frame_hashes = [dhash(frame) for frame in selected_frames]
+        
+        prompt = f"""
             Analyze this video sequence for realistic feasibility. I'm providing both a text description and key frames.
 
             Text Description: "{story}"
-            Motion Analysis: {motion_data if motion_data else "Not available"}
+            Motion Analysis: {motion_summary(motion_data) or "Not available"}
 
             Please examine the images and text together to determine:
             1. Are the events shown physically possible in real life?
@@ -85,17 +107,164 @@ class FeasibilityAnalyzer:
             LOOKS_REAL: [Visual and contextual elements that support authenticity]
             LOOKS_FAKE: [Visual artifacts, impossibilities, or suspicious elements]
             """
-            
-            # Prepare content for multimodal analysis
-            content = [prompt]
-            content.extend(pil_images)
-            
-            response = self.vision_model.generate_content(content)
-            return self._parse_response(response.text)
+        
+        # Prepare content for multimodal analysis
+        content = [prompt]
+        content.extend(images)
+        return content, frame_hashes
+    
+    def _response_key(self, prompt: str, frame_hashes: List[int] = ()) -> str:
+        """Cache key from the model, the whitespace/case-normalized prompt and frame hashes"""
+        normalized = re.sub(r'\s+', ' ', prompt).strip().lower()
+        payload = '|'.join([self.model_name, normalized] + [f"{h:016x}" for h in frame_hashes])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _cached_response(self, prompt: str, frame_hashes: List[int] = ()) -> Tuple[Optional[str], Optional[str]]:
+        """Return (cache key, cached response text) for a request"""
+        if self.response_cache is None:
+            return None, None
+        key = self._response_key(prompt, frame_hashes)
+        response_text = self.response_cache.get(key)
+        telemetry.incr('gemini_cache_hits' if response_text is not None else 'gemini_cache_misses')
+        return key, response_text
+    
+    def _store_response(self, key: Optional[str], response_text: str):
+        if key is not None:
+            self.response_cache.put(key, response_text)
+    
+    def _generate(self, model, content, prompt: str, frame_hashes: List[int] = ()) -> str:
+        key, response_text = self._cached_response(prompt, frame_hashes)
+        if response_text is None:
+            response_text = self.client.generate(model, content)
+            self._store_response(key, response_text)
+        return response_text
+    
+    async def _generate_async(self, model, content, prompt: str, frame_hashes: List[int] = ()) -> str:
+        key, response_text = self._cached_response(prompt, frame_hashes)
+        if response_text is None:
+            response_text = await self.client.generate_async(model, content)
+            self._store_response(key, response_text)
+        return response_text
+    
+    def _prefiltered(self, story: str, motion_data: dict = None, face_analysis: dict = None) -> Optional[Dict[str, Any]]:
+        """The offline verdict when prefiltering is on and the score is clear-cut, else None"""
+        if not self.prefilter:
+            return None
+        from lexicon import default_engine, result_from_score
+        scored = default_engine().score(story, motion_data, face_analysis)
+        if self.prefilter_low <= scored.score < self.prefilter_high:
+            telemetry.incr('feasibility_prefilter_ambiguous')
+            return None
+        telemetry.incr('feasibility_prefiltered')
+        result = result_from_score(scored)
+        result['prefiltered'] = True
+        return result
+    
+    def analyze_feasibility(self, story: str, motion_data: dict = None, sample_frames: list = None,
+                            face_analysis: dict = None) -> Dict[str, Any]:
+        """Analyze if the story/scene is realistically feasible using Gemini"""
+        
+        try:
+            prefiltered = self._prefiltered(story, motion_data, face_analysis)
+            if prefiltered is not None:
+                return prefiltered
+            if self.model:
+                # Use Gemini for text analysis
+                prompt = self._text_prompt(story, motion_data)
+                response_text = self._generate(self.model, prompt, prompt)
+                return self._parse_response(response_text)
+            else:
+                # Fallback analysis without API
+                return self._fallback_analysis(story, motion_data, face_analysis)
+                
+        except Exception as e:
+            logger.warning(f"Gemini API error: {str(e)}. Using fallback analysis.")
+            return self._fallback_analysis(story, motion_data, face_analysis)
+    
+    def analyze_with_frames(self, story: str, frames: list, motion_data: dict = None,
+                            face_analysis: dict = None) -> Dict[str, Any]:
+        """Enhanced analysis using both text and visual data with Gemini Vision
+
+        Pass every extracted frame: key frames are chosen here from scene
+        changes, motion anomalies and suspicious faces in face_analysis.
+        """
+        
+        if not self.vision_model or not frames:
+            return self.analyze_feasibility(story, motion_data, face_analysis=face_analysis)
+        
+        prefiltered = self._prefiltered(story, motion_data, face_analysis)
+        if prefiltered is not None:
+            return prefiltered
+        
+        try:
+            content, frame_hashes = self._vision_content(story, frames, motion_data, face_analysis)
+            response_text = self._generate(self.vision_model, content, content[0], frame_hashes)
+            return self._parse_response(response_text)
             
         except Exception as e:
-            st.warning(f"Gemini Vision API error: {str(e)}. Falling back to text-only analysis.")
-            return self.analyze_feasibility(story, motion_data)
+            logger.warning(f"Gemini Vision API error: {str(e)}. Falling back to text-only analysis.")
+            return self.analyze_feasibility(story, motion_data, face_analysis=face_analysis)
+    
+    async def analyze_feasibility_async(self, story: str, motion_data: dict = None,
+                                        face_analysis: dict = None) -> Dict[str, Any]:
+        """Async variant of analyze_feasibility for running many checks concurrently"""
+        prefiltered = self._prefiltered(story, motion_data, face_analysis)
+        if prefiltered is not None:
+            return prefiltered
+        if not self.model:
+            return self._fallback_analysis(story, motion_data, face_analysis)
+        
+        try:
+            prompt = self._text_prompt(story, motion_data)
+            response_text = await self._generate_async(self.model, prompt, prompt)
+            return self._parse_response(response_text)
+        except Exception as e:
+            logger.warning(f"Gemini API error: {str(e)}. Using fallback analysis.")
+            return self._fallback_analysis(story, motion_data, face_analysis)
+    
+    async def analyze_with_frames_async(self, story: str, frames: list, motion_data: dict = None,
+                                        face_analysis: dict = None) -> Dict[str, Any]:
+        """Async variant of analyze_with_frames"""
+        if not self.vision_model or not frames:
+            return await self.analyze_feasibility_async(story, motion_data, face_analysis)
+        
+        prefiltered = self._prefiltered(story, motion_data, face_analysis)
+        if prefiltered is not None:
+            return prefiltered
+        
+        try:
+            content, frame_hashes = self._vision_content(story, frames, motion_data, face_analysis)
+            response_text = await self._generate_async(self.vision_model, content, content[0], frame_hashes)
+            return self._parse_response(response_text)
+        except Exception as e:
+            logger.warning(f"Gemini Vision API error: {str(e)}. Falling back to text-only analysis.")
+            return await self.analyze_feasibility_async(story, motion_data, face_analysis)
+    
+    async def analyze_many_async(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Async variant of analyze_many, for callers already inside an event loop"""
+        return list(await asyncio.gather(*[
+            self.analyze_with_frames_async(r['story'], r.get('frames') or [], r.get('motion_data'),
+                                           r.get('face_analysis'))
+            for r in requests
+        ]))
+    
+    def analyze_many(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Run many feasibility checks concurrently, within the client's rate limits
+
+        Each request is a dict with 'story' and optional 'frames',
+        'motion_data' and 'face_analysis'. Results are returned in request order.
+        asyncio.run() refuses to start inside a running loop (Jupyter, async
+        web handlers), so there the checks run on a loop in a separate thread
+        and this call blocks until they finish; await analyze_many_async
+        instead to keep the caller's loop responsive.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.analyze_many_async(requests))
+        
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='feasibility-loop') as loop_thread:
+            return loop_thread.submit(asyncio.run, self.analyze_many_async(requests)).result()
     
     def _parse_response(self, response_text: str) -> Dict[str, Any]:
         """Parse the LLM response into structured format"""
@@ -125,35 +294,17 @@ class FeasibilityAnalyzer:
         
         return result
     
-    def _fallback_analysis(self, story: str, motion_data: dict = None) -> Dict[str, Any]:
-        """Fallback analysis using simple heuristics"""
-        story_lower = story.lower()
-        
-        # Simple keyword-based analysis
-        impossible_keywords = ['fly', 'floating', 'teleport', 'magic', 'supernatural', 'dragon', 'unicorn']
-        questionable_keywords = ['shark', 'tiger', 'explosion', 'fire', 'jump']
-        
-        impossible_count = sum(1 for word in impossible_keywords if word in story_lower)
-        questionable_count = sum(1 for word in questionable_keywords if word in story_lower)
-        
-        # Motion analysis consideration
-        motion_suspicious = False
-        if motion_data and motion_data.get('anomaly_ratio', 0) > 0.3:
-            motion_suspicious = True
-        
-        if impossible_count > 0 or motion_suspicious:
-            verdict = '❌ Not Feasible'
-            explanation = 'Contains elements that appear physically impossible or have suspicious motion patterns.'
-        elif questionable_count > 1:
-            verdict = '❓ Questionable'
-            explanation = 'Contains elements that are unusual but potentially possible with special circumstances.'
-        else:
-            verdict = '✅ Feasible'
-            explanation = 'Appears to show realistic, physically possible events.'
-        
-        return {
-            'verdict': verdict,
-            'explanation': explanation,
-            'looks_real': 'Natural lighting, consistent physics, smooth camera movement.',
-            'looks_fake': 'Unusual events, potential motion anomalies, or impossible scenarios.'
-        }
\ No newline at end of file
+    def _fallback_analysis(self, story: str, motion_data: dict = None, face_analysis: dict = None) -> Dict[str, Any]:
+        """Offline analysis with the weighted lexicon engine, for when Gemini is unavailable"""
+        from lexicon import default_engine, result_from_score
+        telemetry.incr('feasibility_fallbacks')
+        result = result_from_score(default_engine().score(story, motion_data, face_analysis))
+        result['fallback'] = True
+        return result
+    
+    def score_offline(self, stories: List[str], motion_data: List[Optional[dict]] = None,
+                      face_analysis: List[Optional[dict]] = None) -> List[Dict[str, Any]]:
+        """Offline verdicts for a batch of stories, without any Gemini calls"""
+        from lexicon import default_engine, result_from_score
+        return [result_from_score(scored)
+                for scored in default_engine().score_many(stories, motion_data, face_analysis)]
\ No newline at end of file
@@ -0,0 +1,387 @@
+"""Command-line entry point for running the analysis pipeline without the UI.
+
+    python -m feasibility_checker batch videos/ -o results.jsonl --workers 8
+    python -m feasibility_checker batch manifest.jsonl -o results.jsonl --resume
+    python -m feasibility_checker coldstart --budget 1.0
+    python -m feasibility_checker queue submit clip.mp4 --priority 5
+    python -m feasibility_checker queue serve --port 8765 --workers 4
+"""
+import argparse
+import json
+import multiprocessing
+import multiprocessing.util
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterator, List, Optional
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+# Modules that must not be pulled in by the heuristics-only path
+HEAVY_MODULES = ('torch', 'torchvision', 'transformers', 'streamlit', 'google.generativeai')
+
+# What a pool worker on the heuristics path does at startup
+COLD_START_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from feasibility import FeasibilityAnalyzer
+from analyzer import ComprehensiveAnalyzer
+FeasibilityAnalyzer()._fallback_analysis('A person walks a dog in the park.', {'anomaly_ratio': 0.0})
+ComprehensiveAnalyzer()
+elapsed = time.perf_counter() - start
+heavy = [name for name in %r if name in sys.modules]
+print(json.dumps({'import_sec': elapsed, 'heavy_modules': heavy}))
+"""
+
+# Per-process pipeline, created once by the pool initializer
+_pipeline = None
+
+def iter_jobs(source: str) -> Iterator[Dict[str, str]]:
+    """Yield {'id', 'path'} jobs from a directory of videos or a JSONL manifest
+
+    Manifest lines are objects with a 'path' and an optional 'id'; relative
+    paths are resolved against the manifest's directory.
+    """
+    if os.path.isdir(source):
+        for dirpath, _, filenames in os.walk(source):
+            for name in sorted(filenames):
+                if name.lower().endswith(VIDEO_EXTENSIONS):
+                    path = os.path.join(dirpath, name)
+                    yield {'id': os.path.relpath(path, source), 'path': path}
+        return
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            if 'path' not in entry:
+                raise ValueError(f"{source}:{line_no}: manifest entry has no 'path'")
+            path = entry['path']
+            if not os.path.isabs(path):
+                path = os.path.join(base_dir, path)
+            yield {'id': str(entry.get('id', entry['path'])), 'path': path}
+
+def _completed_ids(output_path: str) -> set:
+    """IDs that already have a successful result in an existing output file"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('status') == 'ok':
+                done.add(record.get('id'))
+    return done
+
+def _init_worker(config: Dict[str, Any], threads: int):
+    """Load the models once per worker process"""
+    global _pipeline
+    os.environ.setdefault('OMP_NUM_THREADS', str(threads))
+
+    import torch
+    torch.set_num_threads(threads)
+
+    from pipeline import AnalysisPipeline
+    from registry import warm_up
+    _pipeline = AnalysisPipeline(config)
+    warm_up(config)
+    # Stop caption/face worker processes when this pool worker exits
+    multiprocessing.util.Finalize(_pipeline, _pipeline.close, exitpriority=10)
+
+def _analyze_job(job: Dict[str, str]) -> Dict[str, Any]:
+    start = time.time()
+    try:
+        result = _pipeline.analyze(job['path'])
+        return {'id': job['id'], 'path': job['path'], 'status': 'ok', **result}
+    except Exception as e:
+        return {
+            'id': job['id'],
+            'path': job['path'],
+            'status': 'error',
+            'error': f"{type(e).__name__}: {str(e)}",
+            'elapsed_sec': round(time.time() - start, 3)
+        }
+
+def _to_json(value: Any) -> Any:
+    # NumPy scalars and arrays both expose tolist()
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+def _failed_record(job: Dict[str, str], error: BaseException) -> Dict[str, Any]:
+    return {
+        'id': job['id'],
+        'path': job['path'],
+        'status': 'error',
+        'error': f"{type(error).__name__}: {str(error)}",
+        'elapsed_sec': 0.0
+    }
+
+def run_batch(source: str, output_path: str, workers: int, threads_per_worker: int,
+              config: Dict[str, Any], resume: bool = False) -> Dict[str, int]:
+    """Analyze every job from source in a process pool, appending JSONL results
+
+    If a worker dies (or fails to start), the pool breaks: its in-flight
+    jobs are recorded as errors and a new pool takes over. When a fresh pool
+    breaks before finishing any job, e.g. because model loading fails in
+    the initializer, the remaining jobs are recorded as errors instead.
+    """
+    skip = _completed_ids(output_path) if resume else set()
+    jobs = (job for job in iter_jobs(source) if job['id'] not in skip)
+
+    counts = {'ok': 0, 'error': 0, 'skipped': len(skip)}
+    context = multiprocessing.get_context('spawn')
+    max_in_flight = workers * 2
+
+    def new_pool():
+        return ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                   initializer=_init_worker, initargs=(config, threads_per_worker))
+
+    with open(output_path, 'a' if resume else 'w', encoding='utf-8') as out:
+        def write(record):
+            counts[record['status']] += 1
+            out.write(json.dumps(record, default=_to_json, ensure_ascii=False) + '\n')
+            out.flush()
+            print(f"[{counts['ok'] + counts['error']}] {record['status']:5} {record['path']} "
+                  f"({record.get('elapsed_sec', 0):.1f}s)", file=sys.stderr)
+
+        pool = new_pool()
+        pool_error: Optional[BaseException] = None
+        pool_finished_job = False
+        pending: Dict[Any, Dict[str, str]] = {}
+        exhausted = False
+
+        try:
+            while pending or not exhausted:
+                # Keep a bounded number of jobs in flight so huge manifests stream
+                broken = None
+                while not exhausted and len(pending) < max_in_flight and broken is None:
+                    job = next(jobs, None)
+                    if job is None:
+                        exhausted = True
+                    elif pool is None:
+                        write(_failed_record(job, pool_error))
+                    else:
+                        try:
+                            pending[pool.submit(_analyze_job, job)] = job
+                        except BrokenProcessPool as e:
+                            write(_failed_record(job, e))
+                            broken = e
+
+                if pending and broken is None:
+                    finished, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        job = pending.pop(future)
+                        try:
+                            record = future.result()
+                            pool_finished_job = True
+                        except BrokenProcessPool as e:
+                            record = _failed_record(job, e)
+                            broken = e
+                        except Exception as e:
+                            record = _failed_record(job, e)
+                        write(record)
+
+                if broken is not None:
+                    # Every job still in the broken pool is lost; record them and start over
+                    for job in pending.values():
+                        write(_failed_record(job, broken))
+                    pending.clear()
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    if pool_finished_job:
+                        pool, pool_finished_job = new_pool(), False
+                    else:
+                        print(f"Worker pool failed to start: {broken}", file=sys.stderr)
+                        pool, pool_error = None, broken
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True)
+
+    return counts
+
+def measure_cold_start(runs: int = 3) -> Dict[str, Any]:
+    """Time a fresh interpreter importing and using the heuristics path
+
+    The GEMINI_API_KEY is cleared in the child so the measurement covers the
+    offline path only. Reports the best of several runs, total process time
+    included, plus any heavy module that got imported anyway. Raises
+    RuntimeError with the child's error output if it fails.
+    """
+    env = dict(os.environ, GEMINI_API_KEY='')
+    script = COLD_START_SCRIPT % (HEAVY_MODULES,)
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    best = None
+    for _ in range(max(1, runs)):
+        start = time.perf_counter()
+        child = subprocess.run([sys.executable, '-c', script], cwd=here, env=env,
+                               capture_output=True, text=True)
+        process_sec = time.perf_counter() - start
+        if child.returncode != 0:
+            error = child.stderr.strip().splitlines()
+            raise RuntimeError(f"Cold start run exited with status {child.returncode}: "
+                               f"{error[-1] if error else 'no error output'}")
+        try:
+            measured = json.loads(child.stdout.strip().splitlines()[-1])
+        except (IndexError, ValueError):
+            raise RuntimeError(f"Cold start run printed no measurement: {child.stdout.strip()[-200:]!r}")
+        if best is None or process_sec < best['process_sec']:
+            best = {'process_sec': process_sec, **measured}
+
+    return best
+
+def _load_config(args) -> Dict[str, Any]:
+    from config import load_pipeline_config
+
+    overrides = {}
+    if args.config:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            overrides = json.load(f)
+    if getattr(args, 'no_cache', False):
+        overrides.setdefault('cache', {})['enabled'] = False
+    return load_pipeline_config(overrides, profile=args.profile)
+
+def run_queue_command(args) -> int:
+    """Submit, inspect, cancel or process jobs in the durable job queue"""
+    from jobs import make_server, queue_from_config, run_workers, stop_workers
+
+    config = _load_config(args)
+    queue = queue_from_config(config['jobs'])
+
+    if args.queue_command == 'submit':
+        if os.path.isdir(args.source) or args.source.endswith('.jsonl'):
+            jobs = iter_jobs(args.source)
+        else:
+            jobs = [{'path': args.source}]
+        for job in jobs:
+            print(queue.submit(job['path'], args.priority))
+        return 0
+
+    if args.queue_command == 'status':
+        if args.job_id:
+            job = queue.get(args.job_id)
+            if job is None:
+                print(f"Unknown job {args.job_id}", file=sys.stderr)
+                return 1
+            job['position'] = queue.position(args.job_id)
+            print(json.dumps(job, indent=2, ensure_ascii=False))
+        else:
+            print(json.dumps({'counts': queue.counts(), 'jobs': queue.list(args.status, args.limit)},
+                             indent=2, ensure_ascii=False))
+        return 0
+
+    if args.queue_command in ('cancel', 'retry'):
+        action = queue.cancel if args.queue_command == 'cancel' else queue.retry
+        if not action(args.job_id):
+            print(f"Job {args.job_id} can't be {args.queue_command}ed in its current state", file=sys.stderr)
+            return 1
+        return 0
+
+    # worker / serve: drain the queue with a pool of worker processes
+    processes, stop = run_workers(config, args.workers, max(1, args.threads_per_worker))
+    server = make_server(queue, args.host, args.port) if args.queue_command == 'serve' else None
+    try:
+        if server is not None:
+            print(f"Serving the job queue on http://{args.host}:{server.server_address[1]}", file=sys.stderr)
+            server.serve_forever()
+        else:
+            for process in processes:
+                process.join()
+    except KeyboardInterrupt:
+        print("Stopping; workers finish their current job first", file=sys.stderr)
+    finally:
+        if server is not None:
+            server.server_close()
+        stop_workers(processes, stop)
+    return 0
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='feasibility_checker', description='Video Feasibility Checker')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    batch = subparsers.add_parser('batch', help='Analyze a directory or JSONL manifest of videos')
+    batch.add_argument('source', help='Directory of videos or JSONL manifest with a "path" per line')
+    batch.add_argument('-o', '--output', default='results.jsonl', help='JSONL file to write results to')
+    batch.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                       help='Number of worker processes')
+    batch.add_argument('--threads-per-worker', type=int, default=2,
+                       help='Torch/OpenMP threads per worker process')
+    batch.add_argument('--config', help='JSON file with pipeline config overrides')
+    batch.add_argument('--profile', choices=('fast', 'balanced', 'quality'),
+                       help='Speed/quality profile (default: FEASIBILITY_PROFILE or quality)')
+    batch.add_argument('--no-cache', action='store_true', help='Disable the on-disk result cache')
+    batch.add_argument('--resume', action='store_true',
+                       help='Append to the output file and skip videos that already succeeded')
+
+    coldstart = subparsers.add_parser('coldstart', help='Measure worker startup time on the heuristics path')
+    coldstart.add_argument('--budget', type=float, default=1.0, help='Maximum allowed startup time in seconds')
+    coldstart.add_argument('--runs', type=int, default=3, help='Number of fresh interpreters to time')
+
+    queue = subparsers.add_parser('queue', help='Durable job queue for asynchronous analyses')
+    queue.add_argument('--config', help='JSON file with pipeline config overrides')
+    queue.add_argument('--profile', choices=('fast', 'balanced', 'quality'),
+                       help='Speed/quality profile (default: FEASIBILITY_PROFILE or quality)')
+    queue_commands = queue.add_subparsers(dest='queue_command', required=True)
+
+    submit = queue_commands.add_parser('submit', help='Queue a video, a directory of videos or a JSONL manifest')
+    submit.add_argument('source')
+    submit.add_argument('--priority', type=int, default=0, help='Higher priorities are analyzed first')
+
+    status = queue_commands.add_parser('status', help='Show one job, or job counts and recent jobs')
+    status.add_argument('job_id', nargs='?')
+    status.add_argument('--status', choices=('queued', 'running', 'done', 'failed', 'cancelled'))
+    status.add_argument('--limit', type=int, default=20)
+
+    for name, help_text in (('cancel', 'Cancel a queued or running job'),
+                            ('retry', 'Queue a failed or cancelled job again')):
+        queue_commands.add_parser(name, help=help_text).add_argument('job_id')
+
+    for name, help_text in (('worker', 'Process queued jobs until interrupted'),
+                            ('serve', 'Process queued jobs and serve the HTTP submit/status endpoint')):
+        command = queue_commands.add_parser(name, help=help_text)
+        command.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                             help='Number of worker processes (0 to only serve the endpoint)')
+        command.add_argument('--threads-per-worker', type=int, default=2,
+                             help='Torch/OpenMP threads per worker process')
+        if name == 'serve':
+            command.add_argument('--host', default='127.0.0.1')
+            command.add_argument('--port', type=int, default=8765)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'queue':
+        return run_queue_command(args)
+
+    if args.command == 'coldstart':
+        try:
+            result = measure_cold_start(args.runs)
+        except RuntimeError as e:
+            print(f"Cold start measurement failed: {e}", file=sys.stderr)
+            return 2
+        print(json.dumps({**result, 'budget_sec': args.budget}, indent=2))
+        if result['heavy_modules']:
+            print(f"Heavy modules imported on the heuristics path: {', '.join(result['heavy_modules'])}",
+                  file=sys.stderr)
+        return 0 if result['process_sec'] <= args.budget and not result['heavy_modules'] else 1
+
+    if args.command == 'batch':
+        config = _load_config(args)
+
+        counts = run_batch(args.source, args.output, max(1, args.workers), max(1, args.threads_per_worker),
+                           config, resume=args.resume)
+        print(f"Done: {counts['ok']} ok, {counts['error']} failed, {counts['skipped']} skipped", file=sys.stderr)
+        return 1 if counts['error'] else 0
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,17 @@
+import cv2
+import numpy as np
+
+def dhash(frame: np.ndarray, hash_size: int = 8) -> int:
+    """Difference hash of an RGB or grayscale frame as a hash_size**2-bit integer
+
+    Near-identical images (re-encodes, small resizes, slight brightness
+    changes) get hashes a few bits apart.
+    """
+    gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits between two hashes"""
+    return bin(a ^ b).count('1')
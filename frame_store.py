@@ -0,0 +1,185 @@
+import math
+import multiprocessing
+import os
+import sys
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+BACKINGS = ('shm', 'mmap')
+
+# Side table with one row per frame
+META_DTYPE = np.dtype([('index', np.int64), ('timestamp', np.float64)])
+
+class FrameStoreHandle(NamedTuple):
+    """Everything another process needs to attach to a store; cheap to pickle"""
+    backing: str
+    name: str               # shared memory name, or the mmap file's path
+    shape: Tuple[int, ...]  # (frames, height, width, channels)
+
+class FrameStore:
+    def __init__(self, handle: FrameStoreHandle, create: bool = False):
+        """Frames of one video in one contiguous uint8 array that processes share without copying
+
+        Backed by multiprocessing.shared_memory ("shm") or a memory-mapped
+        file ("mmap"); frame metadata (sample index, timestamp) lives in a
+        second, small segment next to it. Indexing returns views, so a worker
+        that attaches with FrameStore.attach(handle) reads the frames in
+        place. Only the creating process unlinks the segments (close(), or
+        leaving a with block).
+        """
+        if handle.backing not in BACKINGS:
+            raise ValueError(f"Unknown frame store backing '{handle.backing}', expected one of {BACKINGS}")
+        self.handle = handle
+        self.owner = create
+        count = handle.shape[0]
+        nbytes = int(np.prod(handle.shape))
+        self._segments = []
+
+        if handle.backing == 'shm':
+            options = {} if create or sys.version_info < (3, 13) else {'track': False}
+            frames_shm = shared_memory.SharedMemory(name=handle.name, create=create, size=max(1, nbytes), **options)
+            meta_shm = shared_memory.SharedMemory(name=f"{handle.name}_meta", create=create,
+                                                  size=max(1, count * META_DTYPE.itemsize), **options)
+            self._segments = [frames_shm, meta_shm]
+            self.frames = np.ndarray(handle.shape, dtype=np.uint8, buffer=frames_shm.buf)
+            self.metadata = np.ndarray((count,), dtype=META_DTYPE, buffer=meta_shm.buf)
+        else:
+            mode = 'w+' if create else 'r'
+            self.frames = np.memmap(handle.name, dtype=np.uint8, mode=mode, shape=handle.shape) if nbytes \
+                else np.empty(handle.shape, dtype=np.uint8)
+            self.metadata = np.memmap(f"{handle.name}.meta", dtype=META_DTYPE, mode=mode, shape=(count,)) if count \
+                else np.empty((0,), dtype=META_DTYPE)
+
+    @classmethod
+    def create(cls, count: int, height: int, width: int, channels: int = 3, backing: str = 'shm',
+               directory: Optional[str] = None) -> 'FrameStore':
+        """An empty store for count frames; mmap files go in directory (default: the temp dir)"""
+        name = f"frames_{uuid.uuid4().hex[:16]}"
+        if backing == 'mmap':
+            name = os.path.join(directory or tempfile.gettempdir(), f"{name}.u8")
+        return cls(FrameStoreHandle(backing, name, (count, height, width, channels)), create=True)
+
+    @classmethod
+    def from_frames(cls, frames: Sequence[np.ndarray], interval_sec: Optional[float] = None,
+                    backing: str = 'shm', directory: Optional[str] = None) -> 'FrameStore':
+        """Copy equally sized frames into a new store; timestamps are index * interval_sec"""
+        if len(frames):
+            shape = frames[0].shape
+            mismatched = [i for i, frame in enumerate(frames) if frame.shape != shape]
+            if mismatched:
+                raise ValueError(f"Frames {mismatched[:5]} differ in size from frame 0 {shape}")
+            height, width = shape[:2]
+            channels = shape[2] if len(shape) == 3 else 1
+        else:
+            height, width, channels = 0, 0, 3
+
+        store = cls.create(len(frames), height, width, channels, backing, directory)
+        for i, frame in enumerate(frames):
+            store.frames[i] = frame.reshape(store.frames.shape[1:])
+        store.metadata['index'] = np.arange(len(frames))
+        store.metadata['timestamp'] = np.arange(len(frames)) * (interval_sec or 0.0)
+        return store
+
+    @classmethod
+    def attach(cls, handle: FrameStoreHandle) -> 'FrameStore':
+        """Open a store created by another process, without copying it"""
+        return cls(handle, create=False)
+
+    def __len__(self) -> int:
+        return self.handle.shape[0]
+
+    def __getitem__(self, index):
+        # Integers and slices both return views into the shared buffer
+        return self.frames[index]
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        return iter(self.frames)
+
+    def close(self):
+        """Detach; the owner also removes the segments"""
+        self.frames = self.metadata = None
+        for segment in self._segments:
+            try:
+                segment.close()
+            except BufferError:
+                # A caller still holds a view; the memory goes away with it
+                pass
+            if self.owner:
+                try:
+                    segment.unlink()
+                except FileNotFoundError:
+                    pass
+        self._segments = []
+        if self.owner and self.handle.backing == 'mmap':
+            for path in (self.handle.name, f"{self.handle.name}.meta"):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+# Per worker process state for FramePool
+_worker_state = None
+
+def _init_pool_worker(setup: Callable[..., Any], setup_args: tuple):
+    global _worker_state
+    _worker_state = setup(*setup_args)
+
+def _run_task(task: Callable[[Any, FrameStore, List[int]], Any], handle: FrameStoreHandle, indices: List[int]):
+    # Attach for this chunk only: an idle worker must not keep an unlinked
+    # segment alive after the owner closes the store
+    with FrameStore.attach(handle) as store:
+        return task(_worker_state, store, indices)
+
+def chunk_indices(indices: Sequence[int], chunks: int) -> List[List[int]]:
+    """Split indices into at most chunks contiguous, similarly sized lists"""
+    size = max(1, math.ceil(len(indices) / max(1, chunks)))
+    return [list(indices[start:start + size]) for start in range(0, len(indices), size)]
+
+class FramePool:
+    def __init__(self, processes: int, setup: Callable[..., Any], setup_args: tuple = ()):
+        """Worker processes that index into FrameStores instead of receiving pickled frames
+
+        Each worker runs setup(*setup_args) once (e.g. to load a model) and
+        keeps the result; tasks only carry a store handle and frame indices.
+        setup and tasks must be module-level functions so they can be sent
+        to spawned processes. Results must not be views into the store,
+        which workers detach from after every chunk. Call shutdown() (or use
+        a with block) to stop the workers.
+        """
+        self.processes = max(1, processes)
+        context = multiprocessing.get_context('spawn')
+        self._pool = ProcessPoolExecutor(max_workers=self.processes, mp_context=context,
+                                         initializer=_init_pool_worker, initargs=(setup, setup_args))
+
+    def map(self, task: Callable[[Any, FrameStore, List[int]], List[Any]], store: FrameStore,
+            indices: Sequence[int], chunks_per_process: int = 4) -> Iterator[Any]:
+        """Yield task's per-frame results for indices, in order
+
+        task(state, store, chunk) returns one result per index in chunk.
+        """
+        chunks = chunk_indices(indices, self.processes * chunks_per_process)
+        futures = [self._pool.submit(_run_task, task, store.handle, chunk) for chunk in chunks]
+        for future in futures:
+            yield from future.result()
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        return False
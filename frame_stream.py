@@ -0,0 +1,342 @@
+import math
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from motion import MotionEngine, pyramid_downscale
+from telemetry import telemetry
+
+class DecodedFrame(NamedTuple):
+    index: int                 # position in the decoded stream
+    timestamp: float           # seconds
+    gray: np.ndarray           # downscaled grayscale, for motion analysis
+    rgb: Optional[np.ndarray]  # full-resolution RGB, only on sampled frames
+
+def iter_video_frames(video_path: str, interval_sec: float = 2.0, motion_max_side: int = 320) -> Iterator[DecodedFrame]:
+    """Decode a video once, yielding every frame as it is read
+
+    Every frame carries a small grayscale copy for optical flow. Only frames
+    on the sampling interval also carry the full RGB image. Nothing is kept
+    after it is yielded.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video: {video_path}")
+
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        step = max(1, int(round(fps * interval_sec)))
+        index = 0
+
+        while True:
+            ok, bgr = cap.read()
+            if not ok:
+                break
+
+            gray = pyramid_downscale(cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY), motion_max_side)
+            rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB) if index % step == 0 else None
+
+            yield DecodedFrame(index, index / fps, gray, rgb)
+            index += 1
+    finally:
+        cap.release()
+
+def decode_frames_and_motion(video_path: str, interval_sec: float = 2.0, motion_max_side: int = 320,
+                             motion_threshold: float = 3.5) -> Tuple[List[np.ndarray], Dict[str, Any]]:
+    """Sampled RGB frames and motion_data from one decode of the video
+
+    motion_data also records sample_interval_sec, the spacing of the frames.
+    Drop-in replacement for calling VideoProcessor.extract_frames and
+    VideoProcessor.calculate_optical_flow separately, which decodes twice.
+    """
+    frames = []
+    timestamps = []
+    motion = MotionEngine(motion_threshold, motion_max_side)
+    for item in iter_video_frames(video_path, interval_sec, motion_max_side):
+        motion.add(item.gray)
+        if item.rgb is not None:
+            frames.append(item.rgb)
+            timestamps.append(item.timestamp)
+    # Actual spacing of the samples, after rounding to whole frames
+    sample_interval = timestamps[1] - timestamps[0] if len(timestamps) > 1 else interval_sec
+    return frames, {**motion.result(), 'sample_interval_sec': sample_interval}
+
+def thumbnail(image: np.ndarray, max_side: Optional[int] = 384, copy: bool = True) -> np.ndarray:
+    """image downscaled so its longer side is at most max_side (if set)
+
+    An image that is already small enough is copied, or with copy=False
+    returned as is (for callers that convert it into a new array anyway).
+    """
+    height, width = image.shape[:2]
+    if not max_side or max(height, width) <= max_side:
+        return image.copy() if copy else image
+    scale = max_side / max(height, width)
+    return cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+
+def sparse_frames_and_motion(video_path: str, interval_sec: float = 2.0, max_frames: int = 60,
+                             max_side: Optional[int] = None, motion_max_side: int = 320,
+                             seek_threshold: int = 90, motion_threshold: float = 3.5) -> Tuple[List[np.ndarray], Dict[str, Any]]:
+    """Sampled RGB frames and motion_data without decoding the whole video
+
+    The sampling interval grows with the duration so at most max_frames are
+    taken, and the reader seeks to each target instead of decoding the gap
+    (gaps under seek_threshold frames are skipped with grab(), which is
+    cheaper than a seek there). Motion is measured between each target and
+    the frame after it, so anomalies are sampled rather than exhaustive.
+
+    OpenCV always decodes at the native resolution, so each frame is
+    downscaled right after it is read (to max_side for the RGB copy and
+    motion_max_side for flow) and colour conversion only touches the small
+    copies. When the container doesn't report a length, the whole video is
+    decoded but still at most max_frames frames, downscaled, are kept.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video: {video_path}")
+
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        if total <= 0:
+            # Container doesn't report a length; fall back to a full but bounded decode
+            cap.release()
+            return _bounded_frames_and_motion(video_path, interval_sec, max_frames, max_side,
+                                              motion_max_side, motion_threshold)
+
+        # Step 1: Adaptive interval, so long videos cost about the same as short ones;
+        # the spacing rounds up so there are never more than max_frames targets
+        step = max(1, int(round(fps * interval_sec)), math.ceil(total / max(1, max_frames)))
+        targets = range(0, total, step)
+
+        frames = []
+        motion = MotionEngine(motion_threshold, motion_max_side)
+        position = 0
+        for target in targets:
+            # Step 2: Seek (or skip ahead) to the target frame
+            if target - position > seek_threshold:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            else:
+                while position < target and cap.grab():
+                    position += 1
+            ok, bgr = cap.read()
+            if not ok:
+                break
+            position = target + 1
+            frames.append(cv2.cvtColor(thumbnail(bgr, max_side, copy=False), cv2.COLOR_BGR2RGB))
+
+            # Step 3: Motion between the target and the next frame, on small grayscale copies
+            ok, following = cap.read()
+            if ok:
+                position += 1
+                previous, gray = (cv2.cvtColor(pyramid_downscale(image, motion_max_side), cv2.COLOR_BGR2GRAY)
+                                  for image in (bgr, following))
+                motion.add_pair(previous, gray, target + 1)
+
+        return frames, {**motion.result(total_frames=total), 'sample_interval_sec': step / fps}
+    finally:
+        cap.release()
+
+def _bounded_frames_and_motion(video_path: str, interval_sec: float, max_frames: int, max_side: Optional[int],
+                               motion_max_side: int, motion_threshold: float) -> Tuple[List[np.ndarray], Dict[str, Any]]:
+    """Full decode keeping at most max_frames evenly spaced, downscaled frames
+
+    Without a known length the interval can't be widened up front, so a
+    ThumbnailReservoir thins the kept frames as the video goes on.
+    """
+    kept = ThumbnailReservoir(max(1, max_frames), max_side)
+    motion = MotionEngine(motion_threshold, motion_max_side)
+    timestamps = []
+    sample_index = 0
+    for item in iter_video_frames(video_path, interval_sec, motion_max_side):
+        motion.add(item.gray)
+        if item.rgb is not None:
+            if len(timestamps) < 2:
+                timestamps.append(item.timestamp)
+            kept.add(sample_index, item.rgb)
+            sample_index += 1
+    sample_interval = timestamps[1] - timestamps[0] if len(timestamps) > 1 else interval_sec
+    if len(kept.indices) > 1:
+        sample_interval *= kept.indices[1] - kept.indices[0]
+    return kept.frames, {**motion.result(), 'sample_interval_sec': sample_interval}
+
+def sample_video(video_path: str, video_config: Dict[str, Any]) -> Tuple[List[np.ndarray], Dict[str, Any]]:
+    """Frames and motion_data using the decode mode chosen in the config's video section"""
+    interval_sec = video_config.get('interval_sec', 2.0)
+    motion_max_side = video_config.get('motion_max_side', 320)
+    motion_threshold = video_config.get('motion_threshold', 3.5)
+    if video_config.get('sparse'):
+        return sparse_frames_and_motion(video_path, interval_sec, video_config.get('max_frames', 60),
+                                        video_config.get('frame_max_side'), motion_max_side,
+                                        motion_threshold=motion_threshold)
+    return decode_frames_and_motion(video_path, interval_sec, motion_max_side, motion_threshold)
+
+class ThumbnailReservoir:
+    def __init__(self, max_count: int = 32, max_side: Optional[int] = 384):
+        """Evenly spaced, downscaled copies of sampled frames with bounded memory
+
+        When full, every other thumbnail is dropped and the keep-stride
+        doubles, so memory stays at max_count thumbnails for any clip length.
+        """
+        self.max_count = max_count
+        self.max_side = max_side
+        self.frames: List[np.ndarray] = []
+        self.indices: List[int] = []
+        self._stride = 1
+
+    def add(self, sample_index: int, rgb: np.ndarray):
+        if sample_index % self._stride:
+            return
+        self.frames.append(thumbnail(rgb, self.max_side))
+        self.indices.append(sample_index)
+
+        if len(self.frames) > self.max_count:
+            self._stride *= 2
+            keep = [k for k, index in enumerate(self.indices) if index % self._stride == 0]
+            self.frames = [self.frames[k] for k in keep]
+            self.indices = [self.indices[k] for k in keep]
+
+def remap_face_frames(face_analysis: Dict[str, Any], thumbnail_indices: List[int]) -> Dict[str, Any]:
+    """Point suspicious_frames at the nearest thumbnail instead of the sampled frame"""
+    if not thumbnail_indices or not face_analysis.get('suspicious_frames'):
+        return face_analysis
+    positions = np.asarray(thumbnail_indices)
+    nearest = {int(np.abs(positions - index).argmin()) for index in face_analysis['suspicious_frames']}
+    return {**face_analysis, 'suspicious_frames': sorted(nearest)}
+
+_END = object()
+
+class StreamingAnalyzer:
+    def __init__(self, captioner=None, detector=None, interval_sec: float = 2.0, buffer_size: int = 8,
+                 motion_max_side: int = 320, max_thumbnails: int = 32, motion_threshold: float = 3.5,
+                 deduplicator=None):
+        """Single-decode pipeline feeding motion, captioning and face stages through bounded queues
+
+        The calling thread decodes and pushes each frame into one queue per
+        stage thread; a full queue blocks the decoder, so peak memory depends
+        on buffer_size and the captioning batch size, not on video length.
+
+        With a deduplicator (dedup.CaptionDeduplicator) only the first frame
+        of each run of near-identical frames is captioned, since the stream
+        can't hold a whole run to pick its middle one. Captions are labelled
+        with their segment's frame and time range, as in the decoded path.
+        """
+        self.captioner = captioner
+        self.deduplicator = deduplicator
+        self.detector = detector
+        self.interval_sec = interval_sec
+        self.buffer_size = max(1, buffer_size)
+        self.motion_max_side = motion_max_side
+        self.motion_threshold = motion_threshold
+        self.max_thumbnails = max_thumbnails
+
+    def run(self, video_path: str, on_progress: Optional[Callable[[int, float], None]] = None) -> Dict[str, Any]:
+        """Analyze a video and return motion_data, captions, face_analysis and Gemini thumbnails"""
+        motion = MotionEngine(self.motion_threshold, self.motion_max_side)
+        thumbnails = ThumbnailReservoir(self.max_thumbnails)
+        captions: List[str] = []
+        segments = self.deduplicator.tracker() if self.deduplicator is not None else None
+        face_stream = self.detector.stream() if self.detector is not None else None
+        errors: Dict[str, str] = {}
+        # Stage threads record into the caller's telemetry collection, like DAG stages
+        records = telemetry.collecting()
+
+        def motion_stage(item: DecodedFrame):
+            motion.add(item.gray)
+
+        caption_batch: List[np.ndarray] = []
+        def flush_captions():
+            # Unlabelled here; labels are added once the segments are known
+            captions.extend(self.captioner.caption_batch(caption_batch))
+            caption_batch.clear()
+
+        def caption_stage(item: DecodedFrame):
+            if item is _END:
+                if caption_batch:
+                    flush_captions()
+                return
+            if segments is not None and not segments.add(item.rgb):
+                return
+            caption_batch.append(item.rgb)
+            if len(caption_batch) >= self.captioner.batch_size:
+                flush_captions()
+
+        def face_stage(item: DecodedFrame):
+            face_stream.add(item.rgb)
+
+        stages = {'motion_data': (motion_stage, False)}
+        if self.captioner is not None:
+            stages['captions'] = (caption_stage, True)
+        if face_stream is not None:
+            stages['face_analysis'] = (face_stage, False)
+
+        queues = {name: queue.Queue(maxsize=self.buffer_size) for name in stages}
+
+        def consume(name: str):
+            handler, wants_end = stages[name]
+            telemetry.attach(records)
+            try:
+                while True:
+                    item = queues[name].get()
+                    if item is _END:
+                        if wants_end and name not in errors:
+                            try:
+                                handler(_END)
+                            except Exception as e:
+                                errors[name] = str(e)
+                        return
+                    if name in errors:
+                        continue  # keep draining so the decoder never blocks on a failed stage
+                    try:
+                        handler(item)
+                    except Exception as e:
+                        errors[name] = str(e)
+            finally:
+                telemetry.attach(None)
+
+        workers = [threading.Thread(target=consume, args=(name,), name=f"stream-{name}", daemon=True)
+                   for name in stages]
+        for worker in workers:
+            worker.start()
+
+        sample_index = 0
+        try:
+            for item in iter_video_frames(video_path, self.interval_sec, self.motion_max_side):
+                queues['motion_data'].put(item._replace(rgb=None))
+                if item.rgb is not None:
+                    thumbnails.add(sample_index, item.rgb)
+                    for name in ('captions', 'face_analysis'):
+                        if name in queues:
+                            queues[name].put(item)
+                    sample_index += 1
+                    if on_progress:
+                        on_progress(sample_index, item.timestamp)
+        finally:
+            for q in queues.values():
+                q.put(_END)
+            for worker in workers:
+                worker.join()
+
+        if self.captioner is not None and 'captions' not in errors:
+            if segments is not None:
+                segment_list = segments.finish()
+                complete = len(captions) == len(segment_list)
+                labelled = self.deduplicator.label_captions(segment_list, captions, self.interval_sec)
+            else:
+                complete = len(captions) == sample_index
+                labelled = [f"Frame {i + 1}: {caption}" for i, caption in enumerate(captions)]
+            if not complete:
+                errors['captions'] = 'incomplete captions'
+            captions = labelled
+
+        return {
+            'frame_count': sample_index,
+            'motion_data': motion.result(),
+            'captions': captions,
+            'face_analysis': face_stream.summary() if face_stream is not None else None,
+            'thumbnails': thumbnails.frames,
+            'thumbnail_indices': thumbnails.indices,
+            'errors': errors
+        }
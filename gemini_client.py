@@ -0,0 +1,204 @@
+import asyncio
+import hashlib
+import logging
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from telemetry import telemetry
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses and google.api_core exception names worth retrying
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {
+    'ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable', 'DeadlineExceeded',
+    'InternalServerError', 'BadGateway', 'GatewayTimeout', 'RetryError'
+}
+
+def is_retryable(error: Exception) -> bool:
+    """Whether an API error is transient (quota, overload, timeout)"""
+    if type(error).__name__ in RETRYABLE_ERRORS:
+        return True
+    code = getattr(error, 'code', None)
+    return isinstance(code, int) and code in RETRYABLE_STATUS
+
+def request_key(content: Any) -> str:
+    """Hash of a request's prompt and images, used to deduplicate in-flight calls"""
+    digest = hashlib.sha256()
+    items = content if isinstance(content, list) else [content]
+    for item in items:
+        if isinstance(item, str):
+            digest.update(item.encode('utf-8'))
+        elif isinstance(item, dict) and 'data' in item:
+            digest.update(item['data'])
+        elif hasattr(item, 'tobytes'):
+            # PIL images and NumPy arrays
+            digest.update(repr(getattr(item, 'size', None)).encode('utf-8'))
+            digest.update(item.tobytes())
+        else:
+            digest.update(repr(item).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+class TokenBucket:
+    def __init__(self, requests_per_minute: float, burst: int = 1):
+        """Thread-safe token bucket shared by sync callers and any event loop
+
+        Callers reserve a token and sleep for the returned delay, so the lock
+        is never held while waiting.
+        """
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token and return how long to wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        delay = self.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+class GeminiClient:
+    def __init__(self, max_concurrency: int = 4, requests_per_minute: float = 15,
+                 burst: Optional[int] = None, max_retries: int = 4,
+                 base_delay: float = 1.0, max_delay: float = 30.0):
+        """Rate-limited, retrying wrapper around GenerativeModel.generate_content
+
+        Every call, sync or async, takes a token from one bucket sized to the
+        Gemini quota and holds one of max_concurrency slots while in flight.
+        The slots are one threading semaphore shared by threads and every
+        event loop, so the limit holds for the whole process.
+        Transient errors are retried with jittered exponential backoff, and
+        identical concurrent async requests share one API call.
+        """
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.bucket = TokenBucket(requests_per_minute, burst or self.max_concurrency)
+        self.stats = {'requests': 0, 'retries': 0, 'deduplicated': 0, 'failures': 0}
+
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        # Async callers wait for a slot on these threads, never on the default
+        # executor that _call_async needs to make progress
+        self._slot_waiters: Optional[ThreadPoolExecutor] = None
+        self._waiters_lock = threading.Lock()
+        # In-flight request maps hold asyncio tasks, which belong to one loop
+        self._loops = weakref.WeakKeyDictionary()
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with equal jitter"""
+        cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return cap / 2 + random.uniform(0, cap / 2)
+
+    def _should_retry(self, error: Exception, attempt: int) -> bool:
+        if attempt >= self.max_retries or not is_retryable(error):
+            self.stats['failures'] += 1
+            telemetry.incr('gemini_failures')
+            return False
+        self.stats['retries'] += 1
+        telemetry.incr('gemini_retries')
+        return True
+
+    def generate(self, model: Any, content: Any) -> str:
+        """Blocking call returning the response text"""
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                with self._slots, telemetry.span('model', model='gemini'):
+                    self.stats['requests'] += 1
+                    return model.generate_content(content).text
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                delay = self._backoff(attempt)
+                logger.info(f"Gemini request failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _loop_state(self) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            state = {'in_flight': {}}
+            self._loops[loop] = state
+        return state
+
+    async def generate_async(self, model: Any, content: Any) -> str:
+        """Concurrent call returning the response text
+
+        A request identical to one already in flight on this loop waits for
+        that call instead of spending quota on a duplicate.
+        """
+        state = self._loop_state()
+        key = f"{getattr(model, 'model_name', id(model))}:{request_key(content)}"
+
+        task = state['in_flight'].get(key)
+        if task is not None:
+            self.stats['deduplicated'] += 1
+        else:
+            task = asyncio.ensure_future(self._generate_with_retry(model, content))
+            state['in_flight'][key] = task
+            task.add_done_callback(lambda _: state['in_flight'].pop(key, None))
+
+        # Shield so one cancelled caller doesn't cancel the shared request
+        return await asyncio.shield(task)
+
+    async def _acquire_slot(self):
+        """Take one of the process-wide slots without blocking the event loop"""
+        if self._slots.acquire(blocking=False):
+            return
+        with self._waiters_lock:
+            if self._slot_waiters is None:
+                self._slot_waiters = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix='gemini-slots')
+        acquiring = asyncio.get_running_loop().run_in_executor(self._slot_waiters, self._slots.acquire)
+        try:
+            await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # The waiting thread still takes the slot; hand it back once it does
+            acquiring.add_done_callback(lambda _: self._slots.release())
+            raise
+
+    async def _generate_with_retry(self, model: Any, content: Any) -> str:
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire_async()
+            try:
+                await self._acquire_slot()
+                try:
+                    self.stats['requests'] += 1
+                    with telemetry.span('model', model='gemini'):
+                        response = await self._call_async(model, content)
+                finally:
+                    self._slots.release()
+                return response.text
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                delay = self._backoff(attempt)
+                logger.info(f"Gemini request failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def _call_async(self, model: Any, content: Any):
+        generate = getattr(model, 'generate_content_async', None)
+        if generate is not None:
+            return await generate(content)
+        return await asyncio.to_thread(model.generate_content, content)
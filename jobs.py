@@ -0,0 +1,475 @@
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+logger = logging.getLogger(__name__)
+
+# queued -> running -> done | failed | cancelled; running jobs go back to
+# queued for a retry, or when their worker stops heartbeating
+STATUSES = ('queued', 'running', 'done', 'failed', 'cancelled')
+FINAL_STATUSES = ('done', 'failed', 'cancelled')
+
+# How often claim() also purges expired finished jobs
+PURGE_INTERVAL_SEC = 60.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    owned INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    stages_done TEXT NOT NULL DEFAULT '[]',
+    worker TEXT,
+    error TEXT,
+    result TEXT,
+    not_before REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority DESC, created_at);
+"""
+
+class JobCancelled(Exception):
+    """Raised inside a worker when its running job has been cancelled"""
+
+def _to_json(value: Any) -> Any:
+    # NumPy scalars and arrays both expose tolist()
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+class JobQueue:
+    def __init__(self, db_path: str, max_attempts: int = 3, retry_delay_sec: float = 10.0,
+                 lease_sec: float = 300.0, retention_sec: float = 86400.0):
+        """Durable priority queue of analysis jobs in a SQLite file
+
+        Any number of processes (the UI, the HTTP endpoint, workers) can open
+        the same file. Higher priority jobs are claimed first, then oldest
+        first. A job that raises, or whose result has stage fallbacks, is
+        queued again after retry_delay_sec * attempts until max_attempts
+        runs. Every retry reruns the whole analysis; with the result cache
+        enabled the stages that succeeded are cache hits, so only the failed
+        ones are recomputed. A running job whose worker hasn't heartbeated
+        for lease_sec is handed to another worker. Finished jobs are purged
+        retention_sec after they finish.
+        """
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.retry_delay_sec = retry_delay_sec
+        self.lease_sec = lease_sec
+        self.retention_sec = retention_sec
+        self._purged_at = 0.0
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per call keeps the queue safe to share between threads
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                yield db
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+            db.execute('COMMIT')
+
+    @staticmethod
+    def _row(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        job['stages_done'] = json.loads(job['stages_done'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        job['owned'] = bool(job['owned'])
+        job['cancel_requested'] = bool(job['cancel_requested'])
+        return job
+
+    def submit(self, path: str, priority: int = 0, job_id: Optional[str] = None,
+               owned: bool = False, max_attempts: Optional[int] = None) -> str:
+        """Queue a video and return its job ID
+
+        owned jobs hand the file over to the queue (used for uploads the
+        submitter doesn't keep). It is deleted once the job is done, or when a
+        failed or cancelled job is purged, so those can still be retried.
+        """
+        job_id = job_id or uuid.uuid4().hex
+        with self._connect() as db:
+            db.execute(
+                'INSERT INTO jobs (id, path, priority, owned, max_attempts, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, os.path.abspath(path), priority, int(owned),
+                 max_attempts or self.max_attempts, time.time())
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as db:
+            return self._row(db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone())
+
+    def list(self, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Most recent jobs first, without their results"""
+        query = 'SELECT * FROM jobs'
+        params: list = []
+        if status:
+            query += ' WHERE status = ?'
+            params.append(status)
+        query += ' ORDER BY created_at DESC LIMIT ?'
+        params.append(limit)
+        with self._connect() as db:
+            jobs = [self._row(row) for row in db.execute(query, params)]
+        for job in jobs:
+            job.pop('result')
+        return jobs
+
+    def counts(self) -> Dict[str, int]:
+        counts = {status: 0 for status in STATUSES}
+        with self._connect() as db:
+            for row in db.execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status'):
+                counts[row['status']] = row['n']
+        return counts
+
+    def position(self, job_id: str) -> Optional[int]:
+        """How many ready jobs will be claimed before this queued one"""
+        with self._connect() as db:
+            job = db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if job is None or job['status'] != 'queued':
+                return None
+            return db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND "
+                "(priority > ? OR (priority = ? AND created_at < ?))",
+                (job['priority'], job['priority'], job['created_at'])
+            ).fetchone()[0]
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """Atomically take the next ready job, or None if there is none"""
+        now = time.time()
+        if now - self._purged_at >= PURGE_INTERVAL_SEC:
+            self._purged_at = now
+            self.purge()
+
+        claimed = None
+        with self._transaction() as db:
+            # Step 1: Recover jobs whose worker died mid-run
+            stale = now - self.lease_sec
+            db.execute("UPDATE jobs SET status = 'failed', error = 'Worker stopped responding', finished_at = ? "
+                       "WHERE status = 'running' AND heartbeat_at < ? AND attempts >= max_attempts", (now, stale))
+            db.execute("UPDATE jobs SET status = 'queued', worker = NULL "
+                       "WHERE status = 'running' AND heartbeat_at < ?", (stale,))
+
+            # Step 2: Take the highest priority, oldest ready job
+            row = db.execute("SELECT id FROM jobs WHERE status = 'queued' AND not_before <= ? "
+                             "ORDER BY priority DESC, created_at LIMIT 1", (now,)).fetchone()
+            if row is not None:
+                db.execute("UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?, "
+                           "started_at = ?, heartbeat_at = ?, stages_done = '[]' WHERE id = ?",
+                           (worker, now, now, row['id']))
+                claimed = self._row(db.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],)).fetchone())
+        return claimed
+
+    def heartbeat(self, job_id: str, stage: Optional[str] = None) -> bool:
+        """Extend the job's lease, recording a finished stage; True if it was cancelled"""
+        with self._transaction() as db:
+            row = db.execute('SELECT stages_done, cancel_requested FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                return True
+            stages = json.loads(row['stages_done'])
+            if stage is not None and stage not in stages:
+                stages.append(stage)
+            db.execute('UPDATE jobs SET heartbeat_at = ?, stages_done = ? WHERE id = ?',
+                       (time.time(), json.dumps(stages), job_id))
+            return bool(row['cancel_requested'])
+
+    def _retry_or(self, db, job: sqlite3.Row, status: str, error: Optional[str], result: Optional[str]) -> str:
+        now = time.time()
+        if job['attempts'] < job['max_attempts'] and not job['cancel_requested']:
+            db.execute("UPDATE jobs SET status = 'queued', worker = NULL, error = ?, result = ?, not_before = ? "
+                       "WHERE id = ?", (error, result, now + self.retry_delay_sec * job['attempts'], job['id']))
+            return 'queued'
+        db.execute('UPDATE jobs SET status = ?, error = ?, result = ?, finished_at = ? WHERE id = ?',
+                   (status, error, result, now, job['id']))
+        return status
+
+    def complete(self, job_id: str, result: Dict[str, Any]) -> str:
+        """Store a result; one with stage fallbacks is retried while attempts remain"""
+        payload = json.dumps(result, default=_to_json, ensure_ascii=False)
+        errors = result.get('errors') or {}
+        with self._transaction() as db:
+            job = db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if errors:
+                error = '; '.join(f"{stage}: {message}" for stage, message in errors.items())
+                status = self._retry_or(db, job, 'done', error, payload)
+            else:
+                db.execute("UPDATE jobs SET status = 'done', error = NULL, result = ?, finished_at = ? WHERE id = ?",
+                           (payload, time.time(), job_id))
+                status = 'done'
+        if status != 'queued':
+            self._release(job)
+        return status
+
+    def fail(self, job_id: str, error: str) -> str:
+        """Record an exception; the job is retried while attempts remain"""
+        with self._transaction() as db:
+            job = db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            return self._retry_or(db, job, 'failed', error, job['result'])
+
+    def mark_cancelled(self, job_id: str):
+        """Called by the worker once a running job has stopped"""
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued job now, or ask its worker to stop a running one
+
+        A running job stops when its current stage finishes. Returns False if
+        the job doesn't exist or is already finished.
+        """
+        with self._transaction() as db:
+            job = db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if job is None or job['status'] in FINAL_STATUSES:
+                return False
+            if job['status'] == 'queued':
+                db.execute("UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ?", (time.time(), job_id))
+            else:
+                db.execute('UPDATE jobs SET cancel_requested = 1 WHERE id = ?', (job_id,))
+        return True
+
+    def give_up(self, job_id: str, error: str) -> str:
+        """Fail a running job without retrying, e.g. when a retry can't help"""
+        with self._connect() as db:
+            db.execute("UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                       (error, time.time(), job_id))
+        return 'failed'
+
+    def can_retry(self, job: Dict[str, Any]) -> bool:
+        """Whether retry() would requeue this job: it failed or was cancelled and its file still exists"""
+        return job['status'] in ('failed', 'cancelled') and os.path.exists(job['path'])
+
+    def retry(self, job_id: str) -> bool:
+        """Queue a failed or cancelled job again with a fresh set of attempts
+
+        The previous error and result are cleared. Returns False if the job
+        can't be retried, including when its video file is gone.
+        """
+        with self._transaction() as db:
+            job = self._row(db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone())
+            if job is None or not self.can_retry(job):
+                return False
+            db.execute("UPDATE jobs SET status = 'queued', attempts = 0, cancel_requested = 0, not_before = 0, "
+                       "worker = NULL, error = NULL, result = NULL, stages_done = '[]', finished_at = NULL "
+                       "WHERE id = ?", (job_id,))
+            return True
+
+    def purge(self, older_than_sec: Optional[float] = None) -> int:
+        """Delete jobs finished more than older_than_sec (default retention_sec) ago, with their owned files"""
+        cutoff = time.time() - (self.retention_sec if older_than_sec is None else older_than_sec)
+        statuses = ', '.join('?' * len(FINAL_STATUSES))
+        with self._transaction() as db:
+            jobs = db.execute(f"SELECT * FROM jobs WHERE status IN ({statuses}) AND finished_at < ?",
+                              (*FINAL_STATUSES, cutoff)).fetchall()
+            db.execute(f"DELETE FROM jobs WHERE status IN ({statuses}) AND finished_at < ?",
+                       (*FINAL_STATUSES, cutoff))
+        for job in jobs:
+            self._release(job)
+        return len(jobs)
+
+    @staticmethod
+    def _release(job: Optional[sqlite3.Row]):
+        # Uploads handed to the queue are only needed until the job is done or purged
+        if job is not None and job['owned']:
+            try:
+                os.unlink(job['path'])
+            except OSError:
+                pass
+
+def queue_from_config(section: Dict[str, Any]) -> JobQueue:
+    return JobQueue(section['db_path'], section.get('max_attempts', 3),
+                    section.get('retry_delay_sec', 10.0), section.get('lease_sec', 300.0),
+                    section.get('retention_sec', 86400.0))
+
+def _heartbeat_loop(queue: JobQueue, job_id: str, cancelled: threading.Event, stop: threading.Event):
+    # Long stages (e.g. captioning a long video) must not lose the lease
+    while not stop.wait(queue.lease_sec / 3):
+        try:
+            if queue.heartbeat(job_id):
+                cancelled.set()
+        except sqlite3.Error as e:
+            logger.warning(f"Heartbeat for job {job_id} failed: {e}")
+
+def run_job(queue: JobQueue, pipeline, job: Dict[str, Any]) -> str:
+    """Analyze one claimed job and record the outcome; returns its new status"""
+    cancelled = threading.Event()
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat_loop, args=(queue, job['id'], cancelled, stop), daemon=True)
+    heartbeat.start()
+
+    def on_stage(name, value, error):
+        if queue.heartbeat(job['id'], name) or cancelled.is_set():
+            raise JobCancelled(job['id'])
+
+    try:
+        if not os.path.exists(job['path']):
+            # Retrying can't bring the file back
+            return queue.give_up(job['id'], f"No such file: {job['path']}")
+        result = pipeline.analyze(job['path'], on_stage=on_stage)
+        return queue.complete(job['id'], result)
+    except JobCancelled:
+        queue.mark_cancelled(job['id'])
+        return 'cancelled'
+    except Exception as e:
+        logger.warning(f"Job {job['id']} failed: {type(e).__name__}: {e}")
+        return queue.fail(job['id'], f"{type(e).__name__}: {str(e)}")
+    finally:
+        stop.set()
+
+def worker_loop(config: Dict[str, Any], threads: int = 2, name: Optional[str] = None,
+                stop: Optional[Any] = None, max_jobs: Optional[int] = None):
+    """Claim and analyze jobs until stop is set (or max_jobs have run)
+
+    Runs in its own process: the models are loaded once and reused for
+    every job this worker claims.
+    """
+    os.environ.setdefault('OMP_NUM_THREADS', str(threads))
+    import torch
+    torch.set_num_threads(threads)
+
+    from pipeline import AnalysisPipeline
+    from registry import warm_up
+    pipeline = AnalysisPipeline(config)
+    warm_up(config)
+
+    section = config['jobs']
+    queue = queue_from_config(section)
+    name = name or f"{socket.gethostname()}:{os.getpid()}"
+    processed = 0
+    with pipeline:
+        while (stop is None or not stop.is_set()) and (max_jobs is None or processed < max_jobs):
+            job = queue.claim(name)
+            if job is None:
+                time.sleep(section.get('poll_interval_sec', 1.0))
+                continue
+            status = run_job(queue, pipeline, job)
+            processed += 1
+            logger.info(f"{name}: job {job['id']} {status}")
+
+def run_workers(config: Dict[str, Any], workers: int, threads_per_worker: int) -> Tuple[List[Any], Any]:
+    """Start worker processes; returns (processes, stop event) for stop_workers"""
+    context = multiprocessing.get_context('spawn')
+    stop = context.Event()
+    processes = []
+    for i in range(workers):
+        # Not daemonic: a worker may start its own caption/face processes (see frame_store.FramePool)
+        process = context.Process(target=worker_loop, args=(config, threads_per_worker),
+                                  kwargs={'stop': stop}, name=f"feasibility-worker-{i}")
+        process.start()
+        processes.append(process)
+    return processes, stop
+
+def stop_workers(processes: List[Any], stop: Any, timeout: Optional[float] = None):
+    """Let every worker finish its current job, then wait for it to exit"""
+    stop.set()
+    for process in processes:
+        process.join(timeout)
+
+class _JobHandler(BaseHTTPRequestHandler):
+    queue: JobQueue = None
+
+    def _send(self, status: int, body: Any):
+        payload = json.dumps(body, default=_to_json, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_GET(self):
+        parts = [unquote(part) for part in urlsplit(self.path).path.split('/') if part]
+        if parts == ['stats']:
+            return self._send(200, self.queue.counts())
+        if parts == ['jobs']:
+            query = parse_qs(urlsplit(self.path).query)
+            status = query.get('status', [None])[-1]
+            if status and status not in STATUSES:
+                return self._send(400, {'error': f"Unknown status '{status}', expected one of {STATUSES}"})
+            try:
+                limit = int(query.get('limit', ['100'])[-1])
+            except ValueError:
+                limit = 0
+            if limit < 1:
+                return self._send(400, {'error': "'limit' must be a positive integer"})
+            return self._send(200, self.queue.list(status, limit))
+        if len(parts) == 2 and parts[0] == 'jobs':
+            job = self.queue.get(parts[1])
+            if job is None:
+                return self._send(404, {'error': 'Unknown job'})
+            job['position'] = self.queue.position(parts[1])
+            return self._send(200, job)
+        self._send(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        parts = [unquote(part) for part in urlsplit(self.path).path.split('/') if part]
+        try:
+            if parts == ['jobs']:
+                body = self._read_json()
+                if 'path' not in body:
+                    return self._send(400, {'error': "Missing 'path'"})
+                if not os.path.exists(body['path']):
+                    return self._send(400, {'error': f"No such file: {body['path']}"})
+                job_id = self.queue.submit(body['path'], int(body.get('priority', 0)), body.get('id'))
+                return self._send(201, {'id': job_id})
+            if len(parts) == 3 and parts[0] == 'jobs' and parts[2] in ('cancel', 'retry'):
+                action = self.queue.cancel if parts[2] == 'cancel' else self.queue.retry
+                if action(parts[1]):
+                    return self._send(200, self.queue.get(parts[1]))
+                return self._send(409, {'error': f"Job can't be {parts[2]}ed in its current state"})
+        except (ValueError, sqlite3.IntegrityError) as e:
+            return self._send(400, {'error': str(e)})
+        self._send(404, {'error': 'Not found'})
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+def make_server(queue: JobQueue, host: str = '127.0.0.1', port: int = 8765) -> ThreadingHTTPServer:
+    """HTTP endpoint for submitting and polling jobs
+
+        POST /jobs {"path": ..., "priority": 0}   -> {"id": ...}
+        GET  /jobs/<id>                           -> status, finished stages, result
+        GET  /jobs?status=queued&limit=100        -> recent jobs
+        POST /jobs/<id>/cancel, /jobs/<id>/retry
+        GET  /stats                               -> job counts by status
+
+    Paths are read by the workers, so they must be visible on their machine.
+    """
+    handler = type('JobHandler', (_JobHandler,), {'queue': queue})
+    return ThreadingHTTPServer((host, port), handler)
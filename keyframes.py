@@ -0,0 +1,127 @@
+import cv2
+import numpy as np
+from typing import Any, Dict, List, Optional
+
+from motion import as_motion_array
+
+def _normalize(scores: np.ndarray) -> np.ndarray:
+    peak = scores.max() if len(scores) else 0
+    return scores / peak if peak > 0 else np.zeros_like(scores)
+
+def scene_change_scores(frames: List[np.ndarray], size: int = 64) -> np.ndarray:
+    """Mean absolute difference of each frame to the previous one, on small grayscale thumbnails"""
+    scores = np.zeros(len(frames))
+    previous = None
+    for i, frame in enumerate(frames):
+        gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY) if frame.ndim == 3 else frame
+        thumb = cv2.resize(gray, (size, size), interpolation=cv2.INTER_AREA).astype(np.int16)
+        if previous is not None:
+            scores[i] = np.abs(thumb - previous).mean()
+        previous = thumb
+    # The first frame has no predecessor; give it an average score
+    if len(frames) > 1:
+        scores[0] = scores[1:].mean()
+    return scores
+
+def motion_anomaly_scores(count: int, motion_data: Optional[Dict[str, Any]]) -> np.ndarray:
+    """Per sampled frame motion anomaly strength, mapped from decoded frame numbers by position
+
+    Uses the highest positive anomaly score landing on each sampled frame
+    when motion_data has the per-frame array, else counts listed anomalies.
+    """
+    scores = np.zeros(count)
+    if not motion_data or not count:
+        return scores
+
+    total = max(motion_data.get('total_frames') or 0, 1)
+    if motion_data.get('per_frame') is not None:
+        per_frame = as_motion_array(motion_data['per_frame'])
+        if len(per_frame):
+            positions = np.minimum(count - 1, (per_frame['frame'] / total * count).astype(np.intp))
+            np.maximum.at(scores, positions, np.clip(per_frame['score'], 0, None))
+        return scores
+
+    for anomaly in motion_data.get('anomalies', []):
+        index = min(count - 1, int(anomaly['frame'] / total * count))
+        scores[index] += 1
+    return scores
+
+def face_scores(count: int, face_analysis: Optional[Dict[str, Any]]) -> np.ndarray:
+    """1 for frames where DeepfakeDetector found a suspicious face"""
+    scores = np.zeros(count)
+    if face_analysis:
+        for index in face_analysis.get('suspicious_frames', []):
+            if 0 <= index < count:
+                scores[index] = 1
+    return scores
+
+def select_keyframes(frames: List[np.ndarray], k: int = 5, motion_data: Optional[Dict[str, Any]] = None,
+                     face_analysis: Optional[Dict[str, Any]] = None,
+                     weights: tuple = (1.0, 1.0, 1.5)) -> List[int]:
+    """Indices of the k most informative frames, in temporal order
+
+    Frames are scored by scene change, motion anomalies and suspicious faces.
+    Picks are made greedily, skipping frames close to one already chosen so
+    the selection still covers the whole clip.
+    """
+    count = len(frames)
+    if count <= k:
+        return list(range(count))
+
+    scene_weight, motion_weight, face_weight = weights
+    scores = (scene_weight * _normalize(scene_change_scores(frames))
+              + motion_weight * _normalize(motion_anomaly_scores(count, motion_data))
+              + face_weight * face_scores(count, face_analysis))
+    # Small prior so ties (e.g. a static clip) spread evenly over the clip
+    scores += 1e-3 * np.cos(np.linspace(0, 2 * np.pi * k, count))
+
+    min_gap = max(1, count // (2 * k))
+    available = np.ones(count, dtype=bool)
+    chosen = []
+    for index in np.argsort(scores)[::-1]:
+        if len(chosen) == k:
+            break
+        if available[index]:
+            chosen.append(int(index))
+            available[max(0, index - min_gap + 1):index + min_gap] = False
+
+    # Not enough well-separated frames: fill up with the best remaining ones
+    for index in np.argsort(scores)[::-1]:
+        if len(chosen) == k:
+            break
+        if int(index) not in chosen:
+            chosen.append(int(index))
+
+    return sorted(chosen)
+
+def encode_keyframes(frames: List[np.ndarray], byte_budget: int = 1_000_000, max_side: int = 768,
+                     min_quality: int = 40) -> List[Dict[str, Any]]:
+    """JPEG-encode RGB frames as Gemini blobs, shrinking them until they fit the byte budget
+
+    The budget is split evenly across frames. Each frame first drops JPEG
+    quality down to min_quality, then resolution, until it fits its share.
+    """
+    if not frames:
+        return []
+
+    per_frame = byte_budget // len(frames)
+    blobs = []
+    for frame in frames:
+        bgr = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+        side = max_side
+        data = None
+        while data is None or (len(data) > per_frame and side >= 128):
+            height, width = bgr.shape[:2]
+            scale = min(1.0, side / max(height, width))
+            image = bgr if scale == 1.0 else cv2.resize(
+                bgr, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+
+            for quality in range(85, min_quality - 1, -15):
+                ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+                data = encoded.tobytes()
+                if len(data) <= per_frame:
+                    break
+            side = int(side * 0.75)
+
+        blobs.append({'mime_type': 'image/jpeg', 'data': data})
+    return blobs
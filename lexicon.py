@@ -0,0 +1,230 @@
+import math
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+# Evidence that a scene is implausible (positive weights) or ordinary (negative).
+# Each key lists the word forms that count, separated by '|'; matching is
+# case-insensitive, whole-word, and multi-word terms allow any whitespace.
+IMPOSSIBLE_TERMS = {
+    'teleport|teleports|teleported|teleporting|teleportation': 3.0,
+    'levitate|levitates|levitated|levitating|levitation': 2.5,
+    'defies gravity|defying gravity|anti-gravity|antigravity': 3.0,
+    'time travel|time traveling|time travelling|time traveler': 3.0,
+    'magic|magical|spell|spells|wizard|witch|sorcerer': 2.0,
+    'supernatural|paranormal|ghost|ghosts|demon|demons|haunted': 2.0,
+    'dragon|dragons|unicorn|unicorns|mermaid|mermaids|fairy|fairies|giant monster': 2.5,
+    'alien|aliens|ufo|ufos|spaceship|flying saucer': 2.0,
+    'superpower|superpowers|superhero|telekinesis|telepathy|invisible|invisibility': 2.5,
+    'shapeshift|shapeshifts|shapeshifting|shapeshifter|morphs into': 1.5,
+    # Plain "flying" or "floating" is how captions describe birds, planes and boats
+    'flying man|flying men|flying person|flying people|flying car|flying cars|flying pig|flying house': 1.5,
+    'bulletproof|indestructible|unharmed by|immune to fire': 1.5,
+    'raised from the dead|comes back to life|resurrected': 2.5,
+    'walks on water|walking on water|breathes underwater|breathing underwater': 2.0,
+    'talking animal|talking dog|talking cat|animal speaks|dog speaks|cat speaks': 2.0,
+}
+
+QUESTIONABLE_TERMS = {
+    'shark|sharks|tiger|tigers|lion|lions|bear|bears|crocodile|alligator|snake|snakes': 0.6,
+    'explosion|explodes|exploded|exploding|blast|detonates': 0.7,
+    'fire|flames|burning|on fire|inferno': 0.4,
+    'jump|jumps|jumped|jumping|leaps|leaped|leaping': 0.3,
+    'backflip|backflips|somersault|stunt|stunts|parkour': 0.5,
+    'crash|crashes|crashed|collision|collides|wreck': 0.5,
+    'tornado|hurricane|tsunami|earthquake|avalanche|lightning strike|struck by lightning': 0.6,
+    'rescue|rescues|rescued|saves|narrowly escapes|miraculously': 0.4,
+    'survives|survived|unscathed|without a scratch': 0.5,
+    'huge|enormous|gigantic|massive|giant': 0.3,
+    'cgi|animation|animated|cartoon|rendered|special effects|green screen': 0.8,
+}
+
+REALISTIC_TERMS = {
+    'walk|walks|walked|walking|stroll|strolling': -0.3,
+    'talk|talks|talking|speaking|conversation|interview': -0.3,
+    'sit|sits|sitting|stand|stands|standing': -0.2,
+    'cook|cooks|cooking|kitchen|eating|drinking': -0.3,
+    'street|sidewalk|park|office|classroom|living room|store|shop': -0.2,
+    'dog|dogs|cat|cats|bird|birds|plane|airplane|drone|helicopter': -0.2,
+    'car|cars|bus|bicycle|bike|train': -0.2,
+    'smile|smiles|smiling|laughs|laughing|waves|waving': -0.2,
+    'playing|plays|game|ball|football|soccer|basketball': -0.2,
+}
+
+# Words that cancel the term right after them ("no dragons", "isn't levitating")
+NEGATIONS = ('not', 'no', 'never', 'without', 'cannot', 'nobody', 'nothing', 'neither', 'nor')
+
+# Skipped when measuring how far a term is from a negation ("not a dragon", "isn't really levitating")
+FILLER_WORDS = frozenset(('a', 'an', 'the', 'any', 'some', 'really', 'actually', 'even', 'ever', 'just',
+                          'be', 'been', 'being', 'is', 'are', 'was', 'were', 'one', 'single'))
+
+# Word scores become a 0..1 implausibility with 1 - exp(-evidence)
+SCORE_BANDS = (
+    (0.8, '❌ Not Feasible'),
+    (0.5, '❓ Questionable'),
+    (0.0, '✅ Feasible')
+)
+
+class LexiconScore(NamedTuple):
+    score: float                         # 0 (ordinary) .. 1 (impossible)
+    evidence: float                      # summed weights before squashing
+    verdict: str
+    impossible: Tuple[str, ...]          # matched terms, in story order
+    questionable: Tuple[str, ...]
+    realistic: Tuple[str, ...]
+    negated: Tuple[str, ...]             # terms skipped because of a negation
+    motion: float                        # evidence from motion anomalies
+    faces: float                         # evidence from suspicious faces
+
+def _forms(key: str) -> List[str]:
+    return [form.strip().lower() for form in key.split('|') if form.strip()]
+
+def _form_pattern(form: str) -> str:
+    return r'\s+'.join(re.escape(word) for word in form.split())
+
+class LexiconEngine:
+    def __init__(self, impossible: Dict[str, float] = None, questionable: Dict[str, float] = None,
+                 realistic: Dict[str, float] = None, negations: Sequence[str] = NEGATIONS,
+                 negation_window: int = 1, motion_weight: float = 1.75, motion_ratio: float = 0.05,
+                 face_weight: float = 2.0):
+        """Offline feasibility scoring from a weighted lexicon plus motion and face signals
+
+        Every term form and negation word is compiled into one alternation
+        (longest forms first, whole words only), so a story is scanned once
+        however large the lexicon is. A negation cancels a term among the
+        next negation_window words after it, not counting FILLER_WORDS, and
+        the terms directly following a cancelled one ("no giant dragons");
+        "no fear, jumps" and "no fear jumps" both keep the jump. Motion adds up to
+        motion_weight as the anomaly ratio approaches motion_ratio (the same
+        as motion.SUSPICIOUS_ANOMALY_RATIO, which would import cv2), and faces
+        add face_weight times the suspicious-face ratio.
+        """
+        self.negation_window = negation_window
+        self.motion_weight = motion_weight
+        self.motion_ratio = motion_ratio
+        self.face_weight = face_weight
+
+        # Form -> (weight, category)
+        self.terms: Dict[str, Tuple[float, str]] = {}
+        for category, lexicon in (('realistic', REALISTIC_TERMS if realistic is None else realistic),
+                                  ('questionable', QUESTIONABLE_TERMS if questionable is None else questionable),
+                                  ('impossible', IMPOSSIBLE_TERMS if impossible is None else impossible)):
+            for key, weight in lexicon.items():
+                for form in _forms(key):
+                    self.terms[form] = (weight, category)
+
+        forms = sorted(self.terms, key=len, reverse=True)
+        negation_forms = sorted({word.lower() for word in negations}, key=len, reverse=True)
+        term_alternation = '|'.join(_form_pattern(form) for form in forms) or r'(?!)'
+        negation_alternation = '|'.join(re.escape(word) for word in negation_forms) or r'(?!)'
+        self.pattern = re.compile(
+            r"(?P<negation>\b(?:" + negation_alternation + r")\b|n't\b)"
+            r"|(?P<term>\b(?:" + term_alternation + r")\b)"
+            r"|(?P<clause>[.;:!?,\n]|\bbut\b)",
+            re.IGNORECASE
+        )
+        self._word = re.compile(r"[\w'-]+")
+
+    def _text_matches(self, story: str) -> Tuple[float, Dict[str, List[str]]]:
+        matched: Dict[str, List[str]] = {'impossible': [], 'questionable': [], 'realistic': [], 'negated': []}
+        evidence = 0.0
+        negation_end = None
+        for match in self.pattern.finditer(story):
+            kind = match.lastgroup
+            if kind == 'negation':
+                negation_end = match.end()
+            elif kind == 'clause':
+                negation_end = None
+            else:
+                form = ' '.join(match.group().lower().split())
+                weight, category = self.terms[form]
+                if negation_end is not None and self._negates(story, negation_end, match.start()):
+                    matched['negated'].append(form)
+                    # The negated phrase may go on: "no giant dragons"
+                    negation_end = match.end()
+                    continue
+                negation_end = None
+                matched[category].append(form)
+                evidence += weight
+        return evidence, matched
+
+    def _negates(self, story: str, negation_end: int, term_start: int) -> bool:
+        words = [word for word in self._word.findall(story, negation_end, term_start)
+                 if word.lower() not in FILLER_WORDS]
+        return len(words) < self.negation_window
+
+    def _signals(self, motion_data: Optional[dict], face_analysis: Optional[dict]) -> Tuple[float, float]:
+        motion = 0.0
+        if motion_data and self.motion_ratio > 0:
+            ratio = motion_data.get('anomaly_ratio', 0) or 0
+            motion = self.motion_weight * min(ratio / self.motion_ratio, 1.0)
+        faces = 0.0
+        if face_analysis:
+            faces = self.face_weight * (face_analysis.get('suspicious_ratio', 0) or 0)
+        return motion, faces
+
+    def score(self, story: str, motion_data: dict = None, face_analysis: dict = None) -> LexiconScore:
+        """Score one story; motion_data and face_analysis are the pipeline's outputs, if any"""
+        evidence, matched = self._text_matches(story or '')
+        motion, faces = self._signals(motion_data, face_analysis)
+        total = max(evidence, 0.0) + motion + faces
+        # Ordinary wording only offsets the word evidence, never motion or face artifacts
+        score = 1.0 - math.exp(-total)
+        verdict = next(label for threshold, label in SCORE_BANDS if score >= threshold)
+        return LexiconScore(score, evidence, verdict,
+                            tuple(matched['impossible']), tuple(matched['questionable']),
+                            tuple(matched['realistic']), tuple(matched['negated']), motion, faces)
+
+    def score_many(self, stories: Sequence[str], motion_data: Sequence[Optional[dict]] = None,
+                   face_analysis: Sequence[Optional[dict]] = None) -> List[LexiconScore]:
+        """Score a batch of stories; motion_data and face_analysis, if given, are parallel lists"""
+        motion_data = motion_data or [None] * len(stories)
+        face_analysis = face_analysis or [None] * len(stories)
+        return [self.score(story, motion, faces)
+                for story, motion, faces in zip(stories, motion_data, face_analysis)]
+
+def result_from_score(scored: LexiconScore) -> Dict[str, Any]:
+    """A LexiconScore in the shape of a FeasibilityAnalyzer result"""
+    reasons = []
+    if scored.impossible:
+        reasons.append(f"mentions {', '.join(dict.fromkeys(scored.impossible))}")
+    if scored.questionable:
+        reasons.append(f"involves {', '.join(dict.fromkeys(scored.questionable))}")
+    if scored.motion > 0:
+        reasons.append('has motion anomalies')
+    if scored.faces > 0:
+        reasons.append('has suspicious faces')
+
+    if scored.verdict == '❌ Not Feasible':
+        explanation = 'Contains elements that appear physically impossible, or too many implausible or suspicious signals together.'
+    elif scored.verdict == '❓ Questionable':
+        explanation = 'Contains elements that are unusual but potentially possible with special circumstances.'
+    else:
+        explanation = 'Appears to show realistic, physically possible events.'
+    if reasons:
+        explanation += f" The scene {'; '.join(reasons)}."
+
+    looks_real = (f"Ordinary activity: {', '.join(dict.fromkeys(scored.realistic))}."
+                  if scored.realistic else 'No strong signs either way in the description.')
+    fake_signs = list(dict.fromkeys(scored.impossible + scored.questionable))
+    if scored.motion > 0:
+        fake_signs.append('motion anomalies')
+    if scored.faces > 0:
+        fake_signs.append('suspicious faces')
+    looks_fake = f"{', '.join(fake_signs).capitalize()}." if fake_signs else 'Nothing implausible found.'
+
+    return {
+        'verdict': scored.verdict,
+        'explanation': explanation,
+        'looks_real': looks_real,
+        'looks_fake': looks_fake,
+        'offline_score': round(scored.score, 3)
+    }
+
+_default_engine: Optional[LexiconEngine] = None
+
+def default_engine() -> LexiconEngine:
+    """The built-in lexicon, compiled on first use"""
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = LexiconEngine()
+    return _default_engine
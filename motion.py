@@ -0,0 +1,187 @@
+import heapq
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from config import DEFAULT_PIPELINE_CONFIG
+
+DIRECTION_BINS = 8
+
+# One row per flow measurement: the frame it ends on, mean flow magnitude,
+# magnitude-weighted direction histogram (sums to 1) and robust anomaly score
+MOTION_DTYPE = np.dtype([
+    ('frame', np.int64),
+    ('magnitude', np.float32),
+    ('direction', np.float32, (DIRECTION_BINS,)),
+    ('score', np.float32)
+])
+
+# Scales the MAD to a standard deviation for normally distributed data
+MAD_TO_STD = 1.4826
+
+# A robust score above 3.5 flags well under 1% of the flow measurements of
+# steady footage, so a few percent already means repeated jumps or cuts
+SUSPICIOUS_ANOMALY_RATIO = 0.05
+
+def pyramid_downscale(gray: np.ndarray, max_side: int) -> np.ndarray:
+    """Halve with cv2.pyrDown until the longer side is at most max_side
+
+    Gaussian pyramid levels are cheaper than an arbitrary resize and smooth
+    away the pixel noise that makes dense flow noisy at full resolution.
+    """
+    while max(gray.shape[:2]) > max_side and min(gray.shape[:2]) >= 2:
+        gray = cv2.pyrDown(gray)
+    return gray
+
+def robust_scores(magnitude: np.ndarray) -> np.ndarray:
+    """Modified z-scores of the whole series: (x - median) / (1.4826 * MAD)
+
+    A static clip has a MAD of zero; the mean absolute deviation stands in
+    for it then, and if that is zero too every score is zero.
+    """
+    if not len(magnitude):
+        return np.zeros(0, dtype=np.float32)
+    median = np.median(magnitude)
+    deviation = np.abs(magnitude - median)
+    scale = MAD_TO_STD * np.median(deviation)
+    if scale <= 1e-9:
+        scale = 1.2533 * deviation.mean()
+    if scale <= 1e-9:
+        return np.zeros(len(magnitude), dtype=np.float32)
+    return ((magnitude - median) / scale).astype(np.float32)
+
+def as_motion_array(per_frame: Any) -> np.ndarray:
+    """MOTION_DTYPE array from motion_data['per_frame'], also after a JSON round trip"""
+    if isinstance(per_frame, np.ndarray) and per_frame.dtype == MOTION_DTYPE:
+        return per_frame
+    rows = [] if per_frame is None else per_frame
+    return np.array([tuple(row) for row in rows], dtype=MOTION_DTYPE)
+
+def motion_summary(motion_data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """motion_data without the per-frame array, for prompts and logs"""
+    if not motion_data:
+        return motion_data
+    return {key: value for key, value in motion_data.items() if key != 'per_frame'}
+
+class RunningMedian:
+    def __init__(self):
+        """Median of a growing series in O(log n) per value, with two heaps"""
+        self._low: List[float] = []   # max-heap (negated) of the smaller half
+        self._high: List[float] = []  # min-heap of the larger half
+
+    def add(self, value: float):
+        if self._low and value > -self._low[0]:
+            heapq.heappush(self._high, value)
+        else:
+            heapq.heappush(self._low, -value)
+        if len(self._low) > len(self._high) + 1:
+            heapq.heappush(self._high, -heapq.heappop(self._low))
+        elif len(self._high) > len(self._low):
+            heapq.heappush(self._low, -heapq.heappop(self._high))
+
+    def __len__(self) -> int:
+        return len(self._low) + len(self._high)
+
+    @property
+    def median(self) -> float:
+        if not self._low:
+            return 0.0
+        if len(self._low) > len(self._high):
+            return -self._low[0]
+        return (-self._low[0] + self._high[0]) / 2
+
+class MotionEngine:
+    def __init__(self, threshold: float = DEFAULT_PIPELINE_CONFIG['video']['motion_threshold'],
+                 max_side: int = DEFAULT_PIPELINE_CONFIG['video']['motion_max_side'],
+                 direction_bins: int = DIRECTION_BINS):
+        """Dense optical flow statistics, fed one frame (or frame pair) at a time
+
+        Frames are reduced with a Gaussian pyramid to at most max_side before
+        Farneback flow, which then needs fewer pyramid levels of its own. Each
+        measurement is stored as a MOTION_DTYPE row in a growing array, and
+        running median/MAD statistics give a provisional anomaly score as
+        frames arrive. The streaming MAD uses each value's deviation from the
+        median when it arrived; result() rescores the whole series exactly.
+        A measurement is an anomaly when its score exceeds threshold.
+        Both defaults are the pipeline's video.motion_* settings.
+        """
+        if direction_bins != DIRECTION_BINS:
+            raise ValueError(f"direction_bins must be {DIRECTION_BINS} to match MOTION_DTYPE")
+        self.threshold = threshold
+        self.max_side = max_side
+        self._rows = np.empty(64, dtype=MOTION_DTYPE)
+        self.size = 0
+        self._median = RunningMedian()
+        self._mad = RunningMedian()
+        self._previous = None
+        self._count = 0
+
+    def add(self, gray: np.ndarray) -> Optional[float]:
+        """Add the next frame of a stream; returns the provisional score of its flow"""
+        gray = pyramid_downscale(gray, self.max_side)
+        self._count += 1
+        previous, self._previous = self._previous, gray
+        if previous is None:
+            return None
+        return self._measure(previous, gray, self._count - 1)
+
+    def add_pair(self, previous: np.ndarray, gray: np.ndarray, frame_number: int) -> Optional[float]:
+        """Flow between two frames that need not be consecutive in the stream"""
+        return self._measure(pyramid_downscale(previous, self.max_side),
+                             pyramid_downscale(gray, self.max_side), frame_number)
+
+    def _measure(self, previous: np.ndarray, gray: np.ndarray, frame_number: int) -> Optional[float]:
+        if previous.shape != gray.shape:
+            return None
+        flow = cv2.calcOpticalFlowFarneback(previous, gray, None, 0.5, 2, 15, 3, 5, 1.2, 0)
+        magnitude, angle = cv2.cartToPolar(flow[..., 0], flow[..., 1])
+        total = float(magnitude.sum())
+
+        bins = (angle.ravel() * (DIRECTION_BINS / (2 * np.pi))).astype(np.intp) % DIRECTION_BINS
+        histogram = np.bincount(bins, weights=magnitude.ravel(), minlength=DIRECTION_BINS)
+        if total > 0:
+            histogram /= total
+
+        mean = total / magnitude.size
+        score = self._update_stats(mean)
+
+        if self.size == len(self._rows):
+            grown = np.empty(2 * len(self._rows), dtype=MOTION_DTYPE)
+            grown[:self.size] = self._rows[:self.size]
+            self._rows = grown
+        self._rows[self.size] = (frame_number, mean, histogram, score)
+        self.size += 1
+        return score
+
+    def _update_stats(self, value: float) -> float:
+        self._median.add(value)
+        median = self._median.median
+        self._mad.add(abs(value - median))
+        scale = MAD_TO_STD * self._mad.median
+        return (value - median) / scale if scale > 1e-9 else 0.0
+
+    @property
+    def per_frame(self) -> np.ndarray:
+        return self._rows[:self.size]
+
+    def result(self, total_frames: Optional[int] = None) -> Dict[str, Any]:
+        """motion_data: total_frames, anomalies, anomaly_ratio and the per-frame array
+
+        Scores are recomputed over the whole series in one vectorized pass,
+        replacing the provisional streaming ones.
+        """
+        per_frame = self.per_frame.copy()
+        per_frame['score'] = robust_scores(per_frame['magnitude'])
+        flagged = np.flatnonzero(per_frame['score'] > self.threshold)
+        anomalies = [{'frame': int(frame), 'mean_motion': float(magnitude), 'score': float(score)}
+                     for frame, magnitude, score in zip(per_frame['frame'][flagged],
+                                                        per_frame['magnitude'][flagged],
+                                                        per_frame['score'][flagged])]
+
+        return {
+            'total_frames': self._count if total_frames is None else total_frames,
+            'anomalies': anomalies,
+            'anomaly_ratio': len(flagged) / max(len(per_frame), 1),
+            'per_frame': per_frame
+        }
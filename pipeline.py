@@ -0,0 +1,348 @@
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from frame_stream import StreamingAnalyzer, remap_face_frames, sample_video, thumbnail
+from dedup import deduplicator_from_config
+from config import load_pipeline_config
+from telemetry import configure_telemetry, telemetry
+from registry import (close_worker_pools, configure_registry, get_captioner, get_comprehensive_analyzer,
+                      get_feasibility_analyzer, get_summarizer, warm_up)
+from cache import PipelineRun, _MISSING, cache_from_config, hash_file
+from dag import StageGraph
+from frame_store import FrameStore
+
+# Stages AnalysisPipeline.analyze reports through on_stage, in display order
+REPORTED_STAGES = ('frames', 'motion_data', 'captions', 'story', 'tech_analysis', 'feasibility_result')
+
+def caption_errors(captions: List[str]) -> bool:
+    return any("Error generating caption" in c for c in captions)
+
+def check_captions(run: PipelineRun, captions: List[str]) -> List[str]:
+    """Mark the run degraded when some frames failed to caption
+
+    Such captions aren't cached, and neither may the story and verdict
+    built from them, or later runs would reuse them after captioning works.
+    """
+    if caption_errors(captions):
+        failed = sum("Error generating caption" in c for c in captions)
+        run.fail('captions', Exception(f"{failed} of {len(captions)} captions failed"))
+    return captions
+
+class AnalysisPipeline:
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """Headless version of the app.py analysis flow, without any UI calls
+
+        Models come from the process-wide registry, so they load on first use
+        (or here, with models.warm_up) and are shared with other pipelines.
+        """
+        self.config = config or load_pipeline_config()
+        configure_registry(self.config['models'])
+        configure_telemetry(self.config['telemetry'])
+        if self.config['models'].get('warm_up'):
+            warm_up(self.config)
+
+        self._video_processor = None
+        self.deduplicator = deduplicator_from_config(self.config['dedup'])
+
+        self.cache = cache_from_config(self.config['cache'])
+
+    def close(self):
+        """Stop caption and face worker processes; the shared models stay loaded"""
+        close_worker_pools(self.config)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    @property
+    def video_processor(self):
+        """The legacy two-decode VideoProcessor, only needed with video.single_pass off"""
+        if self._video_processor is None:
+            try:
+                from video_utils import VideoProcessor
+            except ImportError as e:
+                raise RuntimeError("video.single_pass=False needs video_utils.VideoProcessor, which is not "
+                                   "available; enable video.single_pass instead") from e
+            self._video_processor = VideoProcessor()
+        return self._video_processor
+
+    @property
+    def captioner(self):
+        return get_captioner(self.config)
+
+    @property
+    def summarizer(self):
+        return get_summarizer(self.config)
+
+    @property
+    def feasibility_analyzer(self):
+        return get_feasibility_analyzer(self.config)
+
+    @property
+    def comprehensive_analyzer(self):
+        return get_comprehensive_analyzer(self.config)
+
+    def analyze(self, video_path: str,
+                on_stage: Optional[Callable[[str, Any, Optional[str]], None]] = None,
+                thread_setup: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+        """Run every stage on one video and return JSON-friendly results
+
+        Stage failures fall back the same way the UI does and are recorded
+        under 'errors' instead of aborting the run. With video.streaming
+        enabled the video is decoded once into bounded stage queues instead
+        of being held in memory as a list of frames.
+
+        Independent stages (motion, captioning, face detection) run
+        concurrently. on_stage(name, value, error) is called on the calling
+        thread as each of REPORTED_STAGES finishes; error is the fallback
+        reason, if the stage fell back. thread_setup is passed to
+        StageGraph.run.
+        """
+        try:
+            with telemetry.span('analysis'):
+                return self._analyze(video_path, on_stage, thread_setup)
+        finally:
+            telemetry.flush()
+
+    def _analyze(self, video_path: str, on_stage=None, thread_setup=None) -> Dict[str, Any]:
+        start = time.time()
+        video_hash = hash_file(video_path) if self.cache is not None else None
+        run = PipelineRun(self.cache, video_hash, self.config)
+
+        graph = StageGraph()
+        stores: List[FrameStore] = []
+        if self.config['video'].get('streaming'):
+            self._add_streaming_stages(graph, video_path, run)
+        else:
+            self._add_decoded_stages(graph, video_path, run, stores)
+
+        # Step 4: Story Summarization
+        def story_fallback(e, captions):
+            run.fail('story', e)
+            return " ".join(captions)
+        graph.add('story', lambda captions: run.cached('story', lambda: self.summarizer.create_story_from_captions(captions)),
+                  deps=('captions',), fallback=story_fallback)
+
+        # Step 6: Feasibility Analysis, started as soon as the story and technical analysis are in
+        def feasibility(story, frames, motion_data, tech_analysis):
+            return run.cached(
+                'feasibility_result',
+                lambda: self.feasibility_analyzer.analyze_with_frames(
+                    story, frames, motion_data, tech_analysis.get('face_analysis')
+                ),
+                should_cache=lambda result: not result.get('fallback')
+            )
+        def feasibility_fallback(e, *inputs):
+            run.errors['feasibility_result'] = str(e)
+            return {
+                'verdict': '❓ Analysis Failed',
+                'explanation': f'Could not complete analysis: {str(e)}',
+                'looks_real': 'Analysis unavailable',
+                'looks_fake': 'Analysis unavailable'
+            }
+        graph.add('feasibility_result', feasibility, deps=('story', 'frames', 'motion_data', 'tech_analysis'),
+                  fallback=feasibility_fallback)
+
+        def report(name, value):
+            if on_stage is not None and name in REPORTED_STAGES:
+                on_stage(name, value, run.errors.get(name))
+
+        try:
+            results = graph.run(self.config['executor'].get('max_workers', 4), on_result=report,
+                                thread_setup=thread_setup)
+        finally:
+            for store in stores:
+                store.close()
+
+        return {
+            'video_hash': video_hash,
+            'frames_analyzed': results['frame_count'],
+            'motion_data': results['motion_data'],
+            'captions': results['captions'],
+            'story': results['story'],
+            'tech_analysis': results['tech_analysis'],
+            'feasibility_result': results['feasibility_result'],
+            'errors': run.errors,
+            'cache_hits': run.cache_hits,
+            'elapsed_sec': round(time.time() - start, 3)
+        }
+
+    def _add_decoded_stages(self, graph: StageGraph, video_path: str, run: PipelineRun, stores: List[FrameStore]):
+        """Frames, motion, captions and technical analysis from fully extracted frames
+
+        When captioning or face detection use worker processes, the frames
+        are copied once into a shared FrameStore that those stages read in
+        place; it is added to stores for the caller to close.
+        """
+        video_config = self.config['video']
+        single_pass = video_config.get('single_pass', True) or video_config.get('sparse')
+        if single_pass:
+            # Steps 1-2: Frames and motion from one (possibly sparse) decode
+            graph.add('decode', lambda: self._decode(video_path, run))
+            graph.add('frames', lambda decoded: decoded[0], deps=('decode',))
+            graph.add('motion_data', lambda decoded: decoded[1], deps=('decode',))
+            graph.add('frame_count', lambda decoded: decoded[2], deps=('decode',))
+        else:
+            # Fails here, before any stage runs, when video_utils is missing
+            video_processor = self.video_processor
+
+            # Step 1: Extract frames (not cached: whole frames would crowd out everything else)
+            graph.add('frames', lambda: video_processor.extract_frames(video_path))
+
+            # Step 2: Motion Analysis, decoding the video again alongside the other stages
+            def motion_fallback(e):
+                run.fail('motion_data', e)
+                return {'anomalies': [], 'total_frames': 0, 'anomaly_ratio': 0.0}
+            graph.add('motion_data',
+                      lambda: run.cached('motion_data', lambda: video_processor.calculate_optical_flow(video_path)),
+                      fallback=motion_fallback)
+            graph.add('frame_count', len, deps=('frames',))
+
+        # Frames go to process workers through shared memory instead of being pickled per worker
+        frames_for = {'captions': 'frames', 'face_analysis': 'frames'}
+        processes = {'captions': self.config['captioner'].get('processes', 0),
+                     'face_analysis': self.config['faces'].get('processes', 0)}
+        if any(count > 1 for count in processes.values()):
+            executor_config = self.config['executor']
+            def share(frames, motion_data=None):
+                interval = (motion_data or {}).get('sample_interval_sec', video_config.get('interval_sec', 2.0))
+                store = FrameStore.from_frames(frames, interval, executor_config.get('frame_store', 'shm'),
+                                               executor_config.get('frame_store_dir'))
+                stores.append(store)
+                return store
+            # Without a store (e.g. /dev/shm is full) the stages run in-process on the frame list
+            graph.add('shared_frames', share, deps=('frames', 'motion_data') if single_pass else ('frames',),
+                      fallback=lambda e, frames, *_: frames)
+            frames_for.update({stage: 'shared_frames' for stage, count in processes.items() if count > 1})
+
+        # Step 3: Frame Captioning
+        def captions(frames, motion_data=None):
+            interval = (motion_data or {}).get('sample_interval_sec', video_config.get('interval_sec', 2.0))
+            return check_captions(run, run.cached('captions', lambda: self._caption(frames, interval),
+                                                  should_cache=lambda result: not caption_errors(result)))
+        def captions_fallback(e, frames, *_):
+            run.fail('captions', e)
+            return [f"Frame {i+1}: Unable to generate caption" for i in range(len(frames))]
+        # With a single pass, motion is ready with the frames and gives the exact sample spacing
+        graph.add('captions', captions,
+                  deps=(frames_for['captions'], 'motion_data') if single_pass else (frames_for['captions'],),
+                  fallback=captions_fallback)
+
+        # Step 5: Comprehensive Analysis; face detection doesn't wait for motion
+        cached_tech = run.lookup('tech_analysis')
+        if cached_tech is not _MISSING:
+            graph.add('tech_analysis', lambda: cached_tech)
+            return
+
+        def faces(frames):
+            with telemetry.span('stage', stage='face_analysis'), telemetry.span('model', model='face_cascade'):
+                return self.comprehensive_analyzer.deepfake_detector.detect_faces_in_frames(frames)
+        def faces_fallback(e, frames):
+            run.errors['tech_analysis'] = str(e)
+            return None
+        graph.add('face_analysis', faces, deps=(frames_for['face_analysis'],), fallback=faces_fallback)
+
+        def tech_analysis(face_analysis, motion_data):
+            if face_analysis is None:
+                return self._unavailable_tech_analysis()
+            value = self.comprehensive_analyzer.assess_authenticity(face_analysis, motion_data)
+            run.store('tech_analysis', value)
+            return value
+        def tech_fallback(e, *inputs):
+            run.errors['tech_analysis'] = str(e)
+            return self._unavailable_tech_analysis()
+        graph.add('tech_analysis', tech_analysis, deps=('face_analysis', 'motion_data'), fallback=tech_fallback)
+
+    def _decode(self, video_path: str, run: PipelineRun) -> Tuple[list, dict, int]:
+        """(frames, motion_data, frame_count) from one decode
+
+        Only motion data and downscaled thumbnails are cached, not the full
+        frames. When captions and the technical analysis are cached as well,
+        nothing needs full frames, and the thumbnails are returned instead
+        of decoding the video again.
+        """
+        if run.has('captions') and run.has('tech_analysis'):
+            thumbnails, motion_data = run.lookup('thumbnails'), run.lookup('motion_data')
+            if thumbnails is not _MISSING and motion_data is not _MISSING:
+                return thumbnails['frames'], motion_data, thumbnails['frame_count']
+
+        with telemetry.span('stage', stage='frames+motion_data'):
+            frames, motion_data = sample_video(video_path, self.config['video'])
+        run.store('motion_data', motion_data)
+        run.store('thumbnails', {'frames': [thumbnail(frame) for frame in frames], 'frame_count': len(frames)})
+        return frames, motion_data, len(frames)
+
+    def _caption(self, frames: list, interval: float) -> List[str]:
+        if self.deduplicator is None:
+            return self.captioner.caption_frames(frames)
+        return self.deduplicator.caption_frames(self.captioner, frames, interval)
+
+    def _add_streaming_stages(self, graph: StageGraph, video_path: str, run: PipelineRun):
+        """Stage graph entries for the streaming decode, which runs its own stage threads"""
+        graph.add('streamed', lambda: self._streaming_stages(video_path, run))
+        for i, name in enumerate(('frames', 'frame_count', 'motion_data', 'captions', 'tech_analysis')):
+            graph.add(name, lambda streamed, i=i: streamed[i], deps=('streamed',))
+
+    def _streaming_stages(self, video_path: str, run: PipelineRun) -> Tuple[list, int, dict, List[str], dict]:
+        """The same outputs from one streaming decode; frames are bounded thumbnails"""
+        stages = ('thumbnails', 'motion_data', 'captions', 'tech_analysis')
+        cached = {stage: run.lookup(stage) for stage in stages}
+        if all(value is not _MISSING for value in cached.values()):
+            thumbnails = cached['thumbnails']
+            return (thumbnails['frames'], thumbnails['frame_count'], cached['motion_data'],
+                    cached['captions'], cached['tech_analysis'])
+        run.cache_hits.clear()
+
+        video_config = self.config['video']
+        analyzer = StreamingAnalyzer(
+            captioner=self.captioner,
+            detector=self.comprehensive_analyzer.deepfake_detector,
+            interval_sec=video_config.get('interval_sec', 2.0),
+            buffer_size=video_config.get('buffer_size', 8),
+            motion_max_side=video_config.get('motion_max_side', 320),
+            motion_threshold=video_config.get('motion_threshold', 3.5),
+            deduplicator=self.deduplicator
+        )
+        with telemetry.span('stage', stage='streaming'):
+            streamed = analyzer.run(video_path)
+        errors = streamed['errors']
+
+        motion_data = streamed['motion_data']
+        if 'motion_data' in errors:
+            run.fail('motion_data', Exception(errors['motion_data']))
+            motion_data = {'anomalies': [], 'total_frames': streamed['frame_count'], 'anomaly_ratio': 0.0}
+
+        captions = streamed['captions']
+        if 'captions' in errors:
+            run.fail('captions', Exception(errors['captions']))
+            captions = [f"Frame {i+1}: Unable to generate caption" for i in range(streamed['frame_count'])]
+
+        if 'face_analysis' in errors:
+            run.errors['tech_analysis'] = errors['face_analysis']
+            tech_analysis = self._unavailable_tech_analysis()
+        else:
+            tech_analysis = self.comprehensive_analyzer.assess_authenticity(streamed['face_analysis'], motion_data)
+            # Keyframe selection sees thumbnails, so point face hits at them
+            tech_analysis['face_analysis'] = remap_face_frames(tech_analysis['face_analysis'],
+                                                               streamed['thumbnail_indices'])
+
+        thumbnails = {'frames': streamed['thumbnails'], 'frame_count': streamed['frame_count']}
+        run.store('thumbnails', thumbnails)
+        run.store('motion_data', motion_data)
+        run.store('captions', captions, should_cache=lambda result: not caption_errors(result))
+        if 'tech_analysis' not in run.errors:
+            run.store('tech_analysis', tech_analysis)
+        # After the stores, so motion and faces are still cached when captions partly failed
+        check_captions(run, captions)
+
+        return thumbnails['frames'], thumbnails['frame_count'], motion_data, captions, tech_analysis
+
+    def _unavailable_tech_analysis(self) -> Dict[str, Any]:
+        return {
+            'authenticity_score': 0.5,
+            'overall_assessment': 'Analysis unavailable',
+            'face_analysis': {'total_faces_detected': 0, 'suspicious_faces': 0, 'common_issues': []}
+        }
@@ -0,0 +1,192 @@
+import gc
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from cache import cache_from_config, config_fingerprint
+
+logger = logging.getLogger(__name__)
+
+def _tensor_bytes(value: Any, seen: set) -> int:
+    # Quantized Linear layers keep their weights in a (weight, bias) tuple
+    if isinstance(value, (tuple, list)):
+        return sum(_tensor_bytes(item, seen) for item in value)
+    if not callable(getattr(value, 'numel', None)) or not callable(getattr(value, 'element_size', None)):
+        return 0
+    try:
+        storage = value.data_ptr()
+    except Exception:
+        storage = id(value)
+    # Tied weights share storage and are counted once
+    if storage in seen:
+        return 0
+    seen.add(storage)
+    return value.numel() * value.element_size()
+
+def model_bytes(obj: Any, depth: int = 2) -> int:
+    """Approximate memory held by torch weights in obj or its attributes
+
+    Counts state_dict() tensors rather than parameters(), which leave out
+    the packed weights of int8-quantized layers.
+    """
+    if callable(getattr(obj, 'state_dict', None)) and callable(getattr(obj, 'parameters', None)):
+        try:
+            seen = set()
+            return sum(_tensor_bytes(value, seen) for value in obj.state_dict(keep_vars=True).values())
+        except Exception:
+            return 0
+    if depth == 0:
+        return 0
+    return sum(model_bytes(value, depth - 1) for value in list(getattr(obj, '__dict__', {}).values()))
+
+class ModelRegistry:
+    def __init__(self, memory_budget: Optional[int] = None):
+        """Process-wide store of loaded models, shared by every session and thread
+
+        Models load on first get() and stay loaded until the total estimated
+        weight size exceeds memory_budget bytes, at which point the least
+        recently used ones are dropped. A caller still holding an unloaded
+        model keeps it alive until it lets go of it. Unloading never calls a
+        model's close(), since another session may be mid-analysis with it;
+        models shut their worker pools down when they are garbage collected.
+        """
+        self.memory_budget = memory_budget
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()  # key -> (model, bytes)
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._local = threading.local()
+        self.stats = {'loads': 0, 'hits': 0, 'evictions': 0}
+
+    def get(self, key: str, loader: Callable[[], Any], per_thread: bool = False) -> Any:
+        """Return the model stored under key, loading it with loader on first use
+
+        per_thread entries (e.g. OpenCV cascades, which aren't thread-safe)
+        are loaded once per thread and don't count toward the budget.
+        """
+        if per_thread:
+            entries = self._local.__dict__.setdefault('entries', {})
+            if key not in entries:
+                entries[key] = loader()
+            return entries[key]
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return self._entries[key][0]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Only one thread loads a given model; others wait for it
+        with load_lock:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return self._entries[key][0]
+
+            model = loader()
+            size = model_bytes(model)
+            with self._lock:
+                self._entries[key] = (model, size)
+                self.stats['loads'] += 1
+                evicted = self._evict(keep=key)
+            self._release(evicted)
+            return model
+
+    def _evict(self, keep: str) -> list:
+        """Drop least recently used entries over the budget; returns them for _release (call under the lock)"""
+        evicted = []
+        if self.memory_budget is None:
+            return evicted
+        while sum(size for _, size in self._entries.values()) > self.memory_budget:
+            oldest = next((key for key in self._entries if key != keep), None)
+            if oldest is None:
+                break
+            logger.info(f"Unloading {oldest} to stay within the model memory budget")
+            evicted.append((oldest, self._entries.pop(oldest)[0]))
+            self.stats['evictions'] += 1
+        return evicted
+
+    def _release(self, entries: list):
+        # Outside the lock: collecting may run finalizers that stop worker processes
+        if entries:
+            entries.clear()
+            gc.collect()
+
+    def peek(self, key: str) -> Any:
+        """The model stored under key if it's loaded, else None; never loads it"""
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def unload(self, key: str):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        self._release([(key, entry[0])] if entry is not None else [])
+
+    def clear(self):
+        """Unload every shared model; they reload lazily on next use"""
+        with self._lock:
+            entries = [(key, model) for key, (model, _) in self._entries.items()]
+            self._entries.clear()
+        self._release(entries)
+
+    def loaded(self) -> Dict[str, int]:
+        """Estimated bytes per loaded model, least recently used first"""
+        with self._lock:
+            return {key: size for key, (_, size) in self._entries.items()}
+
+# One registry per process; Streamlit sessions and pipeline threads share it
+registry = ModelRegistry()
+
+def configure_registry(section: Dict[str, Any]):
+    """Apply the 'models' config section to the process-wide registry"""
+    budget_mb = section.get('memory_budget_mb')
+    registry.memory_budget = int(budget_mb * 1024 ** 2) if budget_mb else None
+
+def _key(kind: str, config: Dict[str, Any], sections: tuple) -> str:
+    # Sessions with different settings get different instances
+    return f"{kind}:{config_fingerprint(config, sections)[:16]}"
+
+def get_captioner(config: Dict[str, Any]):
+    from captioning import FrameCaptioner
+    return registry.get(_key('captioner', config, ('captioner',)),
+                        lambda: FrameCaptioner(**config['captioner']))
+
+def get_summarizer(config: Dict[str, Any]):
+    from summarizer import StorySummarizer
+    return registry.get(_key('summarizer', config, ('summarizer', 'summary_cache')),
+                        lambda: StorySummarizer(**config['summarizer'],
+                                                chunk_cache=cache_from_config(config['summary_cache'])))
+
+def get_feasibility_analyzer(config: Dict[str, Any]):
+    from feasibility import FeasibilityAnalyzer
+    # Shared so the Gemini rate limit applies to the whole process, not per session
+    return registry.get(_key('feasibility', config, ('feasibility', 'gemini', 'response_cache')),
+                        lambda: FeasibilityAnalyzer(**config['feasibility'], **config['gemini'],
+                                                    response_cache=cache_from_config(config['response_cache'])))
+
+def get_comprehensive_analyzer(config: Dict[str, Any]):
+    from analyzer import ComprehensiveAnalyzer
+    return registry.get(_key('comprehensive', config, ('faces',)),
+                        lambda: ComprehensiveAnalyzer(**config['faces']))
+
+def close_worker_pools(config: Dict[str, Any]):
+    """Stop the worker processes of this config's captioner and face detector, if loaded"""
+    for key in (_key('captioner', config, ('captioner',)), _key('comprehensive', config, ('faces',))):
+        model = registry.peek(key)
+        if model is not None:
+            model.close()
+
+def get_face_cascade():
+    """A Haar face cascade for the calling thread"""
+    import cv2
+    from analyzer import CASCADE_PATH
+    return registry.get('face_cascade', lambda: cv2.CascadeClassifier(CASCADE_PATH), per_thread=True)
+
+def warm_up(config: Dict[str, Any]):
+    """Load the heavy models now instead of on the first request"""
+    get_captioner(config)
+    get_summarizer(config)
+    get_face_cascade()
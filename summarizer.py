@@ -1,32 +1,147 @@
-from transformers import pipeline
-from typing import List
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import logging
 import re
+from captioning import PRECISIONS
+from telemetry import telemetry
+
+logger = logging.getLogger(__name__)
 
 class StorySummarizer:
-    def __init__(self, model_name: str = "facebook/bart-large-cnn"):
-        """Initialize summarization model"""
-        self.summarizer = pipeline("summarization", model=model_name)
-    
+    def __init__(self, model_name: str = "facebook/bart-large-cnn", chunk_tokens: int = 900,
+                 batch_size: int = 4, max_length: int = 150, min_length: int = 30,
+                 num_beams: Optional[int] = None, precision: str = "fp32", chunk_cache=None):
+        """Initialize summarization model
+
+        precision is "fp32", "bf16" or "int8" (dynamic quantization of Linear
+        layers, CPU only), as for FrameCaptioner. num_beams overrides the
+        model's default beam search width.
+
+        Long caption sequences are summarized map-reduce style: captions are
+        packed into chunks of at most chunk_tokens model tokens, the chunks
+        are summarized in batches of batch_size, and the chunk summaries are
+        summarized again until one story remains. chunk_cache (a
+        cache.ResultCache) keeps chunk summaries, so appending captions only
+        summarizes the new trailing chunk.
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}', expected one of {PRECISIONS}")
+
+        import torch
+        from transformers import pipeline
+
+        self.model_name = model_name
+        self.num_beams = num_beams
+        self.precision = precision
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.min_length = min_length
+        self.chunk_cache = chunk_cache
+        self.summarizer = pipeline("summarization", model=model_name,
+                                   torch_dtype=torch.bfloat16 if precision == "bf16" else None)
+        if precision == "int8":
+            self.summarizer.model = torch.quantization.quantize_dynamic(
+                self.summarizer.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.tokenizer = self.summarizer.tokenizer
+        # Leave room for special tokens within the model's input window
+        self.chunk_tokens = min(chunk_tokens, self.tokenizer.model_max_length - 8)
+
+    @staticmethod
+    def _clean(text: str) -> str:
+        # Labels are "Frame 3:" or, after dedup, "Frames 3-7 (0:04-0:12):"
+        text = re.sub(r'Frames? \d+(?:-\d+)?(?: \([^)]*\))?:', '', text)
+        return re.sub(r'\s+', ' ', text).strip()
+
+    def _token_count(self, text: str) -> int:
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+
+    def _chunk(self, pieces: List[str]) -> List[str]:
+        """Greedily pack pieces into chunks that fit the model's input window
+
+        Packing from the start keeps earlier chunks unchanged when pieces are
+        appended, so their cached summaries stay valid.
+        """
+        chunks = []
+        current: List[str] = []
+        current_tokens = 0
+        for piece in pieces:
+            tokens = self._token_count(piece) + 1
+            if current and current_tokens + tokens > self.chunk_tokens:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+        if current:
+            chunks.append(" ".join(current))
+        return chunks
+
+    def _generation_kwargs(self, chunk: str) -> Dict[str, Any]:
+        """Generation settings for one chunk; short chunks can't be held to the full min_length"""
+        kwargs = {'max_length': self.max_length,
+                  'min_length': min(self.min_length, max(1, self._token_count(chunk) // 2)),
+                  'do_sample': False}
+        if self.num_beams:
+            kwargs['num_beams'] = self.num_beams
+        return kwargs
+
+    def _chunk_key(self, chunk: str, kwargs: Dict[str, Any]) -> str:
+        payload = '|'.join([self.model_name, self.precision, json.dumps(kwargs, sort_keys=True), chunk])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _summarize_chunks(self, chunks: List[str]) -> List[str]:
+        """Summarize chunks in batches, reusing cached chunk summaries"""
+        kwargs = [self._generation_kwargs(chunk) for chunk in chunks]
+        summaries: List[Optional[str]] = [None] * len(chunks)
+        if self.chunk_cache is not None:
+            for i, chunk in enumerate(chunks):
+                summaries[i] = self.chunk_cache.get(self._chunk_key(chunk, kwargs[i]))
+
+        # Batch only chunks with identical settings, so each summary (and its
+        # cache entry) depends on its own chunk rather than its batch mates
+        groups: Dict[str, List[int]] = {}
+        for i, summary in enumerate(summaries):
+            if summary is None:
+                groups.setdefault(json.dumps(kwargs[i], sort_keys=True), []).append(i)
+
+        for pending in groups.values():
+            options = kwargs[pending[0]]
+            for start in range(0, len(pending), self.batch_size):
+                batch = pending[start:start + self.batch_size]
+                with telemetry.span('model', model='bart'):
+                    results = self.summarizer([chunks[i] for i in batch],
+                                              truncation=True,
+                                              batch_size=self.batch_size,
+                                              **options)
+                for i, result in zip(batch, results):
+                    summaries[i] = result['summary_text']
+                    if self.chunk_cache is not None:
+                        self.chunk_cache.put(self._chunk_key(chunks[i], options), summaries[i])
+        return summaries
+
     def create_story_from_captions(self, captions: List[str]) -> str:
         """Convert frame captions into a coherent story"""
-        # Combine all captions into a single text
-        combined_text = " ".join(captions)
-        
-        # Clean up the text
-        combined_text = re.sub(r'Frame \d+:', '', combined_text)
-        combined_text = re.sub(r'\s+', ' ', combined_text).strip()
-        
+        # Clean up the captions
+        pieces = [piece for piece in (self._clean(caption) for caption in captions) if piece]
+        combined_text = " ".join(pieces)
+
         # If text is too short, return as is
         if len(combined_text.split()) < 20:
             return combined_text
-        
+
         try:
-            # Summarize to create coherent narrative
-            summary = self.summarizer(combined_text, 
-                                    max_length=150, 
-                                    min_length=30, 
-                                    do_sample=False)
-            return summary[0]['summary_text']
+            # Map: summarize each chunk; reduce: summarize the summaries until one fits
+            chunks = self._chunk(pieces)
+            while True:
+                summaries = self._summarize_chunks(chunks)
+                if len(summaries) == 1:
+                    return summaries[0]
+                reduced = self._chunk(summaries)
+                if len(reduced) >= len(chunks):
+                    # Summaries are no shorter than their inputs; stop rather than loop
+                    return " ".join(summaries)
+                chunks = reduced
         except Exception as e:
             # Fallback: return cleaned combined text
-            return combined_text[:500] + "..." if len(combined_text) > 500 else combined_text
\ No newline at end of file
+            logger.warning(f"Summarization failed: {str(e)}. Using the captions as the story.")
+            return combined_text[:500] + "..." if len(combined_text) > 500 else combined_text
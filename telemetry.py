@@ -0,0 +1,192 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NOOP = _NoopSpan()
+
+class _Span:
+    __slots__ = ('telemetry', 'name', 'labels', 'start')
+
+    def __init__(self, telemetry: 'Telemetry', name: str, labels: Dict[str, Any]):
+        self.telemetry = telemetry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.telemetry._record_span(self.name, self.labels, time.perf_counter() - self.start, exc_type is not None)
+        return False
+
+def _label_key(name: str, labels: Dict[str, Any]) -> Tuple:
+    return (name,) + tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+class Telemetry:
+    def __init__(self):
+        """Process-wide spans and counters, exported on flush()
+
+        Disabled by default: span() then returns a shared no-op context
+        manager and incr() returns immediately, unless the calling thread is
+        collecting (see start_collecting), which the UI uses for its
+        Performance panel without turning on export.
+        """
+        self.enabled = False
+        self.exporters: List[Any] = []
+        self._lock = threading.Lock()
+        self._spans: Dict[Tuple, Dict[str, float]] = {}
+        self._counters: Dict[Tuple, float] = {}
+        self._local = threading.local()
+
+    def span(self, name: str, **labels):
+        """Time a block: `with telemetry.span('stage', stage='captions'):`"""
+        if not self.enabled and getattr(self._local, 'records', None) is None:
+            return _NOOP
+        return _Span(self, name, labels)
+
+    def incr(self, name: str, value: float = 1, **labels):
+        records = getattr(self._local, 'records', None)
+        if not self.enabled and records is None:
+            return
+        if records is not None:
+            records.append({'type': 'counter', 'name': name, 'labels': labels, 'value': value})
+        if self.enabled:
+            key = _label_key(name, labels)
+            with self._lock:
+                self._counters[key] = self._counters.get(key, 0) + value
+
+    def _record_span(self, name: str, labels: Dict[str, Any], seconds: float, failed: bool):
+        records = getattr(self._local, 'records', None)
+        if records is not None:
+            records.append({'type': 'span', 'name': name, 'labels': labels, 'seconds': seconds, 'failed': failed})
+        if self.enabled:
+            key = _label_key(name, labels)
+            with self._lock:
+                stats = self._spans.setdefault(key, {'count': 0, 'sum': 0.0, 'max': 0.0, 'errors': 0})
+                stats['count'] += 1
+                stats['sum'] += seconds
+                stats['max'] = max(stats['max'], seconds)
+                stats['errors'] += failed
+
+    def start_collecting(self) -> List[Dict[str, Any]]:
+        """Also keep every span and counter recorded on this thread in the returned list"""
+        self._local.records = []
+        return self._local.records
+
+    def stop_collecting(self):
+        self._local.records = None
+
+    def collecting(self):
+        """This thread's collected records, or None"""
+        return getattr(self._local, 'records', None)
+
+    def attach(self, records):
+        """Collect this thread's records into another thread's list (None to stop)"""
+        self._local.records = records
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Aggregated spans and counters since the process started"""
+        with self._lock:
+            spans = [{'name': key[0], 'labels': dict(key[1:]), **stats} for key, stats in self._spans.items()]
+            counters = [{'name': key[0], 'labels': dict(key[1:]), 'value': value}
+                        for key, value in self._counters.items()]
+        return {'timestamp': time.time(), 'spans': spans, 'counters': counters}
+
+    def flush(self):
+        """Hand the current snapshot to every exporter; exporter errors are ignored"""
+        if not self.enabled or not self.exporters:
+            return
+        snapshot = self.snapshot()
+        for exporter in self.exporters:
+            try:
+                exporter.export(snapshot)
+            except Exception:
+                pass
+
+class JsonLogExporter:
+    def __init__(self, path: str):
+        """Append one JSON line per flush"""
+        self.path = path
+
+    def export(self, snapshot: Dict[str, Any]):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(snapshot) + '\n')
+
+def _prometheus_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ''
+    def escape(value: Any) -> str:
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in sorted(labels.items())) + '}'
+
+class PrometheusFileExporter:
+    def __init__(self, path: str, prefix: str = 'feasibility'):
+        """Rewrite a Prometheus text file (for node_exporter's textfile collector) on each flush"""
+        self.path = path
+        self.prefix = prefix
+
+    def export(self, snapshot: Dict[str, Any]):
+        lines = []
+        span_names = sorted({span['name'] for span in snapshot['spans']})
+        for name in span_names:
+            metric = f"{self.prefix}_{name}_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for span in snapshot['spans']:
+                if span['name'] == name:
+                    labels = _prometheus_labels(span['labels'])
+                    lines.append(f"{metric}_count{labels} {span['count']}")
+                    lines.append(f"{metric}_sum{labels} {span['sum']:.6f}")
+        for name in sorted({counter['name'] for counter in snapshot['counters']}):
+            metric = f"{self.prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for counter in snapshot['counters']:
+                if counter['name'] == name:
+                    lines.append(f"{metric}{_prometheus_labels(counter['labels'])} {counter['value']:g}")
+
+        # Write atomically so the collector never reads a partial file
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, self.path)
+
+# One instance per process, shared by every module
+telemetry = Telemetry()
+
+def configure_telemetry(section: Dict[str, Any]):
+    """Apply the 'telemetry' config section to the process-wide instance"""
+    telemetry.enabled = bool(section.get('enabled'))
+    exporters = []
+    if section.get('json_log'):
+        exporters.append(JsonLogExporter(section['json_log']))
+    if section.get('prometheus_file'):
+        exporters.append(PrometheusFileExporter(section['prometheus_file']))
+    telemetry.exporters = exporters
+
+def summarize_records(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Total time per span name/labels and counter totals from collected records"""
+    spans: Dict[Tuple, Dict[str, Any]] = {}
+    counters: Dict[Tuple, float] = {}
+    for record in records:
+        key = _label_key(record['name'], record['labels'])
+        if record['type'] == 'span':
+            entry = spans.setdefault(key, {'name': record['name'], 'labels': record['labels'], 'count': 0, 'seconds': 0.0})
+            entry['count'] += 1
+            entry['seconds'] += record['seconds']
+        else:
+            counters[key] = counters.get(key, 0) + record['value']
+    return {
+        'spans': list(spans.values()),
+        'counters': [{'name': key[0], 'labels': dict(key[1:]), 'value': value} for key, value in counters.items()]
+    }
@@ -0,0 +1,126 @@
+import os
+import time
+
+import pytest
+
+from cache import PipelineRun, ResultCache, cache_from_config, config_fingerprint, hash_file
+from config import DEFAULT_PIPELINE_CONFIG
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / 'cache'), max_bytes=10 * 1024 ** 2)
+
+def _config(**sections):
+    config = {name: dict(section) if isinstance(section, dict) else section
+              for name, section in DEFAULT_PIPELINE_CONFIG.items()}
+    for name, changes in sections.items():
+        config[name] = {**config.get(name, {}), **changes}
+    return config
+
+def test_hash_file_depends_on_content(tmp_path):
+    a, b, c = tmp_path / 'a', tmp_path / 'b', tmp_path / 'c'
+    a.write_bytes(b'video')
+    b.write_bytes(b'video')
+    c.write_bytes(b'other')
+    assert hash_file(str(a), chunk_size=2) == hash_file(str(b))
+    assert hash_file(str(a)) != hash_file(str(c))
+
+def test_config_fingerprint_ignores_key_order_and_other_sections():
+    assert config_fingerprint({'a': 1, 'b': 2}) == config_fingerprint({'b': 2, 'a': 1})
+    assert config_fingerprint({'a': 1, 'b': 2}, ('a',)) == config_fingerprint({'a': 1, 'b': 3}, ('a',))
+
+def test_summarizer_change_keeps_captions_and_motion(cache):
+    base = _config()
+    changed = _config(summarizer={'max_length': 999})
+    for stage in ('thumbnails', 'motion_data', 'captions', 'tech_analysis'):
+        assert cache.stage_key('v', stage, base) == cache.stage_key('v', stage, changed), stage
+    for stage in ('story', 'feasibility_result'):
+        assert cache.stage_key('v', stage, base) != cache.stage_key('v', stage, changed), stage
+
+def test_video_change_invalidates_every_stage(cache):
+    base = _config()
+    changed = _config(video={'max_frames': 3})
+    for stage in ('thumbnails', 'motion_data', 'captions', 'story', 'tech_analysis', 'feasibility_result'):
+        assert cache.stage_key('v', stage, base) != cache.stage_key('v', stage, changed), stage
+
+def test_keys_differ_per_video_and_stage(cache):
+    config = _config()
+    assert cache.stage_key('a', 'story', config) != cache.stage_key('b', 'story', config)
+    assert cache.stage_key('a', 'story', config) != cache.stage_key('a', 'captions', config)
+
+def test_get_put_and_stats(cache):
+    assert cache.get('key', 'default') == 'default'
+    cache.put('key', {'value': 1})
+    assert cache.contains('key')
+    assert cache.get('key') == {'value': 1}
+    assert cache.stats['hits'] == 1 and cache.stats['misses'] == 1
+
+def test_overwrite_replaces_size(cache):
+    cache.put('key', b'x' * 1000)
+    first = cache._size
+    cache.put('key', b'x' * 1000)
+    assert cache._size == first == cache._scan_size()
+
+def test_ttl_expires_entries(tmp_path):
+    cache = ResultCache(str(tmp_path), ttl=60)
+    cache.put('key', 1)
+    path = cache._path('key')
+    old = time.time() - 120
+    os.utime(path, (old, old))
+    assert not cache.contains('key')
+    assert cache.get('key') is None
+    assert not os.path.exists(path)
+    assert cache.stats == {'hits': 0, 'misses': 1, 'expired': 1, 'evictions': 0}
+    assert cache._size == 0
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=2500)
+    for index, key in enumerate(('old', 'used', 'new')):
+        cache.put(key, b'x' * 1000)
+        os.utime(cache._path(key), (index, index))
+    cache.get('used')
+    cache.put('newest', b'x' * 1000)
+    assert not cache.contains('old')
+    assert cache.contains('used') and cache.contains('newest')
+    assert cache._size <= cache.max_bytes
+
+def test_get_or_compute_honours_should_cache(cache):
+    config = _config()
+    calls = []
+    compute = lambda: calls.append(1) or 'fallback'
+    cache.get_or_compute('v', 'story', config, compute, should_cache=lambda value: False)
+    cache.get_or_compute('v', 'story', config, compute, should_cache=lambda value: False)
+    assert len(calls) == 2
+    cache.get_or_compute('v', 'story', config, compute)
+    assert cache.get_or_compute('v', 'story', config, compute) == 'fallback'
+    assert len(calls) == 3
+
+def test_cache_from_config(tmp_path):
+    assert cache_from_config({'enabled': False}) is None
+    cache = cache_from_config({'enabled': True, 'dir': str(tmp_path), 'max_bytes': 100, 'ttl': 5})
+    assert (cache.max_bytes, cache.ttl) == (100, 5)
+
+def test_pipeline_run_stops_caching_once_degraded(cache):
+    run = PipelineRun(cache, 'v', _config())
+    run.store('captions', ['a caption'])
+    assert run.has('captions')
+    run.fail('captions', Exception("2 of 5 captions failed"))
+    run.store('story', 'built from failed captions')
+    assert not run.has('story')
+    assert run.errors == {'captions': "2 of 5 captions failed"}
+
+def test_pipeline_run_cached_computes_once(cache):
+    config = _config()
+    calls = []
+    first = PipelineRun(cache, 'v', config)
+    assert first.cached('story', lambda: calls.append(1) or 'story') == 'story'
+    second = PipelineRun(cache, 'v', config)
+    assert second.cached('story', lambda: calls.append(1) or 'other') == 'story'
+    assert len(calls) == 1
+    assert second.cache_hits == ['story']
+
+def test_pipeline_run_without_hash_skips_the_cache(cache):
+    run = PipelineRun(cache, None, _config())
+    run.store('story', 'story')
+    assert not run.has('story')
+    assert run.cached('story', lambda: 'fresh') == 'fresh'
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('cv2')
+
+from dedup import CaptionDeduplicator, Segment, SegmentTracker, deduplicator_from_config, text_similarity
+
+def _scene(seed, height=64, width=96):
+    # Smooth random pattern: a different scene per seed, stable under small noise
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+    return np.kron(small, np.ones((height // 6 + 1, width // 8, 1), dtype=np.uint8))[:height]
+
+def _noisy(frame, seed):
+    noise = np.random.default_rng(seed).integers(-2, 3, frame.shape)
+    return np.clip(frame.astype(int) + noise, 0, 255).astype(np.uint8)
+
+class FakeCaptioner:
+    batch_size = 2
+
+    def __init__(self, captions):
+        self.captions = captions
+        self.seen = []
+
+    def caption_batch(self, frames):
+        start = len(self.seen)
+        self.seen.extend(frames)
+        return self.captions[start:start + len(frames)]
+
+def test_text_similarity():
+    assert text_similarity("A man walks.", "a man walks") == 1.0
+    assert text_similarity("a man walks", "a dog runs") == pytest.approx(1 / 5)
+    assert text_similarity("", "") == 1.0
+
+def test_near_identical_frames_form_one_segment():
+    a, b = _scene(0), _scene(1)
+    frames = [_noisy(a, i) for i in range(4)] + [_noisy(b, i) for i in range(3)]
+    assert CaptionDeduplicator().segment_frames(frames) == [Segment(0, 3), Segment(4, 6)]
+
+def test_tracker_reports_segment_starts_and_closes_the_last_one():
+    a, b = _scene(0), _scene(1)
+    tracker = SegmentTracker()
+    assert [tracker.add(frame) for frame in (a, a, b, a)] == [True, False, True, True]
+    assert tracker.finish() == [Segment(0, 1), Segment(2, 2), Segment(3, 3)]
+    assert tracker.finish() == [Segment(0, 1), Segment(2, 2), Segment(3, 3)]
+    assert SegmentTracker().finish() == []
+
+def test_every_frame_is_its_own_segment_at_distance_minus_one():
+    frames = [_scene(0)] * 3
+    assert CaptionDeduplicator(hash_distance=-1).segment_frames(frames) == [Segment(i, i) for i in range(3)]
+
+def test_similar_neighbouring_captions_merge():
+    dedup = CaptionDeduplicator(text_threshold=0.8)
+    segments = [Segment(0, 1), Segment(2, 3), Segment(4, 4)]
+    merged = dedup.merge_captions(segments, ["a man walks", "A man walks.", "a dog runs"])
+    assert merged == [(Segment(0, 3), "a man walks"), (Segment(4, 4), "a dog runs")]
+
+def test_label_captions_show_frame_and_time_ranges():
+    labelled = CaptionDeduplicator().label_captions([Segment(0, 3), Segment(4, 4)],
+                                                    ["a man walks", "a dog runs"], interval_sec=20)
+    assert labelled == ["Frames 1-4 (0:00-1:00): a man walks", "Frame 5 (1:20): a dog runs"]
+
+def test_caption_frames_captions_the_middle_of_each_segment():
+    a, b = _scene(0), _scene(1)
+    frames = [a.copy() for _ in range(5)] + [b.copy() for _ in range(2)]
+    frames[2][0, 0] = 7  # mark the middle frame of the first segment
+    captioner = FakeCaptioner(["a man walks", "a dog runs"])
+    labelled = CaptionDeduplicator().caption_frames(captioner, frames, interval_sec=1)
+    assert len(captioner.seen) == 2 and captioner.seen[0][0, 0, 0] == 7
+    assert labelled == ["Frames 1-5 (0:00-0:04): a man walks", "Frames 6-7 (0:05-0:06): a dog runs"]
+
+def test_deduplicator_from_config():
+    assert deduplicator_from_config({'enabled': False}) is None
+    dedup = deduplicator_from_config({'enabled': True, 'hash_distance': 3, 'text_threshold': 0.5})
+    assert (dedup.hash_distance, dedup.text_threshold) == (3, 0.5)
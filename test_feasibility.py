@@ -0,0 +1,26 @@
+import asyncio
+
+import pytest
+
+import feasibility
+from feasibility import FeasibilityAnalyzer
+
+@pytest.fixture
+def analyzer(monkeypatch):
+    # No key: verdicts come from the offline lexicon engine
+    monkeypatch.setattr(feasibility, 'get_secret', lambda name: None)
+    return FeasibilityAnalyzer()
+
+REQUESTS = [{'story': "a dragon breathing fire"}, {'story': "a dog running in the grass"}]
+
+def test_analyze_many_keeps_request_order(analyzer):
+    results = analyzer.analyze_many(REQUESTS)
+    assert [r['verdict'] for r in results] == ['❌ Not Feasible', '✅ Feasible']
+
+def test_analyze_many_works_inside_a_running_loop(analyzer):
+    async def caller():
+        return analyzer.analyze_many(REQUESTS)
+    assert asyncio.run(caller()) == analyzer.analyze_many(REQUESTS)
+
+def test_analyze_many_async_matches_analyze_many(analyzer):
+    assert asyncio.run(analyzer.analyze_many_async(REQUESTS)) == analyzer.analyze_many(REQUESTS)
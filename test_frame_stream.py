@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('cv2')
+
+from benchmarks.synthetic import make_video
+from frame_stream import (ThumbnailReservoir, _bounded_frames_and_motion, decode_frames_and_motion,
+                          remap_face_frames, sample_video, sparse_frames_and_motion, thumbnail)
+
+FPS = 30
+FRAMES = 300
+
+# Full decodes measure flow on every frame; a small side keeps them quick
+MOTION_MAX_SIDE = 80
+
+@pytest.fixture(scope='module')
+def video(tmp_path_factory):
+    path = tmp_path_factory.mktemp('videos') / 'clip.mp4'
+    return make_video(str(path), width=320, height=180, duration_sec=FRAMES / FPS, fps=FPS)
+
+@pytest.mark.parametrize('max_frames', [1, 7, 13, 40, 99])
+def test_sparse_never_exceeds_max_frames(video, max_frames):
+    frames, motion = sparse_frames_and_motion(video, interval_sec=0.1, max_frames=max_frames)
+    assert 0 < len(frames) <= max_frames
+    assert motion['total_frames'] == FRAMES
+
+@pytest.mark.parametrize('max_frames', [7, 13])
+def test_sparse_fills_max_frames_when_the_interval_is_widened(video, max_frames):
+    frames, _ = sparse_frames_and_motion(video, interval_sec=0.1, max_frames=max_frames)
+    assert len(frames) == max_frames
+
+def test_sparse_keeps_the_interval_for_short_clips(video):
+    frames, motion = sparse_frames_and_motion(video, interval_sec=2.0, max_frames=60)
+    assert len(frames) == 5
+    assert motion['sample_interval_sec'] == pytest.approx(2.0)
+    assert len(motion['per_frame']) == 5
+
+def test_sparse_downscales_frames(video):
+    frames, _ = sparse_frames_and_motion(video, interval_sec=1.0, max_side=160)
+    assert all(frame.shape == (90, 160, 3) for frame in frames)
+
+def test_bounded_fallback_keeps_at_most_max_frames(video):
+    frames, motion = _bounded_frames_and_motion(video, 0.1, 8, 64, MOTION_MAX_SIDE, 3.5)
+    assert 0 < len(frames) <= 8
+    assert all(max(frame.shape[:2]) <= 64 for frame in frames)
+    # Samples are 3 frames apart; thinning doubles the spacing until they fit
+    assert motion['sample_interval_sec'] == pytest.approx(0.1 * 16)
+    assert motion['total_frames'] == FRAMES
+
+def test_full_decode_samples_every_interval(video):
+    frames, motion = decode_frames_and_motion(video, interval_sec=1.0, motion_max_side=MOTION_MAX_SIDE)
+    assert len(frames) == 10
+    assert frames[0].shape == (180, 320, 3)
+    assert len(motion['per_frame']) == FRAMES - 1
+
+def test_sample_video_follows_the_config(video):
+    sparse, _ = sample_video(video, {'sparse': True, 'interval_sec': 0.1, 'max_frames': 4})
+    full, _ = sample_video(video, {'sparse': False, 'interval_sec': 2.0, 'motion_max_side': MOTION_MAX_SIDE})
+    assert (len(sparse), len(full)) == (4, 5)
+
+def test_thumbnail_only_copies_when_asked():
+    small = np.zeros((10, 20, 3), dtype=np.uint8)
+    assert thumbnail(small, 384) is not small
+    assert thumbnail(small, 384, copy=False) is small
+    assert thumbnail(np.zeros((100, 400, 3), dtype=np.uint8), 200).shape == (50, 200, 3)
+    assert thumbnail(small, None).shape == small.shape
+
+def test_reservoir_stays_bounded_and_evenly_spaced():
+    reservoir = ThumbnailReservoir(max_count=4, max_side=8)
+    for index in range(20):
+        reservoir.add(index, np.full((16, 16, 3), index, dtype=np.uint8))
+    assert reservoir.indices == [0, 8, 16]
+    assert [frame[0, 0, 0] for frame in reservoir.frames] == [0, 8, 16]
+    assert reservoir.frames[0].shape == (8, 8, 3)
+
+def test_remap_face_frames_points_at_the_nearest_thumbnail():
+    analysis = {'suspicious_frames': [1, 9, 15], 'suspicious_ratio': 0.3}
+    assert remap_face_frames(analysis, [0, 8, 16])['suspicious_frames'] == [0, 1, 2]
+    assert remap_face_frames(analysis, []) is analysis
@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from gemini_client import GeminiClient, TokenBucket, is_retryable, request_key
+
+class Response:
+    def __init__(self, text):
+        self.text = text
+
+class FakeModel:
+    """Records how many calls overlap; fails the first `failures` calls"""
+    model_name = 'fake'
+
+    def __init__(self, delay=0.02, failures=0, error=None):
+        self.delay = delay
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, content):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            failing = self.calls <= self.failures
+        try:
+            time.sleep(self.delay)
+            if failing:
+                raise self.error
+            return Response(f"answer to {content}")
+        finally:
+            with self._lock:
+                self.active -= 1
+
+class ResourceExhausted(Exception):
+    pass
+
+def _client(**kwargs):
+    # Effectively no rate limit and no backoff, so the tests only exercise the slots
+    options = {'requests_per_minute': 60000, 'burst': 1000, 'base_delay': 0.001, 'max_delay': 0.001}
+    return GeminiClient(**{**options, **kwargs})
+
+def test_is_retryable():
+    assert is_retryable(ResourceExhausted())
+    error = Exception()
+    error.code = 503
+    assert is_retryable(error)
+    assert not is_retryable(ValueError('bad request'))
+
+def test_request_key_covers_text_and_images():
+    assert request_key("prompt") == request_key(["prompt"])
+    assert request_key(["prompt", {'data': b'a'}]) != request_key(["prompt", {'data': b'b'}])
+
+def test_token_bucket_spaces_requests_past_the_burst():
+    bucket = TokenBucket(requests_per_minute=60, burst=2)
+    assert bucket.reserve() == 0 and bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(1.0, abs=0.05)
+    assert bucket.reserve() == pytest.approx(2.0, abs=0.05)
+
+def test_generate_retries_transient_errors():
+    model = FakeModel(delay=0, failures=2, error=ResourceExhausted())
+    client = _client(max_retries=3)
+    assert client.generate(model, "q") == "answer to q"
+    assert client.stats['retries'] == 2 and client.stats['requests'] == 3
+
+def test_generate_raises_permanent_errors_at_once():
+    model = FakeModel(delay=0, failures=1, error=ValueError('bad request'))
+    client = _client()
+    with pytest.raises(ValueError):
+        client.generate(model, "q")
+    assert model.calls == 1 and client.stats['failures'] == 1
+
+def test_slots_are_shared_by_threads_and_event_loops():
+    model = FakeModel()
+    client = _client(max_concurrency=2)
+
+    def sync_caller(index):
+        client.generate(model, f"sync {index}")
+
+    def loop_caller(name):
+        async def run():
+            await asyncio.gather(*[client.generate_async(model, f"{name} {i}") for i in range(4)])
+        asyncio.run(run())
+
+    threads = [threading.Thread(target=sync_caller, args=(i,)) for i in range(4)]
+    threads += [threading.Thread(target=loop_caller, args=(name,)) for name in ('a', 'b')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert model.calls == 12
+    assert model.peak == 2
+
+def test_identical_async_requests_share_one_call():
+    model = FakeModel()
+    client = _client()
+
+    async def run():
+        return await asyncio.gather(*[client.generate_async(model, "same") for _ in range(3)])
+
+    assert asyncio.run(run()) == ["answer to same"] * 3
+    assert model.calls == 1 and client.stats['deduplicated'] == 2
+
+def test_cancelled_waiter_returns_its_slot():
+    model = FakeModel(delay=0.1)
+    client = _client(max_concurrency=1)
+
+    async def run():
+        busy = asyncio.ensure_future(client.generate_async(model, "busy"))
+        await asyncio.sleep(0.02)
+        waiting = asyncio.ensure_future(client._acquire_slot())
+        await asyncio.sleep(0.02)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        await busy
+        await asyncio.sleep(0.05)
+        return await client.generate_async(model, "after")
+
+    assert asyncio.run(run()) == "answer to after"
+    assert client._slots.acquire(blocking=False)
@@ -0,0 +1,150 @@
+import os
+import time
+
+import pytest
+
+from jobs import JobQueue, run_job
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / 'jobs.db'), max_attempts=2, retry_delay_sec=0, lease_sec=60)
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / 'video.mp4'
+    path.write_bytes(b'video')
+    return str(path)
+
+class FakePipeline:
+    def __init__(self, result=None, error=None, stages=('captions', 'story')):
+        self.result = result if result is not None else {'errors': {}}
+        self.error = error
+        self.stages = stages
+
+    def analyze(self, path, on_stage=None):
+        for stage in self.stages:
+            on_stage(stage, None, None)
+        if self.error:
+            raise self.error
+        return self.result
+
+def test_claims_by_priority_then_age(queue, video):
+    low = queue.submit(video)
+    high = queue.submit(video, priority=5)
+    later = queue.submit(video)
+    assert queue.position(later) == 2
+    assert [queue.claim('w')['id'] for _ in range(3)] == [high, low, later]
+    assert queue.claim('w') is None
+
+def test_expired_lease_is_handed_to_another_worker(queue, video):
+    job_id = queue.submit(video)
+    queue.claim('dead')
+    assert queue.claim('alive') is None
+    queue.lease_sec = 0
+    time.sleep(0.01)
+    job = queue.claim('alive')
+    assert (job['id'], job['worker'], job['attempts']) == (job_id, 'alive', 2)
+
+def test_expired_lease_fails_after_last_attempt(queue, video):
+    job_id = queue.submit(video, max_attempts=1)
+    queue.claim('dead')
+    queue.lease_sec = 0
+    time.sleep(0.01)
+    assert queue.claim('alive') is None
+    assert queue.get(job_id)['status'] == 'failed'
+
+def test_failures_retry_until_attempts_run_out(queue, video):
+    job_id = queue.submit(video)
+    queue.claim('w')
+    assert queue.fail(job_id, 'boom') == 'queued'
+    queue.claim('w')
+    assert queue.fail(job_id, 'boom again') == 'failed'
+    assert queue.get(job_id)['error'] == 'boom again'
+
+def test_result_with_fallbacks_is_retried(queue, video):
+    job_id = queue.submit(video)
+    queue.claim('w')
+    assert queue.complete(job_id, {'errors': {'captions': 'timeout'}}) == 'queued'
+    queue.claim('w')
+    assert queue.complete(job_id, {'errors': {}, 'story': 'ok'}) == 'done'
+    job = queue.get(job_id)
+    assert job['result']['story'] == 'ok' and job['error'] is None
+
+def test_retry_clears_the_previous_outcome(queue, video):
+    job_id = queue.submit(video, owned=True)
+    queue.claim('w')
+    queue.give_up(job_id, 'broken')
+    assert queue.can_retry(queue.get(job_id))
+    assert queue.retry(job_id)
+    job = queue.get(job_id)
+    assert (job['status'], job['attempts'], job['error'], job['result']) == ('queued', 0, None, None)
+    assert queue.claim('w')['id'] == job_id
+
+def test_retry_refuses_done_jobs_and_missing_files(queue, video, tmp_path):
+    done = queue.submit(video)
+    queue.claim('w')
+    queue.complete(done, {'errors': {}})
+    assert not queue.retry(done)
+
+    gone = queue.submit(str(tmp_path / 'missing.mp4'))
+    queue.cancel(gone)
+    assert not queue.can_retry(queue.get(gone))
+    assert not queue.retry(gone)
+    assert not queue.retry('no-such-job')
+
+def test_cancel_queued_and_running_jobs(queue, video):
+    queued = queue.submit(video)
+    running = queue.submit(video, priority=1)
+    queue.claim('w')
+    assert queue.cancel(queued)
+    assert queue.get(queued)['status'] == 'cancelled'
+    assert queue.cancel(running)
+    assert queue.get(running)['status'] == 'running'
+    assert queue.heartbeat(running, 'captions') is True
+    assert not queue.cancel(queued)
+
+def test_cancel_requested_job_is_not_retried(queue, video):
+    job_id = queue.submit(video)
+    queue.claim('w')
+    queue.cancel(job_id)
+    assert queue.fail(job_id, 'boom') == 'failed'
+
+def test_owned_upload_survives_failure_until_purged(queue, video):
+    job_id = queue.submit(video, owned=True, max_attempts=1)
+    queue.claim('w')
+    queue.fail(job_id, 'boom')
+    assert os.path.exists(video)
+    assert queue.purge(older_than_sec=60) == 0
+    assert queue.purge(older_than_sec=0) == 1
+    assert queue.get(job_id) is None
+    assert not os.path.exists(video)
+
+def test_owned_upload_is_deleted_when_done(queue, video):
+    job_id = queue.submit(video, owned=True)
+    queue.claim('w')
+    queue.complete(job_id, {'errors': {}})
+    assert not os.path.exists(video)
+
+def test_run_job_records_stages_and_result(queue, video):
+    job_id = queue.submit(video)
+    assert run_job(queue, FakePipeline({'errors': {}, 'story': 'ok'}), queue.claim('w')) == 'done'
+    job = queue.get(job_id)
+    assert job['stages_done'] == ['captions', 'story']
+    assert job['result']['story'] == 'ok'
+
+def test_run_job_stops_at_the_next_stage_when_cancelled(queue, video):
+    job_id = queue.submit(video)
+    job = queue.claim('w')
+    queue.cancel(job_id)
+    assert run_job(queue, FakePipeline(), job) == 'cancelled'
+    assert queue.get(job_id)['stages_done'] == ['captions']
+
+def test_run_job_gives_up_on_missing_files(queue, tmp_path):
+    job_id = queue.submit(str(tmp_path / 'missing.mp4'))
+    assert run_job(queue, FakePipeline(), queue.claim('w')) == 'failed'
+    assert queue.get(job_id)['attempts'] == 1
+
+def test_run_job_retries_exceptions(queue, video):
+    job_id = queue.submit(video)
+    assert run_job(queue, FakePipeline(error=ValueError('bad frame')), queue.claim('w')) == 'queued'
+    assert queue.get(job_id)['error'] == 'ValueError: bad frame'
@@ -0,0 +1,96 @@
+import pytest
+
+from lexicon import LexiconEngine, default_engine, result_from_score
+
+# Typical BLIP captions of ordinary footage
+ORDINARY_CAPTIONS = [
+    "a bird flying over the water",
+    "a boat floating on the water",
+    "a plane flying in the sky",
+    "a helicopter hovering in the air",
+    "a man flying a kite on the beach",
+    "a woman floating in a pool",
+    "a man jumping into a swimming pool",
+    "a group of people standing around a fire",
+    "a dog running in the grass",
+    "a man riding a skateboard down a street",
+    "a woman cooking in a kitchen",
+    "a car driving down a street",
+    "The car turns into the driveway",
+]
+
+@pytest.mark.parametrize('caption', ORDINARY_CAPTIONS)
+def test_ordinary_captions_stay_feasible(caption):
+    scored = default_engine().score(caption)
+    assert scored.verdict == '✅ Feasible', (caption, scored)
+    assert scored.score < 0.5
+
+@pytest.mark.parametrize('caption', [
+    "a man teleports across the room",
+    "a dragon breathing fire over a castle",
+    "a man levitating above the street",
+])
+def test_impossible_captions_are_not_feasible(caption):
+    assert default_engine().score(caption).verdict == '❌ Not Feasible'
+
+def test_flying_only_counts_for_things_that_cannot_fly():
+    engine = default_engine()
+    assert engine.score("a flying car over the city").impossible == ('flying car',)
+    assert engine.score("a bird flying over the city").impossible == ()
+
+def test_negation_cancels_the_following_term():
+    scored = default_engine().score("there are no dragons here")
+    assert scored.negated == ('dragons',)
+    assert scored.impossible == ()
+    assert scored.verdict == '✅ Feasible'
+
+def test_negation_skips_filler_words():
+    scored = default_engine().score("he isn't really levitating")
+    assert scored.negated == ('levitating',)
+
+def test_negation_carries_over_consecutive_terms():
+    scored = default_engine().score("no giant dragons")
+    assert scored.negated == ('giant', 'dragons')
+
+def test_negation_only_reaches_the_next_word():
+    engine = default_engine()
+    assert engine.score("no fear jumps").questionable == ('jumps',)
+    assert engine.score("no fear, jumps").questionable == ('jumps',)
+
+def test_negation_window_is_configurable():
+    engine = LexiconEngine(negation_window=3)
+    assert engine.score("no big scary dragons").negated == ('dragons',)
+
+def test_clause_boundary_ends_negation():
+    scored = default_engine().score("not a cartoon, but a dragon")
+    assert scored.negated == ('cartoon',)
+    assert scored.impossible == ('dragon',)
+
+def test_multi_word_terms_allow_any_whitespace():
+    assert default_engine().score("it  defies\ngravity").impossible == ('defies gravity',)
+
+def test_motion_and_faces_add_evidence():
+    engine = default_engine()
+    quiet = engine.score("a man walking")
+    busy = engine.score("a man walking", {'anomaly_ratio': 0.05}, {'suspicious_ratio': 1.0})
+    assert busy.motion == pytest.approx(engine.motion_weight)
+    assert busy.faces == pytest.approx(engine.face_weight)
+    assert busy.score > quiet.score
+    assert busy.verdict == '❌ Not Feasible'
+
+def test_realistic_words_never_offset_signals():
+    engine = default_engine()
+    plain = engine.score("", {'anomaly_ratio': 0.05})
+    ordinary = engine.score("walking talking sitting cooking", {'anomaly_ratio': 0.05})
+    assert ordinary.score == pytest.approx(plain.score)
+
+def test_score_many_matches_score():
+    engine = default_engine()
+    stories = ["a dragon", "a dog", ""]
+    motion = [{'anomaly_ratio': 0.01}, None, {'anomaly_ratio': 0.2}]
+    assert engine.score_many(stories, motion) == [engine.score(s, m) for s, m in zip(stories, motion)]
+
+def test_result_from_score_has_analyzer_fields():
+    result = result_from_score(default_engine().score("a wizard casts a spell"))
+    assert set(result) == {'verdict', 'explanation', 'looks_real', 'looks_fake', 'offline_score'}
+    assert result['looks_fake'] == 'Wizard, spell.'
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+
+from benchmarks.synthetic import iter_frames
+from motion import (MOTION_DTYPE, SUSPICIOUS_ANOMALY_RATIO, MotionEngine, RunningMedian,
+                    as_motion_array, robust_scores)
+
+def _motion(frames):
+    engine = MotionEngine()
+    for frame in frames:
+        engine.add(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+    return engine.result()
+
+def test_robust_scores_flag_a_single_spike():
+    magnitude = np.array([1.0, 1.1, 0.9, 1.0, 1.05, 0.95, 8.0])
+    scores = robust_scores(magnitude)
+    assert scores[-1] > 3.5
+    assert np.all(np.abs(scores[:-1]) < 3.5)
+
+def test_robust_scores_ignore_the_spike_when_scaling():
+    # A plain z-score would let the outlier inflate the deviation and hide itself
+    magnitude = np.array([1.0, 1.2, 0.8, 1.0, 1.1, 0.9, 1.0, 50.0])
+    plain = (magnitude - magnitude.mean()) / magnitude.std()
+    assert plain[-1] < 3.5 < robust_scores(magnitude)[-1]
+
+def test_robust_scores_of_a_static_clip_are_zero():
+    assert not robust_scores(np.zeros(10)).any()
+    assert len(robust_scores(np.zeros(0))) == 0
+
+def test_robust_scores_fall_back_to_mean_deviation_when_mad_is_zero():
+    scores = robust_scores(np.array([1.0] * 9 + [3.0]))
+    assert np.all(scores[:-1] == 0)
+    assert scores[-1] > 0
+
+def test_running_median_matches_numpy():
+    values = np.random.default_rng(0).normal(size=101)
+    median = RunningMedian()
+    for count, value in enumerate(values, 1):
+        median.add(float(value))
+        assert median.median == pytest.approx(np.median(values[:count]))
+    assert len(median) == len(values)
+
+def test_as_motion_array_survives_a_json_round_trip():
+    rows = np.zeros(3, dtype=MOTION_DTYPE)
+    rows['frame'] = [1, 2, 3]
+    rows['magnitude'] = [0.5, 1.0, 1.5]
+    restored = as_motion_array(rows.tolist())
+    assert restored.dtype == MOTION_DTYPE
+    assert np.array_equal(restored, rows)
+    assert len(as_motion_array(None)) == 0
+
+@pytest.mark.parametrize('seed', range(4))
+def test_steady_footage_stays_below_the_suspicious_ratio(seed):
+    result = _motion(iter_frames(640, 360, 150, seed=seed))
+    assert result['anomaly_ratio'] < SUSPICIOUS_ANOMALY_RATIO / 2
+
+def test_a_jump_in_time_is_flagged():
+    frames = list(iter_frames(640, 360, 60, seed=0))
+    result = _motion(frames[:30] + frames[45:])
+    assert [anomaly['frame'] for anomaly in result['anomalies']] == [30]